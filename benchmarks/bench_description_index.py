@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Compare a linear scan of the whatis descriptions with DescriptionIndex.
+
+Generates synthetic pages (100k by default) with descriptions drawn from a
+small vocabulary and runs a set of queries through a scan that checks every
+description for every query word as a word prefix, and through
+DescriptionIndex.search, checking both find the same pages.  Reports the
+index build time and per-query times.
+
+Usage: python benchmarks/bench_description_index.py [--pages N] [--repeat N] [QUERY ...]
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_search_index import best_time, synthetic_names
+from man_page_index import ManPageIndex
+from search_index import DescriptionIndex
+
+VOCABULARY = (
+    'compress decompress expand files file list directory contents print display show '
+    'manipulate network interface configure system service manager control library '
+    'function string memory allocate free read write open close socket terminal user '
+    'group password change mode owner search pattern regular expression archive'
+).split()
+QUERIES = ['compress', 'compr', 'list dir', 'files', 'net', 'memory free', 'socket open', 'xyzzy']
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def synthetic_descriptions(count, seed=0):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 8))) for _ in range(count)]
+
+
+def linear_search(names, sections, descriptions, query):
+    """Find the pages whose description has a word starting with every query word."""
+    words = _WORD.findall(query.lower())
+    matches = set()
+    for name, section, description in zip(names, sections, descriptions):
+        description_words = _WORD.findall(description.lower())
+        if all(any(word == d or (len(word) >= 3 and d.startswith(word)) for d in description_words)
+               for word in words):
+            matches.add((name, section, description))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('queries', nargs='*', default=QUERIES)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.pages)
+    sections = ['1'] * len(names)
+    descriptions = synthetic_descriptions(len(names))
+
+    man_page_index = ManPageIndex()
+    man_page_index.add_entries(zip(names, sections, descriptions, [''] * len(names)))
+
+    start = time.perf_counter()
+    index = DescriptionIndex(man_page_index)
+    print(f"{len(index)} pages, {len(index.words)} words, "
+          f"index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'query':>12} {'matches':>9} {'linear':>11} {'index':>11} {'top 30':>11}")
+
+    index_times = []
+    for query in args.queries:
+        expected = linear_search(names, sections, descriptions, query)
+        result = index.search(query)
+        if set(result) != expected:
+            sys.exit(f"result mismatch for {query!r}")
+        linear = best_time(lambda: linear_search(names, sections, descriptions, query),
+                           max(1, args.repeat // 10))
+        indexed = best_time(lambda: index.search(query), args.repeat)
+        top = best_time(lambda: index.search(query, 30), args.repeat)
+        index_times.append(top)
+        print(f"{query:>12} {len(result):>9} {linear * 1000:>8.1f} ms {indexed * 1000:>8.2f} ms "
+              f"{top * 1000:>8.2f} ms")
+    print(f"index (top 30): median {statistics.median(index_times) * 1000:.2f} ms, "
+          f"max {max(index_times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Compare the NumPy fuzzy matcher with the pure Python loop.
+
+Generates synthetic page names (100k by default), builds a FuzzyMatcher
+with and without NumPy and runs a set of queries through both, checking
+they return the same top results.  Reports build times and per-query times.
+
+Usage: python benchmarks/bench_fuzzy.py [--names N] [--limit N] [--repeat N] [QUERY ...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fuzzy_match
+from bench_search_index import best_time, synthetic_names
+from fuzzy_match import FuzzyMatcher
+
+QUERIES = ['l', 'ls', 'sctl', 'gitco', 'pamu', 'xmlp', 'tkbut', 'page123', 'zzzq']
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('queries', nargs='*', default=QUERIES)
+    args = parser.parse_args()
+
+    if fuzzy_match.numpy is None:
+        sys.exit("NumPy is not installed")
+    names = sorted(set(synthetic_names(args.names)), key=str.lower)
+
+    python_matcher, python_build = timed(lambda: FuzzyMatcher(names, use_numpy=False))
+    numpy_matcher, numpy_build = timed(lambda: FuzzyMatcher(names))
+    print(f"{len(names)} names, built in {python_build * 1000:.0f} ms (python), "
+          f"{numpy_build * 1000:.0f} ms (numpy)")
+    print(f"{'query':>10} {'python':>11} {'numpy':>11} {'speedup':>8}")
+
+    numpy_times = []
+    for query in args.queries:
+        expected = python_matcher.top(query, args.limit)
+        if numpy_matcher.top(query, args.limit) != expected:
+            sys.exit(f"result mismatch for {query!r}")
+        python_time = best_time(lambda: python_matcher.top(query, args.limit), max(1, args.repeat // 5))
+        numpy_time = best_time(lambda: numpy_matcher.top(query, args.limit), args.repeat)
+        numpy_times.append(numpy_time)
+        print(f"{query:>10} {python_time * 1000:>8.2f} ms {numpy_time * 1000:>8.2f} ms "
+              f"{python_time / numpy_time:>7.1f}x")
+    print(f"numpy: median {statistics.median(numpy_times) * 1000:.2f} ms, "
+          f"max {max(numpy_times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
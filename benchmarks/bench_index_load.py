@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Compare the old per-widget apropos parsing with the shared ManPageIndex.
+
+Before the shared index, ManPageListWidget, SearchWidget and WelcomeWidget each
+ran `apropos .` and parsed the output their own way.  This benchmark feeds the
+same synthetic apropos output to copies of those three parsers and to
+ManPageIndex, so the saving can be measured without a real man-db install.
+Each `apropos .` run that is no longer made saves its wall time on top of this.
+
+Usage: python benchmarks/bench_index_load.py [PAGES ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from man_page_index import ManPageIndex
+
+SECTIONS = ['1', '2', '3', '4', '5', '7', '8', '3p', '1ssl']
+
+
+def synthetic_apropos_lines(count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        name = f"{rng.choice(['lib', 'sys', 'git-', 'pam_', 'x', ''])}page{i}"
+        section = rng.choice(SECTIONS)
+        lines.append(f"{name} ({section}) - synthetic description number {i}")
+    return lines
+
+
+# --- Copies of the pre-index parsers, kept here for comparison only ---
+
+def legacy_list_parse(lines):
+    all_man_pages = {}
+    for line in lines:
+        if '(' in line and ')' in line:
+            parts = line.split('(')
+            name_section = parts[0].strip()
+            section_part = parts[1].split(')')[0].strip()
+            name = name_section.split(',')[0].strip()
+            if name:
+                if section_part not in all_man_pages:
+                    all_man_pages[section_part] = []
+                if name not in all_man_pages[section_part]:
+                    all_man_pages[section_part].append(name)
+    for section in all_man_pages:
+        all_man_pages[section].sort()
+    return all_man_pages
+
+
+def legacy_search_parse(lines):
+    data = []
+    names_for_completer = []
+    for line in lines:
+        if '(' in line and ')' in line:
+            name_section = line.split('(')[0].strip()
+            name = name_section.split(',')[0].strip()
+            if name:
+                if name not in [item[0] for item in data]:
+                    data.append((name, line))
+                    names_for_completer.append(name)
+    data.sort(key=lambda x: x[0].lower())
+    names_for_completer.sort()
+    return data, names_for_completer
+
+
+def legacy_welcome_parse(lines):
+    unique_names = set()
+    for line in lines:
+        if '(' in line and ')' in line:
+            name_section = line.split('(')[0].strip()
+            name = name_section.split(',')[0].strip()
+            if name:
+                unique_names.add(name)
+    return sorted(list(unique_names))
+
+
+def shared_index_parse(lines):
+    index = ManPageIndex()
+    index.add_lines(lines)
+    index.by_section()
+    sorted(index.unique_names(), key=str.lower)
+    return index
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000]
+    print(f"{'pages':>8} {'legacy (3 parses)':>18} {'shared index':>14} {'speedup':>8}")
+    for size in sizes:
+        lines = synthetic_apropos_lines(size)
+        legacy = (timed(legacy_list_parse, lines)
+                  + timed(legacy_search_parse, lines)
+                  + timed(legacy_welcome_parse, lines))
+        shared = timed(shared_index_parse, lines)
+        print(f"{size:>8} {legacy * 1000:>15.1f} ms {shared * 1000:>11.1f} ms {legacy / shared:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Measure the memory held per man page by the index, with tracemalloc.
+
+Parses the same synthetic apropos output into three layouts and reports the
+bytes still allocated afterwards, divided by the number of pages:
+
+- widgets: the per-widget copies from before the shared index (the list
+  page's dict of lists, the search page's (name, apropos line) tuples and
+  sorted names, the welcome page's sorted names)
+- lists: the shared index as a list per column with a (name, section) dict
+- columnar: ManPageIndex, with its by_section and unique_names views built
+
+Usage: python benchmarks/bench_index_memory.py [PAGES ...]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_index_load import synthetic_apropos_lines
+from man_page_index import ManPageIndex, parse_apropos_line
+
+
+def widget_copies(lines):
+    """The three widgets' own parses of `apropos .`, as they were kept in memory."""
+    all_man_pages = {}
+    data = []
+    seen = set()
+    welcome_names = set()
+    for line in lines:
+        name, section, _ = parse_apropos_line(line)
+        all_man_pages.setdefault(section, []).append(name)
+        name, _, _ = parse_apropos_line(line)
+        if name not in seen:
+            seen.add(name)
+            data.append((name, line))
+        name, _, _ = parse_apropos_line(line)
+        welcome_names.add(name)
+    for names in all_man_pages.values():
+        names.sort()
+    data.sort(key=lambda item: item[0].lower())
+    search_names = sorted(name for name, _ in data)
+    del seen
+    return all_man_pages, data, search_names, sorted(welcome_names)
+
+
+def list_columns(lines):
+    """The shared index before it was made columnar."""
+    names, sections, descriptions, ids = [], [], [], {}
+    for line in lines:
+        name, section, description = parse_apropos_line(line)
+        if (name, section) in ids:
+            continue
+        ids[(name, section)] = len(names)
+        names.append(name)
+        sections.append(section)
+        descriptions.append(description)
+    by_section = {}
+    for name, section in zip(names, sections):
+        by_section.setdefault(section, []).append(name)
+    for section_names in by_section.values():
+        section_names.sort()
+    return names, sections, descriptions, ids, by_section, sorted(set(names))
+
+
+def columnar(lines):
+    index = ManPageIndex()
+    index.add_lines(lines)
+    index.by_section()
+    index.unique_names()
+    return index
+
+
+def retained_bytes(build, size):
+    # The apropos output is read while tracing, as only part of it is kept
+    tracemalloc.start()
+    result = build(synthetic_apropos_lines(size))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 50000, 100000]
+    layouts = (('widgets', widget_copies), ('lists', list_columns), ('columnar', columnar))
+    print(f"{'pages':>8} " + ' '.join(f"{label + ' B/page':>16}" for label, _ in layouts))
+    for size in sizes:
+        per_page = [retained_bytes(build, size) / size for _, build in layouts]
+        print(f"{size:>8} " + ' '.join(f"{value:>16.0f}" for value in per_page))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Compare building the man page index with apropos and with the MANPATH scanner.
+
+Reports the time until every name is known and until every description is
+known for each source.  The on-disk cache is bypassed.  apropos is skipped
+if it is not installed.
+
+Usage: python benchmarks/bench_indexer.py [--manpath DIR:DIR...] [--repeat N]
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from man_page_index import ManPageIndex, iter_apropos_batches, BATCH_SIZE
+from manpath_scanner import iter_scan_batches
+
+
+def time_apropos():
+    start = time.perf_counter()
+    index = ManPageIndex()
+    for batch in iter_apropos_batches():
+        index.add_entries(batch)
+    elapsed = time.perf_counter() - start
+    # apropos delivers names and descriptions together
+    return len(index), elapsed, elapsed
+
+
+def time_scan(paths):
+    start = time.perf_counter()
+    names_done = 0.0
+    index = ManPageIndex()
+    for batch in iter_scan_batches(BATCH_SIZE, paths):
+        index.add_entries(batch)
+        # Name-only batches come first, so the last of them marks the list as usable
+        if not any(description for _, _, description, _ in batch):
+            names_done = time.perf_counter() - start
+    return len(index), names_done, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--manpath', help='colon separated hierarchies to scan (default: manpath)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    paths = args.manpath.split(':') if args.manpath else None
+
+    runs = [('scan', lambda: time_scan(paths))]
+    if shutil.which('apropos') and not args.manpath:
+        runs.insert(0, ('apropos', time_apropos))
+
+    print(f"{'source':>8} {'pages':>8} {'names ready':>12} {'descriptions':>13}")
+    for label, func in runs:
+        best = min((func() for _ in range(args.repeat)), key=lambda r: r[2])
+        pages, names_time, full_time = best
+        print(f"{label:>8} {pages:>8} {names_time * 1000:>9.1f} ms {full_time * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Measure keystroke-to-repaint latency of the man page list at 50k pages.
+
+Types a query into ManPageListWidget one character at a time (and deletes
+it again) and times each keystroke until the tree has been repainted, with
+one section expanded.  The filter's debounce delay is skipped, so this is
+the work done per keystroke.  The previous QTreeWidget implementation, which
+rebuilt one item per page on every keystroke, is measured the same way.
+Runs on Qt's offscreen platform, so no display is needed.
+
+Usage: python benchmarks/bench_list_filter.py [--pages N] [--query TEXT]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PyQt6.QtWidgets import QApplication, QLineEdit, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
+
+from man_page_index import ManPageIndex, section_title
+from man_page_list_widget import ManPageListWidget
+
+SECTIONS = ['1', '2', '3', '4', '5', '7', '8', '3p', '1ssl']
+PREFIXES = ['lib', 'sys', 'git-', 'pam_', 'x', 'systemd-', '']
+
+
+def synthetic_index(count, seed=0):
+    rng = random.Random(seed)
+    index = ManPageIndex()
+    index.add_entries(
+        (f"{rng.choice(PREFIXES)}page{i}", rng.choice(SECTIONS), f"synthetic description {i}", "")
+        for i in range(count)
+    )
+    index.loaded = True
+    return index
+
+
+class LegacyListWidget(QWidget):
+    """The QTreeWidget list as it was before the model/view rewrite."""
+
+    def __init__(self, index):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        self.search_edit = QLineEdit()
+        self.search_edit.textChanged.connect(self._filter_list)
+        layout.addWidget(self.search_edit)
+        self.tree_widget = QTreeWidget()
+        self.tree_widget.setHeaderHidden(True)
+        layout.addWidget(self.tree_widget)
+        self.all_man_pages = index.by_section()
+        self._filter_list('')
+
+    def _filter_list(self, text):
+        self.tree_widget.clear()
+        for section in sorted(self.all_man_pages):
+            names = [n for n in self.all_man_pages[section] if text.lower() in n.lower()]
+            if not names:
+                continue
+            section_item = QTreeWidgetItem([section_title(section)])
+            self.tree_widget.addTopLevelItem(section_item)
+            for name in names:
+                section_item.addChild(QTreeWidgetItem([name]))
+        if self.tree_widget.topLevelItemCount():
+            self.tree_widget.topLevelItem(0).setExpanded(True)
+
+    def viewport(self):
+        return self.tree_widget.viewport()
+
+
+def expand_first_section(widget):
+    if isinstance(widget, LegacyListWidget):
+        return
+    index = widget.tree_model.index(0, 0)
+    if index.isValid():
+        widget.tree_view.expand(index)
+
+
+def keystrokes(query):
+    """The texts seen while typing ``query`` and then deleting it again."""
+    typed = [query[:i] for i in range(1, len(query) + 1)]
+    return typed + typed[-2::-1] + ['']
+
+
+def measure(app, widget, query):
+    viewport = widget.viewport() if isinstance(widget, LegacyListWidget) else widget.tree_view.viewport()
+    latencies = []
+    for text in keystrokes(query):
+        start = time.perf_counter()
+        widget.search_edit.setText(text)
+        if not isinstance(widget, LegacyListWidget) and widget._filter_timer.isActive():
+            # Don't count the typing pause the filter waits for
+            widget._apply_filter()
+        app.processEvents()
+        viewport.repaint()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50000)
+    parser.add_argument('--query', default='systemd-page1')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    index = synthetic_index(args.pages)
+
+    print(f"{args.pages} pages, typing and deleting {args.query!r}")
+    print(f"{'list':>8} {'build':>10} {'mean':>10} {'median':>10} {'max':>10}")
+    for label, factory in (('legacy', LegacyListWidget), ('model', ManPageListWidget)):
+        start = time.perf_counter()
+        widget = factory(index)
+        widget.resize(600, 800)
+        widget.show()
+        expand_first_section(widget)
+        app.processEvents()
+        build = time.perf_counter() - start
+        latencies = measure(app, widget, args.query)
+        print(f"{label:>8} {build * 1000:>7.1f} ms {statistics.mean(latencies) * 1000:>7.2f} ms "
+              f"{statistics.median(latencies) * 1000:>7.2f} ms {max(latencies) * 1000:>7.2f} ms")
+        widget.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""Compare the built-in roff renderer with man -Thtml over real man pages.
+
+Renders every page found under the man path (or a random sample of them)
+with roff_renderer and reports how many it handles, why the others fall
+back to man, and how long rendering takes.  If man is installed, the
+handled pages are also rendered with man -Thtml -l to compare speed, and
+fidelity is measured as the similarity of the visible words of both
+outputs (1.0 means identical text).
+
+Usage: python benchmarks/bench_roff_renderer.py [--manpath DIR:DIR...] [--sample N] [--compare N]
+"""
+import argparse
+import collections
+import difflib
+import html
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from manpath_scanner import scan_man_pages
+from roff_renderer import UnsupportedRoff, render_roff_file
+
+_TAGS = re.compile(r'<[^>]*>')
+_HEAD = re.compile(r'<head>.*?</head>', re.DOTALL | re.IGNORECASE)
+
+
+def visible_words(html_content):
+    """Return the words a reader would see, ignoring markup and layout."""
+    text = html.unescape(_TAGS.sub(' ', _HEAD.sub('', html_content)))
+    # groff uses typographic hyphens and quotes where we may not
+    text = text.replace('‐', '-').replace('−', '-').replace('’', "'")
+    return text.split()
+
+
+def render_with_man(path):
+    start = time.perf_counter()
+    result = subprocess.run(["man", "-Thtml", "-l", path], capture_output=True, text=True)
+    return result.stdout, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--manpath', help='colon separated hierarchies to scan (default: manpath)')
+    parser.add_argument('--sample', type=int, help='only render this many randomly chosen pages')
+    parser.add_argument('--compare', type=int, default=200,
+                        help='pages to also render with man for speed and fidelity (default 200)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pages = [path for _, _, path in scan_man_pages(args.manpath.split(':') if args.manpath else None)]
+    rng = random.Random(args.seed)
+    if args.sample and args.sample < len(pages):
+        pages = rng.sample(pages, args.sample)
+
+    handled = []
+    fallbacks = collections.Counter()
+    python_times = {}
+    for path in pages:
+        start = time.perf_counter()
+        try:
+            html_content = render_roff_file(path)
+        except UnsupportedRoff as e:
+            fallbacks[str(e).split(' /')[0][:50]] += 1
+            continue
+        python_times[path] = time.perf_counter() - start
+        handled.append((path, html_content))
+
+    print(f"pages:    {len(pages)}")
+    print(f"handled:  {len(handled)} ({len(handled) / max(1, len(pages)):.1%})")
+    print(f"fallback: {len(pages) - len(handled)}")
+    for reason, count in fallbacks.most_common(10):
+        print(f"  {count:>6}  {reason}")
+    if python_times:
+        times = list(python_times.values())
+        print(f"python renderer: median {statistics.median(times) * 1000:.2f} ms, "
+              f"total {sum(times):.2f} s")
+
+    if not shutil.which('man'):
+        print("man is not installed; skipping the speed and fidelity comparison")
+        return
+
+    compared = rng.sample(handled, min(args.compare, len(handled)))
+    man_times = []
+    ratios = []
+    for path, html_content in compared:
+        man_html, elapsed = render_with_man(path)
+        man_times.append(elapsed)
+        matcher = difflib.SequenceMatcher(None, visible_words(html_content), visible_words(man_html),
+                                          autojunk=False)
+        ratios.append((matcher.ratio(), path))
+    if not compared:
+        return
+    python_median = statistics.median(python_times[path] for path, _ in compared)
+    man_median = statistics.median(man_times)
+    print(f"man -Thtml:      median {man_median * 1000:.2f} ms over {len(compared)} pages "
+          f"({man_median / python_median:.0f}x slower)")
+    print(f"fidelity:        mean {statistics.mean(r for r, _ in ratios):.3f}, "
+          f"median {statistics.median(r for r, _ in ratios):.3f}")
+    print("least similar pages:")
+    for ratio, path in sorted(ratios)[:5]:
+        print(f"  {ratio:.3f}  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Compare SearchWidget's old linear suggestion pass with NameSearchIndex.
+
+Generates synthetic page names (100k by default) and runs a set of queries
+through a copy of the old exact / starts with / contains loop and through
+NameSearchIndex.search, checking both return the same groups.  Reports the
+index build time and per-query times, including search_positions (what
+SearchWidget calls on each keystroke) against TARGET_MS.
+
+Usage: python benchmarks/bench_search_index.py [--names N] [--repeat N] [QUERY ...]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from search_index import NameSearchIndex
+
+PREFIXES = ['lib', 'sys', 'git-', 'pam_', 'x', 'systemd-', 'perl', 'Tk::', 'XML::', '']
+QUERIES = ['l', 'q', '_', 'ls', 'qz', 'pa', 'lib', 'pam', 'git-', 'systemd-', 'Tk::', 'xml::s', 'printf',
+           'zzz', 'page12']
+
+# Keystroke budget for search_positions at 100k names
+TARGET_MS = 1.0
+
+
+def synthetic_names(count, seed=0):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase + '_'
+    return [
+        f"{rng.choice(PREFIXES)}{''.join(rng.choice(letters) for _ in range(rng.randint(2, 10)))}page{i}"
+        for i in range(count)
+    ]
+
+
+def legacy_search(all_names_sorted, query):
+    """The suggestion pass SearchWidget ran before NameSearchIndex."""
+    query_lower = query.lower()
+    exact_matches = []
+    starts_with_matches = []
+    contains_matches = []
+    for name in all_names_sorted:
+        name_lower = name.lower()
+        if name_lower == query_lower:
+            exact_matches.append(name)
+        elif name_lower.startswith(query_lower):
+            starts_with_matches.append(name)
+        elif query_lower in name_lower:
+            contains_matches.append(name)
+    exact_matches.sort()
+    starts_with_matches.sort()
+    contains_matches.sort()
+    starts_with_matches = [name for name in starts_with_matches if name not in exact_matches]
+    contains_matches = [name for name in contains_matches
+                        if name not in exact_matches and name not in starts_with_matches]
+    return exact_matches, starts_with_matches, contains_matches
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('queries', nargs='*', default=QUERIES)
+    args = parser.parse_args()
+
+    names = synthetic_names(args.names)
+    all_names_sorted = sorted(set(names), key=str.lower)
+
+    start = time.perf_counter()
+    index = NameSearchIndex(names)
+    print(f"{len(index)} names, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'query':>10} {'matches':>9} {'linear':>11} {'index':>11} {'positions':>11}")
+
+    index_times = []
+    position_times = {}
+    for query in args.queries:
+        expected = legacy_search(all_names_sorted, query)
+        result = index.search(query)
+        # The index orders case-insensitively; the old code sorted each group by code point
+        if [sorted(group) for group in result] != list(expected):
+            sys.exit(f"result mismatch for {query!r}")
+        linear = best_time(lambda: legacy_search(all_names_sorted, query), max(1, args.repeat // 10))
+        indexed = best_time(lambda: index.search(query), args.repeat)
+        positions = best_time(lambda: index.search_positions(query), args.repeat)
+        index_times.append(indexed)
+        position_times[query] = positions
+        matches = sum(len(group) for group in result)
+        print(f"{query:>10} {matches:>9} {linear * 1000:>8.2f} ms {indexed * 1000:>8.3f} ms "
+              f"{positions * 1000:>8.3f} ms")
+    print(f"index: median {statistics.median(index_times) * 1000:.3f} ms, "
+          f"max {max(index_times) * 1000:.3f} ms")
+    for length, label in ((1, "1 character"), (2, "2 character"), (3, "longer")):
+        times = [t for query, t in position_times.items() if min(len(query), 3) == length]
+        if times:
+            worst = max(times)
+            print(f"positions, {label} queries: max {worst * 1000:.3f} ms "
+                  f"({'within' if worst * 1000 <= TARGET_MS else 'over'} the {TARGET_MS:g} ms target)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Measure how long the search results take to fill and repaint at 100k names.
+
+For each query, the name groups from NameSearchIndex are shown the way
+SearchWidget used to (QListWidget.clear, then one QListWidgetItem per match
+and per header) and the way it does now (SearchResultsModel over the match
+positions in a QListView), and each is timed until the list has been
+repainted.  Runs on Qt's offscreen platform, so no display is needed.
+
+Usage: python benchmarks/bench_search_results.py [--names N] [--repeat N] [QUERY ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication, QListView, QListWidget, QListWidgetItem
+
+from bench_search_index import synthetic_names
+from search_index import NameSearchIndex
+from search_results_model import SearchResultsDelegate, SearchResultsModel
+
+QUERIES = ['p', 'e', 'lib', 'systemd-', 'page123', 'zzzq']
+GROUPS = ("Exact Matches", "Starts With", "Contains (Partial/Keyword)")
+
+
+def fill_legacy(widget, index, query):
+    """What SearchWidget._update_suggestions did before the results model."""
+    widget.clear()
+    for title, names in zip(GROUPS, index.search(query)):
+        if names:
+            header_item = QListWidgetItem(title)
+            header_item.setFlags(header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            header_item.setForeground(Qt.GlobalColor.darkBlue)
+            font = header_item.font()
+            font.setBold(True)
+            header_item.setFont(font)
+            widget.addItem(header_item)
+            widget.addItems(names)
+
+
+def fill_model(model, index, query):
+    model.clear()
+    for title, positions in zip(GROUPS, index.search_positions(query)):
+        model.add_names(title, index.names, positions)
+
+
+def measure(app, view, fill, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fill()
+        app.processEvents()
+        view.viewport().repaint()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('queries', nargs='*', default=QUERIES)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    index = NameSearchIndex(synthetic_names(args.names))
+
+    legacy = QListWidget()
+    model = SearchResultsModel()
+    view = QListView()
+    view.setUniformItemSizes(True)
+    view.setItemDelegate(SearchResultsDelegate(view))
+    view.setModel(model)
+    for widget in (legacy, view):
+        widget.resize(600, 800)
+        widget.show()
+    app.processEvents()
+
+    print(f"{len(index)} names")
+    print(f"{'query':>10} {'rows':>8} {'QListWidget':>13} {'model':>10}")
+    for query in args.queries:
+        legacy_time = measure(app, legacy, lambda: fill_legacy(legacy, index, query), args.repeat)
+        model_time = measure(app, view, lambda: fill_model(model, index, query), args.repeat)
+        print(f"{query:>10} {legacy.count():>8} {legacy_time * 1000:>10.1f} ms "
+              f"{model_time * 1000:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+"""Run the viewer's hot paths against synthetic man hierarchies and save the timings as JSON.
+
+For every page count and compression, a hierarchy is generated with
+synthetic_manpath.py (kept in --workdir and reused by later runs) and a
+fresh interpreter measures, with the fake apropos, man and manpath first on
+PATH, an empty cache directory and Qt's offscreen platform:
+
+- index load: cold (building the index, which writes the cache) and warm
+  (from the cache), through apropos and through the MANPATH scanner
+- list filtering: keystroke to repaint while typing into the list page
+- search keystrokes: keystroke to repaint on the search page, after the
+  search indexes the first query starts building are ready (both timed
+  separately)
+- page render: whole pages through man and through the built-in renderer,
+  without the render cache
+- widget repaint: one repaint of the list, search results and page viewer
+
+Times are in milliseconds.  The JSON file records the application version,
+Python and Qt versions and the date, so files from different releases can
+be compared.
+
+Usage: python benchmarks/bench_suite.py [--pages N,N,...] [--compression gz,plain]
+                                        [--output FILE] [--workdir DIR] [--renders N]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_manpath import generate_hierarchy, install_fake_tools, read_pages
+
+PAGE_COUNTS = [1000, 10000, 100000]
+COMPRESSIONS = ['gz', 'plain']
+# Pages rendered per renderer
+RENDERS = 20
+# Repaints averaged per widget
+REPAINTS = 10
+
+
+# --- Driver ---
+
+def prepare(workdir, pages, compression):
+    """Return the directory holding a generated hierarchy, generating it if needed."""
+    directory = os.path.join(workdir, f"{pages}-{compression}")
+    done_marker = os.path.join(directory, '.complete')
+    if os.path.exists(done_marker):
+        return directory, None
+    shutil.rmtree(directory, ignore_errors=True)
+    start = time.perf_counter()
+    generate_hierarchy(directory, pages, compress=compression == 'gz')
+    install_fake_tools(directory)
+    open(done_marker, 'w').close()
+    return directory, time.perf_counter() - start
+
+
+def run_config(directory, renders):
+    """Measure one hierarchy in a child interpreter and return its metrics."""
+    with tempfile.TemporaryDirectory(prefix='pmv-bench-cache-') as cache:
+        env = dict(os.environ)
+        env['PATH'] = os.path.join(directory, 'bin') + os.pathsep + env.get('PATH', '')
+        env['MANPATH'] = os.path.join(directory, 'share', 'man')
+        env['XDG_CACHE_HOME'] = cache
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--measure', directory, '--renders', str(renders)],
+            env=env, capture_output=True, text=True,
+        )
+    if result.returncode:
+        sys.stderr.write(result.stderr)
+        raise RuntimeError(f"measuring {directory} failed")
+    # The metrics are the last line; anything before it is the app's own output
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def read_version():
+    try:
+        with open(os.path.join(REPO_DIR, 'version.txt')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def print_metrics(metrics):
+    for key, value in metrics.items():
+        print(f"  {key:<36} {value:>10.2f}" if isinstance(value, float) else f"  {key:<36} {value:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default=','.join(map(str, PAGE_COUNTS)),
+                        help='comma separated page counts (default %(default)s)')
+    parser.add_argument('--compression', default=','.join(COMPRESSIONS),
+                        help='comma separated, gz and/or plain (default %(default)s)')
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'pickles-man-viewer-bench'),
+                        help='where generated hierarchies are kept (default %(default)s)')
+    parser.add_argument('--renders', type=int, default=RENDERS, help='pages rendered per renderer')
+    parser.add_argument('--measure', metavar='DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.renders)))
+        return
+
+    from PyQt6.QtCore import QT_VERSION_STR
+    report = {
+        'version': read_version(),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'runs': [],
+    }
+    for pages in [int(count) for count in args.pages.split(',')]:
+        for compression in args.compression.split(','):
+            directory, generated = prepare(args.workdir, pages, compression)
+            if generated is not None:
+                print(f"generated {pages} {compression} pages in {generated:.1f} s")
+            print(f"{pages} pages, {compression}:")
+            metrics = run_config(directory, args.renders)
+            print_metrics(metrics)
+            report['runs'].append({'pages': pages, 'compression': compression, 'metrics': metrics})
+            # Written after every run, so a long suite that is interrupted keeps its results
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+# --- Measurements, run in a child interpreter per hierarchy ---
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _summary(prefix, latencies):
+    return {
+        f"{prefix}_mean_ms": _ms(statistics.mean(latencies)),
+        f"{prefix}_median_ms": _ms(statistics.median(latencies)),
+        f"{prefix}_max_ms": _ms(max(latencies)),
+    }
+
+
+def measure_index_load(metrics):
+    from index_cache import cache_dir
+    from man_page_index import ManPageIndex, iter_index_batches
+
+    index = None
+    for source in ('apropos', 'scan'):
+        shutil.rmtree(cache_dir(), ignore_errors=True)
+        for state in ('cold', 'warm'):
+            start = time.perf_counter()
+            loaded = ManPageIndex()
+            for batch in iter_index_batches(source=source):
+                loaded.add_entries(batch)
+            metrics[f"index_load_{source}_{state}_ms"] = _ms(time.perf_counter() - start)
+        index = loaded
+    index.loaded = True
+    metrics['index_entries'] = len(index)
+    return index
+
+
+def keystrokes(query):
+    """The texts seen while typing ``query`` and then deleting it again."""
+    typed = [query[:i] for i in range(1, len(query) + 1)]
+    return typed + typed[-2::-1] + ['']
+
+
+def measure_list_filter(app, index, query, metrics):
+    from man_page_list_widget import ManPageListWidget
+
+    widget = ManPageListWidget(index)
+    widget.resize(600, 800)
+    widget.show()
+    widget.tree_view.expand(widget.tree_model.index(0, 0))
+    app.processEvents()
+    viewport = widget.tree_view.viewport()
+    latencies = []
+    for text in keystrokes(query):
+        start = time.perf_counter()
+        widget.search_edit.setText(text)
+        # Don't count the typing pause the filter waits for
+        widget._filter_timer.stop()
+        widget._apply_filter()
+        app.processEvents()
+        viewport.repaint()
+        latencies.append(time.perf_counter() - start)
+    metrics.update(_summary('list_filter_keystroke', latencies))
+    metrics['list_repaint_ms'] = measure_repaint(viewport)
+    widget.close()
+
+
+def measure_search(app, index, query, metrics):
+    from search_widget import SearchWidget
+
+    widget = SearchWidget(index)
+    widget.resize(600, 800)
+    widget.show()
+    app.processEvents()
+    viewport = widget.results_view.viewport()
+    # The first query starts building the name, fuzzy and description indexes in the background
+    start = time.perf_counter()
+    widget.search_line_edit.setText(query[:2])
+    app.processEvents()
+    metrics['search_first_query_ms'] = _ms(time.perf_counter() - start)
+    while widget._index_builder is not None:
+        app.processEvents()
+        time.sleep(0.001)
+    metrics['search_index_build_ms'] = _ms(time.perf_counter() - start)
+    widget.search_line_edit.setText('')
+    latencies = []
+    for text in keystrokes(query):
+        start = time.perf_counter()
+        widget.search_line_edit.setText(text)
+        app.processEvents()
+        viewport.repaint()
+        latencies.append(time.perf_counter() - start)
+    metrics.update(_summary('search_keystroke', latencies))
+    widget.search_line_edit.setText(query[:1])
+    app.processEvents()
+    metrics['search_results_repaint_ms'] = measure_repaint(viewport)
+    widget.close()
+
+
+def measure_render(pages, renders, metrics):
+    """Render ``renders`` pages with each renderer; returns the largest page's HTML."""
+    from man_page_renderer import RENDERERS, get_man_page_html
+
+    rng = random.Random(0)
+    sample = rng.sample(pages, min(renders, len(pages)))
+    # The largest page too, for the viewer repaint
+    largest = max(pages, key=lambda page: os.path.getsize(page[3]))
+    largest_html = None
+    for renderer in RENDERERS:
+        latencies = []
+        for name, section, _, path in sample + [largest]:
+            start = time.perf_counter()
+            html = get_man_page_html(name, None, renderer=renderer, section=section, source_path=path)
+            latencies.append(time.perf_counter() - start)
+            largest_html = html
+        metrics.update(_summary(f"render_{renderer}", latencies[:-1]))
+        metrics[f"render_{renderer}_largest_ms"] = _ms(latencies[-1])
+    return largest_html
+
+
+def measure_viewer_repaint(app, html, metrics):
+    from PyQt6.QtWidgets import QTextBrowser
+
+    # The viewer's QTextBrowser, without its render service
+    viewer = QTextBrowser()
+    viewer.resize(800, 900)
+    viewer.show()
+    start = time.perf_counter()
+    viewer.setHtml(html)
+    app.processEvents()
+    metrics['viewer_set_html_ms'] = _ms(time.perf_counter() - start)
+    metrics['viewer_repaint_ms'] = measure_repaint(viewer.viewport())
+    viewer.close()
+
+
+def measure_repaint(widget):
+    times = []
+    for _ in range(REPAINTS):
+        start = time.perf_counter()
+        widget.repaint()
+        times.append(time.perf_counter() - start)
+    return _ms(statistics.mean(times))
+
+
+def measure(directory, renders):
+    from PyQt6.QtWidgets import QApplication
+
+    pages = read_pages(directory)
+    metrics = {'pages': len(pages)}
+    app = QApplication(sys.argv[:1])
+    index = measure_index_load(metrics)
+    # A prefix shared by many names, extended to one name
+    query = sorted(name for name, _, _, _ in pages)[len(pages) // 2][:10]
+    metrics['query'] = query
+    measure_list_filter(app, index, query, metrics)
+    measure_search(app, index, query, metrics)
+    html = measure_render(pages, renders, metrics)
+    measure_viewer_repaint(app, html, metrics)
+    return metrics
+
+
+if __name__ == "__main__":
+    main()
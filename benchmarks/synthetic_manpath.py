@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""Generate a fake man hierarchy and fake man-db tools for benchmarking.
+
+``generate_hierarchy`` writes ``COUNT`` man(7) pages below ``DIR/share/man``
+(gzip compressed or plain), spread over sections 1, 3, 3pm, 5, 7 and 8.
+Some names appear in two sections and some pages are ``.so`` links to
+another page, like on a real system.  Page sizes vary widely; a few are
+large enough to exercise progressive rendering.
+
+``install_fake_tools`` writes ``apropos``, ``man`` and ``manpath`` scripts
+to ``DIR/bin`` that only know about the generated pages, so the viewer can
+run against them by putting that directory first on PATH.  The fake man
+looks pages up like man-db, follows ``.so`` links and turns the source
+into simple HTML or text.  It costs a process start and a page read, not a
+groff run, so render timings with it measure the viewer's side.
+
+Usage: python benchmarks/synthetic_manpath.py [--pages N] [--plain] [--seed N] DIR
+"""
+import argparse
+import gzip
+import html
+import os
+import random
+import re
+import stat
+import sys
+
+# Sections and how many of the pages are in each
+SECTION_WEIGHTS = [('1', 30), ('3', 40), ('3pm', 8), ('5', 8), ('7', 5), ('8', 9)]
+# Searched in this order when man is asked for a page without a section
+SEARCH_ORDER = ['1', '8', '3', '3pm', '5', '7']
+
+PREFIXES = {
+    '1': ['', '', 'git-', 'x', 'gnome-', 'perl', 'py'],
+    '3': ['', 'lib', 'pthread_', 'str', 'X', 'gl', 'ssl_', 'curl_easy_'],
+    '3pm': ['Tk::', 'XML::', 'Net::', 'File::', 'IO::'],
+    '5': ['', '', 'systemd.', 'pam_'],
+    '7': ['', 'iso_'],
+    '8': ['', 'systemd-', 'lvm', 'iw'],
+}
+SYLLABLES = ['ab', 'cat', 'do', 'fer', 'get', 'ix', 'lo', 'man', 'net', 'or', 'pri', 'quo', 'ran',
+             'sed', 'tab', 'ul', 'vi', 'wr', 'xa', 'yes', 'zon', 'ch', 'ed', 'sync', 'map', 'time']
+WORDS = ('the a of to and is in for file files directory output input list print set get mode '
+         'user system process signal memory buffer string character line lines byte bytes '
+         'compress decompress archive network socket address connection server client request '
+         'option options value values default error errors return returns status format '
+         'configuration device terminal display window font color image table record key '
+         'search match pattern expression regular encoding locale time date clock timer '
+         'thread lock queue event handler callback library function call argument arguments '
+         'pointer structure entry entries index name names path paths link links permission '
+         'owner group read write open close create delete remove copy move rename sort '
+         'filter convert transform encode decode check verify report show hide enable disable '
+         'start stop restart reload load save store cache temporary standard extended').split()
+
+# Fraction of pages that are .so links, and of names also used in a second section
+LINK_FRACTION = 0.04
+SHARED_NAME_FRACTION = 0.05
+
+HIERARCHY = os.path.join('share', 'man')
+PAGES_FILE = 'pages.tsv'
+
+
+# --- Hierarchy ---
+
+def _sentence(rng, low=6, high=18):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def page_source(rng, name, section, description):
+    """Return the man(7) source of a synthetic page."""
+    escaped = name.replace('-', '\\-')
+    lines = [
+        f'.TH {name.upper()} {section} "2024-01-01" "synthetic 1.0" "Synthetic Manual"',
+        '.SH NAME',
+        f'{escaped} \\- {description}',
+        '.SH SYNOPSIS',
+        f'.B {escaped}',
+        '[\\fIOPTION\\fR]... [\\fIFILE\\fR]...',
+        '.SH DESCRIPTION',
+    ]
+    # Mostly short pages with a long tail, like the real ones
+    paragraphs = min(int(rng.expovariate(1 / 4)) + 1, 150)
+    for _ in range(paragraphs):
+        lines += ['.PP', _paragraph(rng)]
+    if section in ('1', '8'):
+        lines.append('.SH OPTIONS')
+        for _ in range(rng.randint(1, 12)):
+            flag = rng.choice(WORDS)
+            lines += ['.TP', f'.BR \\-{flag[0]} ", " \\-\\-{flag}', _sentence(rng)]
+    lines += ['.SH SEE ALSO', f'.BR {rng.choice(SYLLABLES)} (1)', '']
+    return '\n'.join(lines)
+
+
+def _page_names(rng, count):
+    """Return ``count`` unique (name, section) pairs."""
+    sections = [section for section, _ in SECTION_WEIGHTS]
+    weights = [weight for _, weight in SECTION_WEIGHTS]
+    pages = []
+    seen = set()
+    while len(pages) < count:
+        if pages and rng.random() < SHARED_NAME_FRACTION:
+            # The same name in another section, like printf(1) and printf(3)
+            name, _ = rng.choice(pages)
+        else:
+            stem = ''.join(rng.choices(SYLLABLES, k=rng.randint(1, 3)))
+            name = None
+        section = rng.choices(sections, weights)[0]
+        if name is None:
+            name = f"{rng.choice(PREFIXES[section])}{stem}{len(pages) if rng.random() < 0.7 else ''}"
+        if (name, section) in seen:
+            continue
+        seen.add((name, section))
+        pages.append((name, section))
+    return pages
+
+
+def page_path(root, name, section, compress):
+    return os.path.join(root, f"man{section[0]}", f"{name}.{section}" + ('.gz' if compress else ''))
+
+
+def generate_hierarchy(directory, count, compress=True, seed=0):
+    """Write ``count`` pages below ``directory``/share/man.
+
+    Returns the hierarchy root.  A list of (name, section, description, path)
+    is written to ``directory``/pages.tsv for the fake apropos.
+    """
+    rng = random.Random(seed)
+    root = os.path.join(directory, HIERARCHY)
+    for section, _ in SECTION_WEIGHTS:
+        os.makedirs(os.path.join(root, f"man{section[0]}"), exist_ok=True)
+    pages = _page_names(rng, count)
+    written = []  # (name, section, description, path) of real pages
+    rows = []
+    for name, section in pages:
+        path = page_path(root, name, section, compress)
+        if written and rng.random() < LINK_FRACTION:
+            # Documented in another page of the same hierarchy
+            target_name, target_section, description, target_path = rng.choice(written)
+            relative = os.path.relpath(target_path, root)
+            if compress:
+                relative = relative[:-len('.gz')]
+            source = f'.so {relative}\n'
+        else:
+            description = ' '.join(rng.choices(WORDS, k=rng.randint(3, 9)))
+            source = page_source(rng, name, section, description)
+            written.append((name, section, description, path))
+        data = source.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6, mtime=0) if compress else data)
+        rows.append(f"{name}\t{section}\t{description}\t{path}\n")
+    with open(os.path.join(directory, PAGES_FILE), 'w', encoding='utf-8') as f:
+        f.writelines(rows)
+    return root
+
+
+def read_pages(directory):
+    """Return the (name, section, description, path) list written by generate_hierarchy."""
+    with open(os.path.join(directory, PAGES_FILE), encoding='utf-8') as f:
+        return [tuple(line.rstrip('\n').split('\t')) for line in f]
+
+
+# --- Fake man-db tools ---
+
+_TOOL_SCRIPT = '''#!{python}
+import sys
+sys.path.insert(0, {bench_dir!r})
+from synthetic_manpath import {function}
+sys.exit({function}(sys.argv[1:], {directory!r}))
+'''
+
+
+def install_fake_tools(directory):
+    """Write apropos, man and manpath for the hierarchy in ``directory``; returns the bin directory."""
+    bin_dir = os.path.join(directory, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    for tool in ('apropos', 'man', 'manpath'):
+        path = os.path.join(bin_dir, tool)
+        with open(path, 'w') as f:
+            f.write(_TOOL_SCRIPT.format(python=sys.executable, function=f"fake_{tool}",
+                                        bench_dir=os.path.dirname(os.path.abspath(__file__)),
+                                        directory=os.path.abspath(directory)))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+
+def fake_manpath(args, directory):
+    print(os.path.join(directory, HIERARCHY))
+    return 0
+
+
+def fake_apropos(args, directory):
+    """Print every page whose name or description contains the regex in ``args``."""
+    keywords = [arg for arg in args if not arg.startswith('-')]
+    pattern = re.compile(keywords[0] if keywords else '.', re.IGNORECASE)
+    found = False
+    out = sys.stdout
+    for name, section, description, _ in read_pages(directory):
+        if pattern.search(name) or pattern.search(description):
+            out.write(f"{name} ({section}) - {description}\n")
+            found = True
+    if not found:
+        print(f"{keywords[0] if keywords else ''}: nothing appropriate.", file=sys.stderr)
+        return 16
+    return 0
+
+
+def _find_page(root, name, section=None):
+    sections = [section] if section else SEARCH_ORDER
+    for candidate in sections:
+        for suffix in ('', '.gz'):
+            path = os.path.join(root, f"man{candidate[0]}", f"{name}.{candidate}{suffix}")
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _read_source(root, path, depth=0):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    if text.startswith('.so ') and depth < 5:
+        target = os.path.join(root, text[4:].strip())
+        for suffix in ('', '.gz'):
+            if os.path.exists(target + suffix):
+                return _read_source(root, target + suffix, depth + 1)
+    return text
+
+
+_FONT_ESCAPES = re.compile(r'\\f[BIRP]')
+
+
+def _format(source, as_html):
+    """A rough man(7) formatter: headings, paragraphs and text, nothing more."""
+    out = ['<html><body>'] if as_html else []
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            text = ' '.join(paragraph)
+            out.append(f"<p>{html.escape(text)}</p>" if as_html else text + '\n')
+            paragraph.clear()
+
+    for line in source.splitlines():
+        line = _FONT_ESCAPES.sub('', line).replace('\\-', '-')
+        if line.startswith('.SH '):
+            flush()
+            heading = line[4:].strip('"')
+            out.append(f"<h2>{html.escape(heading)}</h2>" if as_html else heading)
+        elif line.startswith(('.PP', '.TP', '.TH')):
+            flush()
+        elif line.startswith(('.B ', '.BR ', '.I ')):
+            paragraph.append(line.split(' ', 1)[1].replace('"', ''))
+        elif not line.startswith('.'):
+            paragraph.append(line)
+    flush()
+    if as_html:
+        out.append('</body></html>')
+    return '\n'.join(out) + '\n'
+
+
+def fake_man(args, directory):
+    """Handle ``man [-w] [-Tdevice] (-l FILE | [SECTION] NAME)``."""
+    root = os.path.join(directory, HIERARCHY)
+    where = '-w' in args
+    as_html = any(arg.startswith('-Thtml') for arg in args)
+    local = '-l' in args
+    operands = [arg for arg in args if not arg.startswith('-')]
+    if local:
+        path = operands[-1] if operands else None
+        if path is None or not os.path.exists(path):
+            print(f"man: {path}: No such file or directory", file=sys.stderr)
+            return 16
+    else:
+        if not operands:
+            print("What manual page do you want?", file=sys.stderr)
+            return 1
+        name = operands[-1]
+        section = operands[0] if len(operands) > 1 else None
+        path = _find_page(root, name, section)
+        if path is None:
+            print(f"No manual entry for {name}", file=sys.stderr)
+            return 16
+    if where:
+        print(path)
+        return 0
+    # A real man runs from the hierarchy for -l too; .so targets are relative to it
+    page_root = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    sys.stdout.write(_format(_read_source(page_root, path), as_html))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--plain', action='store_true', help="don't gzip the pages")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('directory')
+    args = parser.parse_args()
+    root = generate_hierarchy(args.directory, args.pages, not args.plain, args.seed)
+    bin_dir = install_fake_tools(args.directory)
+    print(f"{args.pages} pages in {root}")
+    print(f"export PATH={bin_dir}:$PATH MANPATH={root}")
+
+
+if __name__ == "__main__":
+    main()
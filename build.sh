@@ -26,7 +26,7 @@ pkgver=$(grep '^pkgver=' PKGBUILD | cut -d'=' -f2)
 mkdir -p "$pkgname-$pkgver"
 
 # Copy source files
-cp main.py man_page_list_widget.py man_page_viewer_widget.py menu_bar.py search_widget.py welcome_widget.py pickle-logo.ico pickles-man-viewer.desktop CHANGELOG.md version.txt "$pkgname-$pkgver/"
+cp main.py man_page_index.py index_cache.py index_loader.py manpath_scanner.py man_page_renderer.py render_cache.py render_service.py roff_renderer.py man_page_list_widget.py man_page_tree_model.py man_page_viewer_widget.py menu_bar.py search_widget.py search_index.py search_results_model.py fuzzy_match.py fulltext_index.py fulltext_indexer.py startup_profile.py instrumentation.py stall_watchdog.py html_export.py man_page_server.py welcome_widget.py pickle-logo.ico pickles-man-viewer.desktop CHANGELOG.md version.txt "$pkgname-$pkgver/"
 
 # Create tar.gz
 tar -czf "$pkgname-$pkgver.tar.gz" "$pkgname-$pkgver/"
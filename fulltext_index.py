@@ -0,0 +1,390 @@
+import html
+import lzma
+import marshal
+import math
+import os
+import re
+import threading
+from array import array
+
+from index_cache import cache_dir
+from manpath_scanner import open_page_source, scan_man_pages, strip_escapes
+
+# Bump FORMAT_VERSION whenever the layout of the stored index changes
+FULLTEXT_MAGIC = b'PMVF'
+FORMAT_VERSION = 1
+FULLTEXT_FILE = 'fulltext.bin'
+
+# Default budgets.  Once exceeded, the terms found in the most pages are
+# dropped first: they carry the least weight in BM25 ranking.
+MEMORY_BUDGET = 48 * 1024 * 1024
+DISK_BUDGET = 32 * 1024 * 1024
+# Rough cost of one posting (two array items), one term and one document in memory
+POSTING_BYTES = 6
+TERM_BYTES = 120
+DOC_BYTES = 240
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SNIPPET_CHARS = 160
+EXTRACT_CHUNK_SIZE = 32  # Pages handed to a worker process at a time
+
+_TOKEN = re.compile(r'[a-z0-9_]+')
+# Macros whose arguments are page text
+_TEXT_MACROS = re.compile(
+    r"^[.'](?:B|I|SM|SB|BR|RB|BI|IB|IR|RI|SH|SS|TP|IP|OP|Nm|Nd|Fl|Ar|Cm|Op|It|Sh|Ss|Xr|Pa|Ev|Er"
+    r"|Dv|Fn|Fa|Ft|Va|Em|Sy|Li|Dq|Sq|Ql|Pq|D1|Dl)\s+(.*)$"
+)
+
+
+def _tokens(text):
+    return _TOKEN.findall(text.lower())
+
+
+def page_text_lines(path):
+    """Return the readable text of a page source as a list of lines.
+
+    This is not a renderer: requests are dropped, the arguments of the
+    common font and structure macros are kept and escapes are removed.
+    Returns None for pages that are only a .so link to another page.
+    """
+    with open_page_source(path) as f:
+        source = f.read()
+    if source.lstrip('\n').startswith('.so '):
+        return None
+    lines = []
+    for line in source.splitlines():
+        if line.startswith('.') or line.startswith("'"):
+            macro = _TEXT_MACROS.match(line)
+            if not macro:
+                continue
+            line = macro.group(1).replace('"', '')
+        line = strip_escapes(line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def _extract_terms(page):
+    """Worker process entry point: return (page, {term: frequency}, length) or None.
+
+    .so links are returned with no terms, so they are remembered as indexed.
+    """
+    name, section, path, mtime_ns, size = page
+    try:
+        lines = page_text_lines(path)
+    except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+        print(f"Error reading {path}: {e}")
+        return None
+    if lines is None:
+        return page, {}, 0
+    frequencies = {}
+    length = 0
+    for token in _tokens(' '.join(lines)):
+        frequencies[token] = frequencies.get(token, 0) + 1
+        length += 1
+    return page, frequencies, length
+
+
+def _lower_priority():
+    try:
+        os.nice(19)
+    except OSError:
+        pass
+
+
+def _page_state(name, section, path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (name, section, path, st.st_mtime_ns, st.st_size)
+
+
+class FullTextIndex:
+    """Inverted index over the text of every man page, ranked with BM25.
+
+    Each indexed page is a document; ``postings`` maps a term to parallel
+    arrays of document ids and term frequencies.  ``update()`` re-reads only
+    pages whose source changed since they were indexed.  The index is kept
+    within ``memory_budget`` bytes (estimated) and is only written to disk if
+    it fits in ``disk_budget``; when over budget the most common terms are
+    dropped.  ``search()`` may run on another thread while ``update()`` works.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET, path=None):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.path = path or os.path.join(cache_dir(), FULLTEXT_FILE)
+        # Document columns; removed documents keep their id with path None until saved
+        self.doc_names = []
+        self.doc_sections = []
+        self.doc_paths = []
+        self.doc_states = []  # (mtime_ns, size) when indexed
+        self.doc_lengths = array('I')
+        self.postings = {}  # term -> (array of doc ids, array of frequencies)
+        self.dropped_terms = set()  # Pruned to stay within budget
+        self._total_length = 0
+        self._live_docs = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._live_docs
+
+    # --- Persistence ---
+
+    def load(self):
+        """Read the stored index; returns False if there is none or it is unusable."""
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(FULLTEXT_MAGIC)) != FULLTEXT_MAGIC:
+                    return False
+                if f.read(1) != bytes([FORMAT_VERSION]):
+                    return False
+                docs, lengths, postings, dropped = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        names, sections, paths, states = docs
+        with self._lock:
+            self.doc_names, self.doc_sections, self.doc_paths = names, sections, paths
+            self.doc_states = states
+            self.doc_lengths = array('I', lengths)
+            self.postings = {term: (array('I', ids), array('H', frequencies))
+                             for term, (ids, frequencies) in postings.items()}
+            self.dropped_terms = set(dropped)
+            self._recount()
+        return True
+
+    def save(self):
+        """Drop removed documents and write the index if it fits in the disk budget."""
+        self._compact()
+        with self._lock:
+            data = self._serialize()
+            while len(data) > self.disk_budget and self.postings:
+                self._drop_common_terms()
+                data = self._serialize()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(FULLTEXT_MAGIC)
+                f.write(bytes([FORMAT_VERSION]))
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing full text index: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _serialize(self):
+        postings = {term: (ids.tobytes(), frequencies.tobytes())
+                    for term, (ids, frequencies) in self.postings.items()}
+        docs = (self.doc_names, self.doc_sections, self.doc_paths, self.doc_states)
+        return marshal.dumps((docs, self.doc_lengths.tobytes(), postings, sorted(self.dropped_terms)))
+
+    # --- Updating ---
+
+    def stale_pages(self, pages):
+        """Split scanned (name, section, path) pages into (to index, doc ids to remove)."""
+        with self._lock:
+            by_path = {path: doc_id for doc_id, path in enumerate(self.doc_paths) if path is not None}
+            states = list(self.doc_states)
+        to_index = []
+        for name, section, path in pages:
+            state = _page_state(name, section, path)
+            if state is None:
+                continue
+            doc_id = by_path.pop(path, None)
+            if doc_id is not None and tuple(states[doc_id]) == state[3:]:
+                continue
+            to_index.append(state)
+            if doc_id is not None:
+                by_path[path] = doc_id  # Re-indexed, so its old document goes
+        return to_index, set(by_path.values())
+
+    def update(self, pages=None, max_workers=None, should_stop=None, progress=None):
+        """Bring the index up to date with the pages below the man path.
+
+        Changed and new pages are read by a pool of low priority worker
+        processes; pages that disappeared are removed.  ``should_stop()`` is
+        polled between results, and ``progress(done, total)`` called as they
+        arrive.  Returns True if anything changed.
+        """
+        if pages is None:
+            pages = scan_man_pages()
+        to_index, removed = self.stale_pages(pages)
+        if removed:
+            self._remove(removed)
+        if not to_index:
+            return bool(removed)
+        # Imported on the indexing thread rather than while the interface starts
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        total = len(to_index)
+        done = 0
+        # forkserver: forking this (multi-threaded) GUI process directly is unsafe
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_lower_priority,
+                                   mp_context=multiprocessing.get_context('forkserver'))
+        try:
+            batch = []
+            for result in pool.map(_extract_terms, to_index, chunksize=EXTRACT_CHUNK_SIZE):
+                done += 1
+                if result is not None:
+                    batch.append(result)
+                if len(batch) >= EXTRACT_CHUNK_SIZE * 4:
+                    self._add(batch)
+                    batch = []
+                if progress is not None:
+                    progress(done, total)
+                if should_stop is not None and should_stop():
+                    break
+            self._add(batch)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._enforce_memory_budget()
+        return True
+
+    def _add(self, results):
+        with self._lock:
+            for (name, section, path, mtime_ns, size), frequencies, length in results:
+                doc_id = len(self.doc_paths)
+                self.doc_names.append(name)
+                self.doc_sections.append(section)
+                self.doc_paths.append(path)
+                self.doc_states.append((mtime_ns, size))
+                self.doc_lengths.append(length)
+                if length:
+                    self._total_length += length
+                    self._live_docs += 1
+                for term, frequency in frequencies.items():
+                    if term in self.dropped_terms:
+                        continue
+                    posting = self.postings.get(term)
+                    if posting is None:
+                        posting = self.postings[term] = (array('I'), array('H'))
+                    posting[0].append(doc_id)
+                    posting[1].append(min(frequency, 0xffff))
+
+    # Only the updating thread changes the index, so the new postings are built
+    # outside the lock from the current ones and swapped in; search() only
+    # waits for the swap.
+
+    def _remove(self, doc_ids):
+        changed = {}
+        for term, (ids, frequencies) in list(self.postings.items()):
+            if doc_ids.isdisjoint(ids):
+                continue
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in doc_ids]
+            changed[term] = (array('I', (ids[i] for i in keep)),
+                             array('H', (frequencies[i] for i in keep))) if keep else None
+        with self._lock:
+            for doc_id in doc_ids:
+                self.doc_paths[doc_id] = None
+            for term, posting in changed.items():
+                if posting is None:
+                    del self.postings[term]
+                else:
+                    self.postings[term] = posting
+            self._recount()
+
+    def _compact(self):
+        """Renumber the documents so removed ones no longer take up an id."""
+        live = [doc_id for doc_id, path in enumerate(self.doc_paths) if path is not None]
+        if len(live) == len(self.doc_paths):
+            return
+        new_ids = {doc_id: new_id for new_id, doc_id in enumerate(live)}
+        # Removed documents are in no posting, and the order of the ids is kept
+        postings = {term: (array('I', map(new_ids.__getitem__, ids)), frequencies)
+                    for term, (ids, frequencies) in self.postings.items()}
+        with self._lock:
+            self.doc_names = [self.doc_names[doc_id] for doc_id in live]
+            self.doc_sections = [self.doc_sections[doc_id] for doc_id in live]
+            self.doc_paths = [self.doc_paths[doc_id] for doc_id in live]
+            self.doc_states = [self.doc_states[doc_id] for doc_id in live]
+            self.doc_lengths = array('I', (self.doc_lengths[doc_id] for doc_id in live))
+            self.postings = postings
+
+    def _recount(self):
+        # Empty documents (.so links) are not counted for ranking
+        live = [doc_id for doc_id, path in enumerate(self.doc_paths)
+                if path is not None and self.doc_lengths[doc_id]]
+        self._live_docs = len(live)
+        self._total_length = sum(self.doc_lengths[doc_id] for doc_id in live)
+
+    def memory_estimate(self):
+        postings = sum(len(ids) for ids, _ in self.postings.values())
+        return (postings * POSTING_BYTES + len(self.postings) * TERM_BYTES
+                + len(self.doc_paths) * DOC_BYTES)
+
+    def _enforce_memory_budget(self):
+        while self.postings and self.memory_estimate() > self.memory_budget:
+            self._drop_common_terms()
+
+    def _drop_common_terms(self):
+        """Drop the 1% of terms (at least one) that appear in the most pages."""
+        by_frequency = sorted(self.postings, key=lambda term: len(self.postings[term][0]), reverse=True)
+        for term in by_frequency[:max(1, len(by_frequency) // 100)]:
+            del self.postings[term]
+            self.dropped_terms.add(term)
+
+    # --- Searching ---
+
+    def search(self, query, limit=20):
+        """Return up to ``limit`` (score, name, section, path) for ``query``, best first."""
+        terms = _tokens(query)
+        if not terms:
+            return []
+        with self._lock:
+            live_docs = self._live_docs
+            if not live_docs:
+                return []
+            average_length = self._total_length / live_docs
+            scores = {}
+            for term in set(terms):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                ids, frequencies = posting
+                idf = math.log(1 + (live_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                lengths = self.doc_lengths
+                for doc_id, frequency in zip(ids, frequencies):
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / average_length)
+                    score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [(score, self.doc_names[doc_id], self.doc_sections[doc_id], self.doc_paths[doc_id])
+                    for doc_id, score in best]
+
+
+def snippet_html(path, query, width=SNIPPET_CHARS):
+    """Return an HTML excerpt of the page around the best match for ``query``.
+
+    The page is read again rather than storing its text in the index.
+    """
+    terms = set(_tokens(query))
+    try:
+        lines = page_text_lines(path) or []
+    except (OSError, EOFError, ValueError, lzma.LZMAError):
+        return ''
+    best_line = None
+    best_hits = 0
+    for line in lines:
+        hits = len(terms.intersection(_tokens(line)))
+        if hits > best_hits:
+            best_line, best_hits = line, hits
+            if hits == len(terms):
+                break
+    if best_line is None:
+        return ''
+    text = best_line if len(best_line) <= width else best_line[:width].rsplit(' ', 1)[0] + ' ...'
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE)
+    parts = pattern.split(text)
+    # Odd parts are the matched terms
+    return ''.join(f'<b>{html.escape(part)}</b>' if i % 2 else html.escape(part)
+                   for i, part in enumerate(parts))
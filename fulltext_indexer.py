@@ -0,0 +1,50 @@
+import traceback
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+import instrumentation
+
+# Progress is reported at most every this many pages
+PROGRESS_STEP = 100
+
+
+class FullTextIndexer(QThread):
+    """Loads the stored full text index and brings it up to date off the GUI thread.
+
+    ``index_updated`` fires once the stored index has been read (so searches
+    work right away, possibly on slightly stale text) and again after pages
+    that changed since have been re-indexed.  The page text is read by a
+    process pool; this thread only merges the results.
+    """
+    index_updated = pyqtSignal()
+    progress = pyqtSignal(int, int)  # pages indexed, pages to index
+
+    def __init__(self, fulltext_index, parent=None):
+        super().__init__(parent)
+        self.fulltext_index = fulltext_index
+
+    def run(self):
+        # An exception escaping a QThread aborts the application, and a
+        # failed update (a worker process dying, say) still leaves a usable index
+        try:
+            self._update()
+        except Exception:
+            print("Error updating the full text index:")
+            traceback.print_exc()
+
+    def _update(self):
+        if self.fulltext_index.load():
+            self.index_updated.emit()
+        if self.isInterruptionRequested():
+            return
+
+        def report(done, total):
+            if done == total or done % PROGRESS_STEP == 0:
+                self.progress.emit(done, total)
+
+        with instrumentation.span("full text update"):
+            changed = self.fulltext_index.update(should_stop=self.isInterruptionRequested, progress=report)
+        if changed:
+            # Saved even if interrupted, so the next start resumes where this one stopped
+            self.fulltext_index.save()
+            self.index_updated.emit()
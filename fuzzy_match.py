@@ -0,0 +1,174 @@
+"""fzf style fuzzy matching of page names.
+
+A query matches a name if its characters appear in the name in order
+("sctl" matches systemctl).  Each matched character scores SCORE_MATCH,
+plus a bonus when it starts a word or directly follows the previous
+matched character, minus a penalty for the gap before it.  Characters are
+matched greedily from the left.
+
+FuzzyMatcher scores the whole name list with NumPy when it is installed,
+working on a 2D array of encoded names in batches, and falls back to a
+plain Python loop over ``fuzzy_score`` otherwise.  Both give the same
+results.
+"""
+import heapq
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 8
+BONUS_FIRST_CHAR = 2  # Multiplies the boundary bonus of the first query character
+BONUS_CONSECUTIVE = 8
+PENALTY_GAP_START = 3
+PENALTY_GAP_EXTENSION = 1
+
+# Names are matched on their first MAX_NAME_LENGTH characters
+MAX_NAME_LENGTH = 64
+# Rows scored per NumPy batch, bounding the temporary arrays
+BATCH_ROWS = 8192
+
+SEPARATORS = b' -_./:'
+
+
+def encode(text):
+    """Lowercase ``text`` and encode it as the bytes the matcher works on."""
+    return text.lower().encode('ascii', 'replace')[:MAX_NAME_LENGTH]
+
+
+def _char_mask(encoded):
+    mask = 0
+    for code in encoded:
+        mask |= 1 << (code & 63)
+    return mask
+
+
+def _gap_penalty(gap):
+    return PENALTY_GAP_START + (gap - 1) * PENALTY_GAP_EXTENSION if gap > 0 else 0
+
+
+def fuzzy_score(query, name):
+    """Return the score of encoded ``name`` for encoded ``query``, or None."""
+    score = 0
+    previous = -1
+    for j, code in enumerate(query):
+        position = name.find(code, previous + 1)
+        if position < 0:
+            return None
+        boundary = position == 0 or name[position - 1] in SEPARATORS
+        if j == 0:
+            score += SCORE_MATCH + boundary * BONUS_BOUNDARY * BONUS_FIRST_CHAR
+        else:
+            score += SCORE_MATCH + boundary * BONUS_BOUNDARY
+            if position == previous + 1:
+                score += BONUS_CONSECUTIVE
+            else:
+                score -= _gap_penalty(position - previous - 1)
+        previous = position
+    return score
+
+
+def _rank_key(score, length):
+    # Higher scores first; among equal scores, shorter names first
+    return score * 1024 - length
+
+
+class FuzzyMatcher:
+    """Ranks names against a query; see the module docstring."""
+
+    def __init__(self, names, use_numpy=True):
+        self.names = list(names)
+        self._encoded = [encode(name) for name in self.names]
+        self.use_numpy = use_numpy and numpy is not None
+        if self.use_numpy:
+            self._build_arrays()
+
+    def _build_arrays(self):
+        count = len(self._encoded)
+        self._lengths = numpy.fromiter((len(e) for e in self._encoded), dtype=numpy.int32, count=count)
+        width = int(self._lengths.max()) if count else 1
+        # Row i holds name i's bytes, zero padded
+        padded = b''.join(e.ljust(width, b'\0') for e in self._encoded)
+        self._codes = numpy.frombuffer(padded, dtype=numpy.uint8).reshape(count, width)
+        # Bit (code & 63) is set for every byte in the name: a cheap first filter
+        self._masks = numpy.fromiter((_char_mask(e) for e in self._encoded), dtype=numpy.uint64, count=count)
+        self._is_separator = numpy.zeros(256, dtype=bool)
+        self._is_separator[list(SEPARATORS)] = True
+
+    def top(self, query, limit=20, exclude=()):
+        """Return up to ``limit`` (score, name) pairs, best first.
+
+        Names in ``exclude`` are skipped, e.g. ones already listed elsewhere.
+        """
+        query = encode(query)
+        if not query or not self.names:
+            return []
+        # Enough candidates that ``limit`` remain after dropping excluded names
+        wanted = limit + len(exclude)
+        if self.use_numpy:
+            ranked = self._top_numpy(query, wanted)
+        else:
+            ranked = self._top_python(query, wanted)
+        results = []
+        for score, i in ranked:
+            name = self.names[i]
+            if name in exclude:
+                continue
+            results.append((score, name))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _top_python(self, query, wanted):
+        matches = []
+        for i, name in enumerate(self._encoded):
+            score = fuzzy_score(query, name)
+            if score is not None:
+                matches.append((_rank_key(score, len(name)), -i, score))
+        return [(score, -negative_id) for _, negative_id, score in heapq.nlargest(wanted, matches)]
+
+    def _top_numpy(self, query, wanted):
+        query_mask = numpy.uint64(_char_mask(query))
+        candidates = numpy.flatnonzero((self._masks & query_mask) == query_mask)
+        if not len(candidates):
+            return []
+        batches = [self._score_batch(query, candidates[start:start + BATCH_ROWS])
+                   for start in range(0, len(candidates), BATCH_ROWS)]
+        ids = numpy.concatenate([ids for ids, _ in batches])
+        scores = numpy.concatenate([scores for _, scores in batches])
+        # Folding the id in breaks ties the way the Python path does, so the
+        # partition below keeps the same rows
+        keys = _rank_key(scores, self._lengths[ids]) * len(self.names) - ids
+        if len(ids) > wanted:
+            # Only the best ``wanted`` rows need sorting
+            keep = numpy.argpartition(-keys, wanted - 1)[:wanted]
+            ids, scores, keys = ids[keep], scores[keep], keys[keep]
+        order = numpy.argsort(-keys)
+        return list(zip(scores[order].tolist(), ids[order].tolist()))
+
+    def _score_batch(self, query, rows):
+        """Score ``rows`` (ids) for ``query``; returns (matching ids, their scores)."""
+        codes = self._codes[rows]
+        count, width = codes.shape
+        row_index = numpy.arange(count)
+        columns = numpy.arange(width)
+        previous = numpy.full(count, -1, dtype=numpy.int64)
+        scores = numpy.zeros(count, dtype=numpy.int64)
+        alive = numpy.ones(count, dtype=bool)
+        for j, code in enumerate(query):
+            hits = (codes == code) & (columns > previous[:, None])
+            position = hits.argmax(axis=1)
+            alive &= hits[row_index, position]
+            before = codes[row_index, numpy.maximum(position - 1, 0)]
+            boundary = (position == 0) | self._is_separator[before]
+            if j == 0:
+                scores += SCORE_MATCH + boundary * (BONUS_BOUNDARY * BONUS_FIRST_CHAR)
+            else:
+                gap = position - previous - 1
+                scores += SCORE_MATCH + boundary * BONUS_BOUNDARY
+                scores += numpy.where(gap == 0, BONUS_CONSECUTIVE,
+                                      -(PENALTY_GAP_START + (gap - 1) * PENALTY_GAP_EXTENSION))
+            previous = position
+        return rows[alive], scores[alive]
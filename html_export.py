@@ -0,0 +1,273 @@
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from man_page_index import section_title
+from man_page_renderer import RENDER_TIMEOUT, get_man_page_html, page_title, resolve_man_page
+
+# Pages handed to a worker process at a time
+EXPORT_CHUNK_SIZE = 4
+
+# Seconds between progress lines, and between saves of the resume state
+PROGRESS_INTERVAL = 2.0
+STATE_SAVE_INTERVAL = 10.0
+
+# What was exported from which source file, so a later export can skip it
+STATE_FILE = '.export-state.json'
+STATE_VERSION = 1
+
+_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.DOTALL | re.IGNORECASE)
+
+_DOCUMENT = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+</head>
+<body>
+{navigation}{body}
+</body>
+</html>
+"""
+
+
+def _file_name(text):
+    # Only what can't be in a file name is escaped, the way a URL would be
+    return text.replace('%', '%25').replace('/', '%2F')
+
+
+def page_file(name, section):
+    """Return a page's file relative to the export directory."""
+    return os.path.join(_file_name(section), _file_name(name) + '.html')
+
+
+def _source_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [path, st.st_mtime_ns, st.st_size]
+
+
+def _write_file(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def html_document(title, navigation, body):
+    """Wrap ``body`` in a page of the site, with ``navigation`` links above it."""
+    if navigation:
+        navigation = f"<p>{navigation}</p>\n"
+    return _DOCUMENT.format(title=html.escape(title), navigation=navigation, body=body)
+
+
+def page_document(name, section, html_content):
+    """Return a rendered page as a page of the site, linked to its section."""
+    body = _BODY.search(html_content)
+    navigation = (f'<a href="index.html">Section {html.escape(section)}</a> | '
+                  f'<a href="../index.html">All sections</a>')
+    return html_document(page_title(name, section), navigation, body.group(1) if body else html_content)
+
+
+def page_url(name, section):
+    """Return the URL of a page relative to the site's front page."""
+    return f"{quote(_file_name(section))}/{quote(_file_name(name))}.html"
+
+
+def name_from_file(file_name):
+    """Undo the escaping of a page or section in a file name."""
+    return file_name.replace('%2F', '/').replace('%25', '%')
+
+
+def section_heading(section):
+    title = section_title(section)
+    return title if title == f"Section {section}" else f"Section {section}: {title}"
+
+
+def site_index_html(index, header=''):
+    """Return the site's front page, listing the sections of ``index`` below ``header``."""
+    links = []
+    for section, names in sorted(index.by_section().items()):
+        links.append(f'<li><a href="{quote(_file_name(section))}/index.html">'
+                     f'{html.escape(section_heading(section))}</a> ({len(names)} pages)</li>')
+    return html_document("Man pages", '',
+                         header + "<h1>Man pages</h1>\n<ul>\n" + "\n".join(links) + "\n</ul>")
+
+
+def section_index_html(index, section):
+    """Return the index of one section, listing its pages and their descriptions."""
+    items = []
+    for name in index.by_section().get(section, ()):
+        description = index.description(name, section)
+        items.append(f'<li><a href="{quote(_file_name(name))}.html">{html.escape(name)}</a>'
+                     + (f' - {html.escape(description)}' if description else '') + '</li>')
+    title = section_heading(section)
+    return html_document(title, '<a href="../index.html">All sections</a>',
+                         f"<h1>{html.escape(title)}</h1>\n<ul>\n" + "\n".join(items) + "\n</ul>")
+
+
+def _export_page(job):
+    """Worker process entry point: render one page to its file.
+
+    Returns (relative file, source state or None).  The state is None when
+    the page couldn't be rendered, so it is tried again next time.
+    """
+    name, section, path, directory, relative, renderer, timeout = job
+    if not path:
+        path = resolve_man_page(name, section)
+    html_content = get_man_page_html(name, None, timeout, renderer=renderer,
+                                     section=section, source_path=path)
+    try:
+        _write_file(os.path.join(directory, relative), page_document(name, section, html_content))
+    except OSError as e:
+        print(f"Error writing {relative}: {e}")
+        return relative, None
+    if html_content.startswith("<h1>Error") or not path:
+        return relative, None
+    return relative, _source_state(path)
+
+
+class HtmlExport:
+    """Renders every page of a ManPageIndex into a static HTML site.
+
+    The site has an index of sections, an index per section listing its
+    pages with their descriptions, and one file per page.  Pages are
+    rendered by a pool of worker processes, one per core by default.
+
+    ``STATE_FILE`` in the directory records the source file (path, mtime
+    and size) each page was rendered from.  An export into the same
+    directory only renders pages whose source changed or that are new,
+    removes the files of pages that disappeared, and always rewrites the
+    indexes.  The state is saved as rendering goes, so an interrupted
+    export resumes where it stopped.
+    """
+
+    def __init__(self, index, directory, renderer='groff', timeout=RENDER_TIMEOUT, max_workers=None):
+        self.index = index
+        self.directory = directory
+        self.renderer = renderer
+        self.timeout = timeout
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.state = {}  # relative file -> [source path, mtime_ns, size]
+        self.rendered = 0
+        self.failed = 0
+        self.skipped = 0
+        self.removed = 0
+
+    # --- Resume state ---
+
+    def _state_path(self):
+        return os.path.join(self.directory, STATE_FILE)
+
+    def load_state(self):
+        try:
+            with open(self._state_path(), encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring export state {self._state_path()}: {e}")
+            return
+        # Pages rendered by the other renderer or an older layout are all rendered again
+        if saved.get('version') == STATE_VERSION and saved.get('renderer') == self.renderer:
+            self.state = saved.get('pages', {})
+
+    def save_state(self):
+        try:
+            _write_file(self._state_path(), json.dumps(
+                {'version': STATE_VERSION, 'renderer': self.renderer, 'pages': self.state}))
+        except OSError as e:
+            print(f"Error saving export state: {e}")
+
+    def _is_current(self, relative, path):
+        saved = self.state.get(relative)
+        if saved is None or (path and saved[0] != path):
+            return False
+        if not os.path.exists(os.path.join(self.directory, relative)):
+            return False
+        return _source_state(saved[0]) == saved
+
+    # --- Export ---
+
+    def run(self):
+        """Export the site; returns the number of pages rendered per second."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_state()
+        index = self.index
+        jobs = []
+        current = set()
+        for entry_id, name in enumerate(index.names):
+            section = index.section(entry_id)
+            path = index.paths[entry_id]
+            relative = page_file(name, section)
+            current.add(relative)
+            if self._is_current(relative, path):
+                self.skipped += 1
+                continue
+            os.makedirs(os.path.join(self.directory, _file_name(section)), exist_ok=True)
+            jobs.append((name, section, path, self.directory, relative, self.renderer, self.timeout))
+        self._remove_stale(current)
+
+        print(f"Exporting {len(jobs)} of {len(index)} pages to {self.directory} "
+              f"with {self.max_workers} processes ({self.skipped} unchanged)")
+        start = time.perf_counter()
+        try:
+            if jobs:
+                self._render(jobs, start)
+        finally:
+            self.save_state()
+        elapsed = time.perf_counter() - start
+        self.write_indexes()
+        rate = self.rendered / elapsed if elapsed > 0 else 0.0
+        print(f"Exported {self.rendered} pages in {elapsed:.1f}s ({rate:.1f} pages/s); "
+              f"{self.skipped} unchanged, {self.failed} failed, {self.removed} removed")
+        return rate
+
+    def _render(self, jobs, start):
+        # forkserver, as the index loaders may have left threads behind
+        pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context('forkserver'))
+        last_progress = last_save = start
+        try:
+            for relative, state in pool.map(_export_page, jobs, chunksize=EXPORT_CHUNK_SIZE):
+                self.rendered += 1
+                if state is None:
+                    self.failed += 1
+                    self.state.pop(relative, None)
+                else:
+                    self.state[relative] = state
+                now = time.perf_counter()
+                if now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    print(f"{self.rendered}/{len(jobs)} pages, {self.rendered / (now - start):.1f} pages/s")
+                if now - last_save >= STATE_SAVE_INTERVAL:
+                    last_save = now
+                    self.save_state()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _remove_stale(self, current):
+        for relative in [relative for relative in self.state if relative not in current]:
+            del self.state[relative]
+            try:
+                os.remove(os.path.join(self.directory, relative))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing {relative}: {e}")
+                continue
+            self.removed += 1
+
+    def write_indexes(self):
+        """Write the section index and one index per section."""
+        for section in self.index.by_section():
+            _write_file(os.path.join(self.directory, _file_name(section), 'index.html'),
+                        section_index_html(self.index, section))
+        _write_file(os.path.join(self.directory, 'index.html'), site_index_html(self.index))
@@ -0,0 +1,96 @@
+import glob
+import marshal
+import os
+import subprocess
+
+import instrumentation
+
+# Bump FORMAT_VERSION whenever the layout of the cached payload changes
+CACHE_MAGIC = b'PMVI'
+FORMAT_VERSION = 3
+INDEX_CACHE_FILE = 'index.bin'
+
+# man-db keeps one database per hierarchy under here (plus per-user ones)
+MAN_DB_CACHE_DIR = '/var/cache/man'
+DEFAULT_MAN_PATHS = ['/usr/local/share/man', '/usr/share/man']
+
+
+def cache_dir():
+    """Return the per-user cache directory, honouring $XDG_CACHE_HOME."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pickles-man-viewer')
+
+
+def man_paths():
+    """Return the man page hierarchies searched by man, as reported by `manpath`."""
+    try:
+        with instrumentation.span("subprocess manpath"):
+            result = subprocess.run(['manpath', '-q'], capture_output=True, text=True, check=True)
+        output = result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        output = os.environ.get('MANPATH', '')
+    paths = [path for path in output.split(':') if path]
+    return paths or list(DEFAULT_MAN_PATHS)
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def index_signature(paths=None):
+    """Describe the state of every man hierarchy and man-db database.
+
+    The result changes whenever a page is added to or removed from a section
+    directory (which bumps that directory's mtime) or mandb rewrites one of
+    its databases, so it can be used to decide whether a cached index is stale.
+    """
+    if paths is None:
+        paths = man_paths()
+    watched = []
+    for path in paths:
+        watched.append(path)
+        watched.extend(sorted(glob.glob(os.path.join(path, 'man*'))))
+        watched.extend(sorted(glob.glob(os.path.join(path, 'index.*'))))
+    watched.extend(sorted(glob.glob(os.path.join(MAN_DB_CACHE_DIR, '**', 'index.*'), recursive=True)))
+    return tuple((path, _mtime_ns(path)) for path in watched)
+
+
+def read_index_cache(signature):
+    """Return the cached index columns (see ManPageIndex.columns) for ``signature``, or None on a miss."""
+    path = os.path.join(cache_dir(), INDEX_CACHE_FILE)
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            if f.read(1) != bytes([FORMAT_VERSION]):
+                return None
+            # marshal.loads on the whole buffer is far faster than marshal.load(f)
+            cached_signature, columns = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if cached_signature != signature:
+        return None
+    return columns
+
+
+def write_index_cache(signature, columns):
+    """Store index columns for ``signature``; failures are reported but not fatal."""
+    directory = cache_dir()
+    path = os.path.join(directory, INDEX_CACHE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(bytes([FORMAT_VERSION]))
+            marshal.dump((signature, columns), f)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError) as e:
+        print(f"Error writing man page index cache: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
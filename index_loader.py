@@ -0,0 +1,40 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+import instrumentation
+from man_page_index import ManPageIndexError, iter_index_batches
+
+
+class ManPageIndexLoader(QThread):
+    """Builds the man page index off the GUI thread.
+
+    Entries are delivered in batches through ``batch_loaded`` so the pages can
+    fill in while apropos is still running; the receiving slot runs on the GUI
+    thread and is the only place the shared ManPageIndex is modified.
+    """
+    batch_loaded = pyqtSignal(object)  # list of (name, section, description, path)
+    load_finished = pyqtSignal(str)    # error message, empty on success
+
+    def __init__(self, use_cache=True, source='apropos', parent=None):
+        super().__init__(parent)
+        self.use_cache = use_cache
+        self.source = source
+
+    def run(self):
+        with instrumentation.span("index load", source=self.source):
+            self._load()
+
+    def _load(self):
+        batches = iter_index_batches(self.use_cache, source=self.source)
+        try:
+            for batch in batches:
+                if self.isInterruptionRequested():
+                    return
+                self.batch_loaded.emit(batch)
+        except ManPageIndexError as e:
+            print(e)
+            self.load_finished.emit(str(e))
+            return
+        finally:
+            # Kills apropos if we stopped early
+            batches.close()
+        self.load_finished.emit("")
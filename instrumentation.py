@@ -0,0 +1,204 @@
+"""Tracing and metrics for finding where time goes.
+
+Code wraps interesting work in ``span(name)`` blocks and bumps counters with
+``count(name)``.  Nothing is recorded until ``enable_tracing`` is called
+(``--trace FILE``): until then ``span`` returns a shared do-nothing context
+manager and ``count`` returns at once, so instrumented code costs a
+function call and a global lookup.
+
+While enabled, every span becomes a Chrome trace "complete" event on the
+thread that ran it and is added to a latency histogram under its name, and
+every counter change becomes a counter event.  ``write_trace`` saves the
+events as Chrome trace-event JSON (open it in chrome://tracing or
+https://ui.perfetto.dev), with the final counters and histograms under
+``otherData``.
+"""
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds, in milliseconds; slower samples go in a last bucket
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Events kept per trace; later ones are only counted, so a long session can't use up memory
+MAX_TRACE_EVENTS = 1000000
+
+_recorder = None
+
+
+class Histogram:
+    """Counts of samples per latency bucket, plus their total and maximum."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, milliseconds):
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if milliseconds <= bound:
+                break
+        else:
+            i = len(HISTOGRAM_BUCKETS_MS)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'buckets': {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class TraceRecorder:
+    """Collects trace events, counters and histograms; safe to use from any thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.dropped_events = 0
+        self.counters = {}
+        self.histograms = {}
+        self._threads = {}  # thread id -> name
+        self._lock = threading.Lock()
+
+    def _timestamp(self, seconds):
+        # Trace timestamps are microseconds
+        return round((seconds - self.origin) * 1e6, 1)
+
+    def _append(self, event):
+        # Called with the lock held
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = thread.name
+        if len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append(event)
+        else:
+            self.dropped_events += 1
+
+    def add_span(self, name, start, end, args):
+        event = {'name': name, 'ph': 'X', 'ts': self._timestamp(start),
+                 'dur': round((end - start) * 1e6, 1), 'pid': self.pid, 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._append(event)
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add((end - start) * 1000)
+
+    def count(self, name, value):
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self._append({'name': name, 'ph': 'C', 'ts': self._timestamp(time.perf_counter()),
+                          'pid': self.pid, 'tid': threading.get_ident(), 'args': {'value': total}})
+
+    def to_json(self):
+        with self._lock:
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': ident,
+                         'args': {'name': name}} for ident, name in self._threads.items()]
+            return {
+                'traceEvents': metadata + self.events,
+                'displayTimeUnit': 'ms',
+                'otherData': {
+                    'counters': dict(self.counters),
+                    'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                    'dropped_events': self.dropped_events,
+                },
+            }
+
+    def write(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.to_json(), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing trace to {self.path}: {e}")
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        recorder = _recorder
+        if recorder is not None:
+            recorder.add_span(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# --- Public interface ---
+
+def span(name, **args):
+    """Return a context manager timing the enclosed block as ``name``.
+
+    ``args`` are shown with the event in the trace viewer.
+    """
+    if _recorder is None:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def add_span(name, start, end, **args):
+    """Record a span measured elsewhere, from ``time.perf_counter()`` values.
+
+    For work that starts and ends in different callbacks, like a page load.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_span(name, start, end, args)
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name``."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def tracing_enabled():
+    return _recorder is not None
+
+
+def enable_tracing(path):
+    """Start recording; ``write_trace`` saves everything to ``path``."""
+    global _recorder
+    _recorder = TraceRecorder(path)
+
+
+def write_trace():
+    """Write the trace file if tracing is enabled; it can be called more than once."""
+    if _recorder is not None:
+        _recorder.write()
@@ -1,17 +1,30 @@
 #!/usr/bin/env python
+import time
+_IMPORT_START = time.perf_counter()
+
+import argparse
 import sys
 import os
 # sys.path.insert(0, '/etc/pickles-linux/pickles-man-viewer')  # Commented out for development
 
-from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget, QMessageBox, QDialog, QVBoxLayout, QLabel
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QStackedWidget, QMessageBox, QDialog, QVBoxLayout, QLabel, QWidget,
+)
 from PyQt6.QtGui import QIcon
-from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
+from PyQt6.QtCore import QThread, QTimer
 
+import instrumentation
 from menu_bar import create_main_menu_bar
 from welcome_widget import WelcomeWidget
-from man_page_list_widget import ManPageListWidget
-from search_widget import SearchWidget
-from man_page_viewer_widget import ManPageViewerWidget
+from man_page_index import ManPageIndex, INDEX_SOURCES
+from index_loader import ManPageIndexLoader
+from fulltext_index import FullTextIndex
+from fulltext_indexer import FullTextIndexer
+from render_cache import RenderCache
+from render_service import RenderService, MAX_CONCURRENT_RENDERS
+from man_page_renderer import RENDER_TIMEOUT, RENDERERS
+from startup_profile import StartupProfile
+from stall_watchdog import StallWatchdog, STALL_THRESHOLD_MS
 
 import os
 
@@ -22,6 +35,20 @@ try:
 except FileNotFoundError:
     VERSION = "1.0.0"  # fallback for development
 
+# How often the pages are refreshed while index batches are still arriving
+INDEX_REFRESH_INTERVAL_MS = 150
+
+# Pages built the first time they are used, in stack order after the welcome screen.
+# The list, search and viewer modules (and NumPy, for fuzzy search) are only
+# imported then.
+LAZY_PAGES = ('man_list_widget', 'search_widget', 'man_viewer_widget')
+
+# Default port for --serve.  Kept here so that starting the interface doesn't
+# import the server, and asyncio with it.
+SERVE_PORT = 8080
+
+_IMPORTS_DONE = time.perf_counter()
+
 
 class AboutDialog(QDialog):
     def __init__(self, parent=None):
@@ -43,8 +70,13 @@ class AboutDialog(QDialog):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, index_source='apropos', render_timeout=RENDER_TIMEOUT,
+                 max_concurrent_renders=MAX_CONCURRENT_RENDERS, renderer='groff', fulltext=True,
+                 startup_profile=None):
         super().__init__()
+        if startup_profile is None:
+            startup_profile = StartupProfile(parent=self)
+        self.startup_profile = startup_profile
 
         self.setWindowTitle("Pickles Man Page Viewer")
         self.setWindowIcon(QIcon('/etc/pickles-linux/pickles-man-viewer/pickle-logo.ico'))
@@ -54,17 +86,34 @@ class MainWindow(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.setCentralWidget(self.stacked_widget)
 
+        # --- Shared man page index, filled in by a background loader ---
+        self.man_page_index = ManPageIndex()
+
+        # --- Rendered page cache shared by everything that shows man pages ---
+        self.render_cache = RenderCache()
+        self.render_service = RenderService(
+            self.render_cache, max_concurrent_renders, render_timeout, renderer,
+            index=self.man_page_index, parent=self
+        )
+
+        # --- Full text index of the page bodies, kept up to date in the background ---
+        self.fulltext_index = FullTextIndex() if fulltext else None
+
         # --- Pages ---
-        self.welcome_widget = WelcomeWidget()
-        self.man_list_widget = ManPageListWidget()
-        self.search_widget = SearchWidget()
-        self.man_viewer_widget = ManPageViewerWidget()
+        # Only the welcome screen is built now; the others replace an empty
+        # placeholder in the stack the first time they are needed
+        with self.startup_profile.phase("welcome widget"):
+            self.welcome_widget = WelcomeWidget(self.man_page_index, self.render_service)
+        self._pages = {}  # name in LAZY_PAGES -> page, once built
+        self._placeholders = {}  # name in LAZY_PAGES -> placeholder, until then
+        self._page_stylesheet = ""
+        self._fulltext_progress = None  # Last (done, total), for a search page built later
 
         # Add pages to stack
         self.stacked_widget.addWidget(self.welcome_widget)    # index 0
-        self.stacked_widget.addWidget(self.man_list_widget)   # index 1
-        self.stacked_widget.addWidget(self.search_widget)     # index 2
-        self.stacked_widget.addWidget(self.man_viewer_widget) # index 3
+        for name in LAZY_PAGES:                               # indexes 1-3
+            self._placeholders[name] = QWidget()
+            self.stacked_widget.addWidget(self._placeholders[name])
 
         # Menu bar
         self.menu_bar = create_main_menu_bar(self)
@@ -82,12 +131,7 @@ class MainWindow(QMainWindow):
             self.open_man_page
         )
 
-        # From list + search
-        self.man_list_widget.man_page_selected.connect(self.open_man_page)
-        self.search_widget.man_page_selected.connect(self.open_man_page)
-
-        # From viewer back button
-        self.man_viewer_widget.back_to_main.connect(self._switch_to_welcome)
+        # The list, search and viewer pages are wired up in their _build_* methods
 
         # Start at welcome screen
         self.stacked_widget.setCurrentWidget(self.welcome_widget)
@@ -95,8 +139,132 @@ class MainWindow(QMainWindow):
         # Zoom level for reset
         self.zoom_level = 0
 
+        # --- Background index loading ---
+        # Batches can arrive faster than the pages can be rebuilt, so refreshes
+        # are coalesced with a single-shot timer.
+        self._index_refresh_timer = QTimer(self)
+        self._index_refresh_timer.setSingleShot(True)
+        self._index_refresh_timer.setInterval(INDEX_REFRESH_INTERVAL_MS)
+        self._index_refresh_timer.timeout.connect(self._refresh_index_views)
+
+        self.index_loader = ManPageIndexLoader(source=index_source, parent=self)
+        self.index_loader.batch_loaded.connect(self._on_index_batch_loaded)
+        self.index_loader.load_finished.connect(self._on_index_load_finished)
+        self.startup_profile.begin("index load")
+        self.index_loader.start()
+
+        self.fulltext_indexer = None
+        if self.fulltext_index is not None:
+            self.fulltext_indexer = FullTextIndexer(self.fulltext_index, parent=self)
+            self.fulltext_indexer.index_updated.connect(self._on_fulltext_index_updated)
+            self.fulltext_indexer.progress.connect(self._on_fulltext_progress)
+            self.fulltext_indexer.start(QThread.Priority.LowPriority)
+
+    def _on_index_batch_loaded(self, batch):
+        with instrumentation.span("index add entries", entries=len(batch)):
+            self.man_page_index.add_entries(batch)
+        if not self._index_refresh_timer.isActive():
+            self._index_refresh_timer.start()
+
+    def _on_index_load_finished(self, error):
+        self.man_page_index.error = error or None
+        self.man_page_index.loaded = True
+        self._index_refresh_timer.stop()
+        self._refresh_index_views()
+        self.startup_profile.end("index load")
+
+    def _refresh_index_views(self):
+        with instrumentation.span("index refresh views", entries=len(self.man_page_index)):
+            self.welcome_widget.on_index_updated()
+            # Pages not built yet read the index when they are
+            for name in ('man_list_widget', 'search_widget'):
+                if name in self._pages:
+                    self._pages[name].on_index_updated()
+
+    def _on_fulltext_index_updated(self):
+        if 'search_widget' in self._pages:
+            self.search_widget.on_fulltext_index_updated()
+
+    def _on_fulltext_progress(self, done, total):
+        self._fulltext_progress = (done, total)
+        if 'search_widget' in self._pages:
+            self.search_widget.on_fulltext_progress(done, total)
+
+    # --- Lazily built pages ---
+
+    @property
+    def man_list_widget(self):
+        return self._page('man_list_widget')
+
+    @property
+    def search_widget(self):
+        return self._page('search_widget')
+
+    @property
+    def man_viewer_widget(self):
+        return self._page('man_viewer_widget')
+
+    def _page(self, name):
+        """Return the page ``name``, building it in place of its placeholder on first use."""
+        page = self._pages.get(name)
+        if page is not None:
+            return page
+        with self.startup_profile.phase(name.replace('_', ' ')):
+            page = getattr(self, '_build_' + name)()
+        page.setStyleSheet(self._page_stylesheet)
+        placeholder = self._placeholders.pop(name)
+        self.stacked_widget.insertWidget(self.stacked_widget.indexOf(placeholder), page)
+        self.stacked_widget.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self._pages[name] = page
+        return page
+
+    def _built_pages(self):
+        return [self.welcome_widget] + list(self._pages.values())
+
+    def _showing(self, name):
+        """Return True if page ``name`` is built and currently shown."""
+        return name in self._pages and self.stacked_widget.currentWidget() is self._pages[name]
+
+    def _build_man_list_widget(self):
+        from man_page_list_widget import ManPageListWidget
+        widget = ManPageListWidget(self.man_page_index)
+        widget.man_page_selected.connect(self.open_man_page)
+        widget.prefetch_requested.connect(self.render_service.prefetch)
+        return widget
+
+    def _build_search_widget(self):
+        from search_widget import SearchWidget
+        widget = SearchWidget(self.man_page_index, self.fulltext_index)
+        widget.man_page_selected.connect(self.open_man_page)
+        widget.prefetch_requested.connect(self.render_service.prefetch)
+        if self._fulltext_progress is not None:
+            widget.on_fulltext_progress(*self._fulltext_progress)
+        return widget
+
+    def _build_man_viewer_widget(self):
+        from man_page_viewer_widget import ManPageViewerWidget
+        widget = ManPageViewerWidget(self.render_service)
+        # From viewer back button
+        widget.back_to_main.connect(self._switch_to_welcome)
+        return widget
+
+    def closeEvent(self, event):
+        # Stop apropos if the window is closed while the index is still loading
+        self.index_loader.requestInterruption()
+        self.index_loader.wait()
+        if self.fulltext_indexer is not None:
+            self.fulltext_indexer.requestInterruption()
+            self.fulltext_indexer.wait()
+        if 'search_widget' in self._pages:
+            self.search_widget.shutdown()
+        self.render_service.shutdown()
+        super().closeEvent(event)
+
     def print_current_page(self):
-        if self.stacked_widget.currentWidget() == self.man_viewer_widget:
+        if self._showing('man_viewer_widget'):
+            # Imported here: QtPrintSupport is only needed once something is printed
+            from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
             printer = QPrinter()
             dialog = QPrintDialog(printer, self)
             if dialog.exec():
@@ -120,34 +288,36 @@ class MainWindow(QMainWindow):
 
     def set_light_theme(self):
         self.setStyleSheet("")
-        for widget in [self.welcome_widget, self.man_list_widget, self.search_widget, self.man_viewer_widget]:
+        self._page_stylesheet = ""
+        for widget in self._built_pages():
             widget.setStyleSheet("")
 
     def set_dark_theme(self):
         dark_stylesheet = """
         QWidget { background-color: #2b2b2b; color: #ffffff; }
-        QListWidget { background-color: #1e1e1e; color: #ffffff; }
+        QListView, QTreeView { background-color: #1e1e1e; color: #ffffff; }
         QLineEdit { background-color: #1e1e1e; color: #ffffff; }
         QTextBrowser { background-color: #1e1e1e; color: #ffffff; }
         QPushButton { background-color: #404040; color: #ffffff; }
         QLabel { color: #ffffff; }
         """
         self.setStyleSheet(dark_stylesheet)
-        for widget in [self.welcome_widget, self.man_list_widget, self.search_widget, self.man_viewer_widget]:
+        self._page_stylesheet = dark_stylesheet
+        for widget in self._built_pages():
             widget.setStyleSheet(dark_stylesheet)
 
     def zoom_in(self):
-        if self.stacked_widget.currentWidget() == self.man_viewer_widget:
+        if self._showing('man_viewer_widget'):
             self.man_viewer_widget.viewer.zoomIn(1)
             self.zoom_level += 1
 
     def zoom_out(self):
-        if self.stacked_widget.currentWidget() == self.man_viewer_widget:
+        if self._showing('man_viewer_widget'):
             self.man_viewer_widget.viewer.zoomOut(1)
             self.zoom_level -= 1
 
     def zoom_reset(self):
-        if self.stacked_widget.currentWidget() == self.man_viewer_widget:
+        if self._showing('man_viewer_widget'):
             if self.zoom_level > 0:
                 for _ in range(self.zoom_level):
                     self.man_viewer_widget.viewer.zoomOut(1)
@@ -165,18 +335,131 @@ class MainWindow(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.welcome_widget)
         self.welcome_widget.refresh_random()
 
-    def open_man_page(self, page_name):
+    def open_man_page(self, page_name, section=''):
         """Load a man page into the viewer and switch to it."""
-        self.man_viewer_widget.load_man_page(page_name)
+        self.man_viewer_widget.load_man_page(page_name, section)
         self.stacked_widget.setCurrentWidget(self.man_viewer_widget)
 
 
+def parse_args(argv):
+    """Parse our own options; anything unrecognised is left for Qt."""
+    parser = argparse.ArgumentParser(prog="pickles-man-viewer", description="Pickles Man Page Viewer")
+    parser.add_argument(
+        "--indexer", choices=INDEX_SOURCES, default="apropos",
+        help="how to discover man pages: run apropos (default) or scan the MANPATH directories directly",
+    )
+    parser.add_argument(
+        "--render-timeout", type=float, default=RENDER_TIMEOUT, metavar="SECONDS",
+        help=f"give up rendering a page after this many seconds (default {RENDER_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--max-renders", type=int, default=MAX_CONCURRENT_RENDERS, metavar="N",
+        help=f"maximum number of pages rendered at the same time (default {MAX_CONCURRENT_RENDERS})",
+    )
+    parser.add_argument(
+        "--renderer", choices=RENDERERS, default="groff",
+        help="render pages with man -Thtml (default) or with the built-in roff renderer, "
+             "which falls back to man for pages it can't handle",
+    )
+    parser.add_argument(
+        "--no-fulltext", dest="fulltext", action="store_false",
+        help="don't index the text of every page for full text search",
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="print how long each startup phase took, once the index is loaded and the window painted",
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="record subprocess calls, index loads, filtering and page loads, and write them to "
+             "FILE as Chrome trace-event JSON on exit",
+    )
+    parser.add_argument(
+        "--watchdog", type=int, nargs="?", const=STALL_THRESHOLD_MS, metavar="MS",
+        help="report whenever the interface stops responding for more than MS milliseconds "
+             f"(default {STALL_THRESHOLD_MS}), with the code it was stuck in",
+    )
+    parser.add_argument(
+        "--export-html", metavar="DIR",
+        help="render every page into a static HTML site in DIR, using all cores, and exit without "
+             "starting the interface; pages unchanged since the last export to DIR are skipped",
+    )
+    parser.add_argument(
+        "--serve", type=int, nargs="?", const=SERVE_PORT, metavar="PORT",
+        help=f"serve the section list, search and rendered pages over HTTP on localhost port PORT "
+             f"(default {SERVE_PORT}) instead of starting the interface",
+    )
+    return parser.parse_known_args(argv[1:])
+
+
+def export_html(args):
+    """Run ``--export-html`` without a QApplication; returns the exit status."""
+    # Only the export needs its process pool, so it isn't imported at startup
+    from html_export import HtmlExport
+
+    index = ManPageIndex.load(source=args.indexer)
+    if index.error:
+        return 1
+    HtmlExport(index, args.export_html, renderer=args.renderer, timeout=args.render_timeout).run()
+    instrumentation.write_trace()
+    return 0
+
+
+def serve(args):
+    """Run ``--serve`` until interrupted; returns the exit status."""
+    # Only the server needs asyncio, so it isn't imported at startup
+    import asyncio
+    from man_page_server import ManPageServer
+
+    index = ManPageIndex.load(source=args.indexer)
+    if index.error:
+        return 1
+    server = ManPageServer(index, RenderCache(), renderer=args.renderer, timeout=args.render_timeout,
+                           max_renders=max(1, args.max_renders), port=args.serve)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error starting the server: {e}")
+        return 1
+    instrumentation.write_trace()
+    return 0
+
+
 def main():
     print(f"Running Pickles Man Viewer - Version: {VERSION}")
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    args, qt_args = parse_args(sys.argv)
+    if args.trace:
+        instrumentation.enable_tracing(args.trace)
+    if args.export_html:
+        sys.exit(export_html(args))
+    if args.serve is not None:
+        sys.exit(serve(args))
+    profile = StartupProfile(origin=_IMPORT_START, enabled=args.profile_startup)
+    profile.record("imports", _IMPORT_START, _IMPORTS_DONE)
+    with profile.phase("QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
+    with profile.phase("main window"):
+        window = MainWindow(
+            index_source=args.indexer,
+            render_timeout=args.render_timeout,
+            max_concurrent_renders=max(1, args.max_renders),
+            renderer=args.renderer,
+            fulltext=args.fulltext,
+            startup_profile=profile,
+        )
+    profile.watch_first_paint(window)
     window.show()
-    sys.exit(app.exec())
+    watchdog = None
+    if args.watchdog is not None:
+        watchdog = StallWatchdog(max(1, args.watchdog))
+        watchdog.start()
+    status = app.exec()
+    if watchdog is not None:
+        watchdog.stop()
+    instrumentation.write_trace()
+    sys.exit(status)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,439 @@
+from array import array
+from collections import Counter
+from itertools import compress
+import subprocess
+import tempfile
+import time
+
+import instrumentation
+from index_cache import index_signature, read_index_cache, write_index_cache
+from manpath_scanner import iter_scan_batches, scan_man_pages
+
+# Number of entries handed to the GUI at a time while the index is loading
+BATCH_SIZE = 2000
+
+# Ways of discovering man pages: run apropos, or scan the MANPATH directly
+INDEX_SOURCES = ('apropos', 'scan')
+
+# The order man looks through sections in when none is given (man-db's default)
+SECTION_ORDER = ('1', 'n', 'l', '8', '3', '0', '2', '5', '4', '9', '6', '7')
+
+# Titles of the sections, for the page list and exported sites
+SECTION_NAMES = {
+    '1': 'User Commands',
+    '8': 'System Administration',
+    '3': 'Library Functions',
+    '2': 'System Calls',
+    '4': 'Device Files',
+    '5': 'File Formats',
+    '6': 'Games',
+    '7': 'Miscellaneous',
+    '9': 'Kernel Routines',
+    'n': 'New',
+    'l': 'Local',
+    'p': 'Public',
+    'o': 'Old',
+    't': 'TeX',
+}
+
+
+class ManPageIndexError(Exception):
+    """Raised when the man page index cannot be built."""
+
+
+def parse_apropos_line(line):
+    """Split one line of `apropos` output into (name, section, description).
+
+    Returns None for lines that do not look like an apropos entry.
+    """
+    if '(' not in line or ')' not in line:
+        return None
+    name_section, _, rest = line.partition('(')
+    section, _, rest = rest.partition(')')
+    name = name_section.split(',')[0].strip()
+    section = section.strip()
+    if not name:
+        return None
+    _, _, description = rest.partition(' - ')
+    return name, section, description.strip()
+
+
+def iter_apropos_batches(batch_size=BATCH_SIZE):
+    """Run `apropos .` and yield entries in batches as its output arrives.
+
+    Entries are (name, section, description, '') as apropos doesn't say
+    where a page's source file is.
+
+    Closing the generator early kills apropos.
+    """
+    started = time.perf_counter()
+    # stderr goes to a file so apropos can't block on a full pipe of warnings
+    with tempfile.TemporaryFile('w+') as stderr_file:
+        try:
+            process = subprocess.Popen(['apropos', '.'], stdout=subprocess.PIPE,
+                                       stderr=stderr_file, text=True)
+        except FileNotFoundError:
+            raise ManPageIndexError("Error: 'apropos' command not found.")
+        try:
+            batch = []
+            for line in process.stdout:
+                entry = parse_apropos_line(line)
+                if entry:
+                    batch.append(entry + ('',))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+            if process.wait():
+                stderr_file.seek(0)
+                raise ManPageIndexError(f"Error loading man pages: {stderr_file.read()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            instrumentation.add_span("subprocess apropos", started, time.perf_counter())
+
+
+def iter_path_batches(index, batch_size=BATCH_SIZE):
+    """Yield (name, section, '', path) updates giving ``index``'s pages their source files.
+
+    The section directories are only listed, not read, so this is cheap.
+    Pages documented in another page's file (an alias like gunzip, which
+    man finds through its database) are left unresolved.
+    """
+    batch = []
+    for name, section, path in scan_man_pages():
+        entry_id = index.find(name, section)
+        if entry_id is not None and not index.paths[entry_id]:
+            batch.append((name, section, '', path))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def iter_index_batches(use_cache=True, batch_size=BATCH_SIZE, source='apropos'):
+    """Yield batches of (name, section, description, path) entries for every man page.
+
+    With ``use_cache`` the entries come from the on-disk cache when it was
+    built from the same ``source`` and is still valid for the installed man
+    hierarchies and man-db databases.  Otherwise ``source`` decides how
+    pages are found: ``'apropos'`` runs
+    `apropos .` and then yields the pages again with their source files,
+    ``'scan'`` walks the MANPATH section directories and yields each page a
+    second time once its description has been read.  The cache is rewritten
+    once every batch has been produced.  Raises ManPageIndexError if apropos
+    fails.
+    """
+    signature = None
+    if use_cache:
+        with instrumentation.span("index cache read"):
+            # The sources find different aliases and descriptions, so each needs its own cache
+            signature = (source, index_signature())
+            columns = read_index_cache(signature)
+            try:
+                entries = ManPageIndex.from_columns(columns).entries() if columns is not None else None
+            except (ValueError, TypeError):
+                entries = None  # Damaged cache, rebuilt below
+        instrumentation.count("index_cache.hits" if entries is not None else "index_cache.misses")
+        if entries is not None:
+            for start in range(0, len(entries), batch_size):
+                yield entries[start:start + batch_size]
+            return
+
+    if source == 'scan':
+        batches = iter_scan_batches(batch_size)
+    else:
+        batches = iter_apropos_batches(batch_size)
+    collected = ManPageIndex()
+    for batch in batches:
+        collected.add_entries(batch)
+        yield batch
+    if source != 'scan':
+        for batch in iter_path_batches(collected, batch_size):
+            collected.add_entries(batch)
+            yield batch
+    if use_cache:
+        with instrumentation.span("index cache write"):
+            write_index_cache(signature, collected.columns())
+
+
+class PackedStrings:
+    """A column of strings stored as UTF-8 in one buffer.
+
+    String ``i`` is ``lengths[i]`` bytes from ``offsets[i]``.  An empty
+    string can be filled in later (its bytes go to the end of the buffer);
+    other strings never change, so the buffer holds no dead bytes.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('I')
+        self.lengths = array('I')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        offset = self.offsets[i]
+        return self.buffer[offset:offset + self.lengths[i]].decode()
+
+    def append(self, text):
+        self.offsets.append(0)
+        self.lengths.append(0)
+        if text:
+            self.fill(len(self.offsets) - 1, text)
+
+    def fill(self, i, text):
+        """Set string ``i``, which must be empty."""
+        encoded = text.encode()
+        self.offsets[i] = len(self.buffer)
+        self.lengths[i] = len(encoded)
+        self.buffer += encoded
+
+    def columns(self):
+        return bytes(self.buffer), self.offsets.tobytes(), self.lengths.tobytes()
+
+    @classmethod
+    def from_columns(cls, buffer, offsets, lengths):
+        packed = cls()
+        packed.buffer = bytearray(buffer)
+        packed.offsets.frombytes(offsets)
+        packed.lengths.frombytes(lengths)
+        if len(packed.offsets) != len(packed.lengths):
+            raise ValueError("packed string columns have different lengths")
+        return packed
+
+
+def section_title(section):
+    return SECTION_NAMES.get(section, f"Section {section}")
+
+
+def section_rank(section):
+    """Sort key putting sections in the order man searches them."""
+    base = section[:1]
+    order = SECTION_ORDER.index(base) if base in SECTION_ORDER else len(SECTION_ORDER)
+    return order, section != base, section
+
+
+class ManPageIndex:
+    """Every man page known to the system, loaded once and shared by all widgets.
+
+    Entries are stored column-wise and compactly.  Entry ``i`` is
+    ``names[i]`` (interned by the index, so a name found in several sections
+    is one string) in section ``section_table[section_codes[i]]``.  Its
+    whatis line is ``descriptions[i]`` and its source file ``paths[i]``
+    ('' until known), both PackedStrings.  Each (name, section) pair appears
+    only once, and pages are identified by that pair: the same name in two
+    sections is two pages.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.section_table = []  # distinct sections, in order of first appearance
+        self.section_codes = array('H')
+        self.descriptions = PackedStrings()
+        self.paths = PackedStrings()  # Resolution table: each page's source file
+        self.error = None  # Human readable message if loading failed
+        self.loaded = False  # False while entries are still arriving
+        self._section_codes = {}  # section -> code
+        self._first_entry = {}  # name -> id of its first entry
+        self._next_entry = array('i')  # id of the next entry with the same name, or -1
+        self._by_section = None
+        self._unique_names = None
+        self._shared_names = None
+
+    @classmethod
+    def load(cls, use_cache=True, source='apropos'):
+        """Build the index synchronously (see ``iter_index_batches``)."""
+        index = cls()
+        try:
+            for batch in iter_index_batches(use_cache, source=source):
+                index.add_entries(batch)
+        except ManPageIndexError as e:
+            print(e)
+            index.error = str(e)
+        index.loaded = True
+        return index
+
+    # --- Serialisation ---
+
+    def columns(self):
+        """Return the index's columns as plain lists and bytes, for marshal."""
+        return ((self.names, self.section_table, self.section_codes.tobytes())
+                + self.descriptions.columns() + self.paths.columns())
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Rebuild an index from the output of ``columns``."""
+        names, section_table, codes = columns[:3]
+        index = cls()
+        index.section_table = list(section_table)
+        index._section_codes = {section: code for code, section in enumerate(section_table)}
+        index.section_codes.frombytes(codes)
+        index.descriptions = PackedStrings.from_columns(*columns[3:6])
+        index.paths = PackedStrings.from_columns(*columns[6:9])
+        if not len(names) == len(index.section_codes) == len(index.descriptions) == len(index.paths):
+            raise ValueError("index columns have different lengths")
+        index._next_entry = array('i', [-1]) * len(names)
+        last_entry = {}
+        for entry_id, name in enumerate(names):
+            previous = last_entry.get(name)
+            if previous is None:
+                index._first_entry[name] = entry_id
+            else:
+                name = index.names[previous]
+                index._next_entry[previous] = entry_id
+            index.names.append(name)
+            last_entry[name] = entry_id
+        return index
+
+    # --- Entries ---
+
+    def __len__(self):
+        return len(self.names)
+
+    def section(self, entry_id):
+        return self.section_table[self.section_codes[entry_id]]
+
+    def description_at(self, entry_id):
+        """Return the whatis description of entry ``entry_id`` ('' if it has none)."""
+        return self.descriptions[entry_id]
+
+    def entries(self):
+        """Return every entry as a (name, section, description, path) tuple."""
+        return [(name, self.section(i), self.descriptions[i], self.paths[i])
+                for i, name in enumerate(self.names)]
+
+    def find(self, name, section=None):
+        """Return the id of page ``name`` in ``section``, or None.
+
+        Without a section (None or ''), the page man would show for ``name``
+        alone is found: the first by SECTION_ORDER.
+        """
+        entry_id = self._first_entry.get(name, -1)
+        if not section:
+            best = None
+            while entry_id != -1:
+                if best is None or section_rank(self.section(entry_id)) < section_rank(self.section(best)):
+                    best = entry_id
+                entry_id = self._next_entry[entry_id]
+            return best
+        code = self._section_codes.get(section)
+        while entry_id != -1:
+            if self.section_codes[entry_id] == code:
+                return entry_id
+            entry_id = self._next_entry[entry_id]
+        return None
+
+    def page_path(self, name, section=None):
+        """Return the source file of a page, or None if it isn't known yet."""
+        entry_id = self.find(name, section)
+        if entry_id is None:
+            return None
+        return self.paths[entry_id] or None
+
+    def set_path(self, name, section, path):
+        """Record the source file of a page found some other way (e.g. by `man -w`)."""
+        entry_id = self.find(name, section)
+        if entry_id is not None and not self.paths.lengths[entry_id]:
+            self.paths.fill(entry_id, path)
+
+    def add_lines(self, lines):
+        """Parse apropos output lines and add the entries they describe."""
+        entries = []
+        for line in lines:
+            entry = parse_apropos_line(line)
+            if entry:
+                entries.append(entry + ('',))
+        self.add_entries(entries)
+
+    def add_entries(self, entries):
+        """Add (name, section, description, path) tuples.
+
+        A duplicate (name, section) only fills in the description and path
+        of the existing entry where it did not have one yet.
+        """
+        added = False
+        for name, section, description, path in entries:
+            entry_id = self.find(name, section)
+            if entry_id is not None:
+                if description and not self.descriptions.lengths[entry_id]:
+                    self.descriptions.fill(entry_id, description)
+                if path and not self.paths.lengths[entry_id]:
+                    self.paths.fill(entry_id, path)
+                continue
+            code = self._section_codes.get(section)
+            if code is None:
+                code = self._section_codes[section] = len(self.section_table)
+                self.section_table.append(section)
+            entry_id = len(self.names)
+            self.section_codes.append(code)
+            self.descriptions.append(description)
+            self.paths.append(path)
+            self._next_entry.append(-1)
+            self.names.append(self._link(name, entry_id))
+            added = True
+        # Derived views only list names, and are rebuilt lazily on next access
+        if added:
+            self._by_section = None
+            self._unique_names = None
+            self._shared_names = None
+
+    def _link(self, name, entry_id):
+        """Chain ``entry_id`` to the other entries named ``name``; return the shared name."""
+        last = self._first_entry.get(name)
+        if last is None:
+            self._first_entry[name] = entry_id
+            return name
+        name = self.names[last]
+        while self._next_entry[last] != -1:
+            last = self._next_entry[last]
+        self._next_entry[last] = entry_id
+        return name
+
+    # --- Derived views ---
+    def by_section(self):
+        """Return {section: sorted list of names}."""
+        if self._by_section is None:
+            by_section = {}
+            section_table = self.section_table
+            for name, code in zip(self.names, self.section_codes):
+                by_section.setdefault(section_table[code], []).append(name)
+            for names in by_section.values():
+                names.sort()
+            self._by_section = by_section
+        return self._by_section
+
+    def unique_names(self):
+        """Return the distinct page names across all sections, sorted case insensitively."""
+        if self._unique_names is None:
+            self._unique_names = sorted(self._first_entry, key=lambda name: (name.lower(), name))
+        return self._unique_names
+
+    def shared_names(self):
+        """Return {name: number of sections} for the names found in more than one section."""
+        if self._shared_names is None:
+            # Every entry but the last of a name links to the next one
+            shared = Counter(compress(self.names, map((-1).__ne__, self._next_entry)))
+            self._shared_names = {name: links + 1 for name, links in shared.items()}
+        return self._shared_names
+
+    def sections(self, name):
+        """Return the sections ``name`` is found in, in SECTION_ORDER."""
+        sections = []
+        entry_id = self._first_entry.get(name, -1)
+        while entry_id != -1:
+            sections.append(self.section(entry_id))
+            entry_id = self._next_entry[entry_id]
+        return sorted(sections, key=section_rank)
+
+    def description(self, name, section=None):
+        """Return the whatis description of a page, or None if unknown."""
+        entry_id = self.find(name, section)
+        if entry_id is None:
+            return None
+        return self.description_at(entry_id) or None
@@ -1,29 +1,21 @@
-import subprocess
-from PyQt6.QtWidgets import QTreeWidget, QTreeWidgetItem, QWidget, QVBoxLayout, QLineEdit, QLabel
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QTreeView, QWidget, QVBoxLayout, QLineEdit, QLabel
+from PyQt6.QtCore import pyqtSignal, QTimer
+
+from man_page_tree_model import ManPageTreeModel
+
+# Pages prefetched when the current item changes: it and the ones below it
+PREFETCH_COUNT = 3
+
+# Typing pause before a new filter is searched; remembered filters apply at once
+FILTER_DELAY_MS = 120
 
 class ManPageListWidget(QWidget):
-    man_page_selected = pyqtSignal(str)
-
-    SECTION_NAMES = {
-        '1': 'User Commands',
-        '8': 'System Administration',
-        '3': 'Library Functions',
-        '2': 'System Calls',
-        '4': 'Device Files',
-        '5': 'File Formats',
-        '6': 'Games',
-        '7': 'Miscellaneous',
-        '9': 'Kernel Routines',
-        'n': 'New',
-        'l': 'Local',
-        'p': 'Public',
-        'o': 'Old',
-        't': 'TeX',
-    }
-
-    def __init__(self, parent=None):
+    man_page_selected = pyqtSignal(str, str)  # page name, section
+    prefetch_requested = pyqtSignal(list)  # (name, section) pages likely to be opened next
+
+    def __init__(self, index, parent=None):
         super().__init__(parent)
+        self.index = index
         self.layout = QVBoxLayout(self)
 
         # Search box
@@ -34,73 +26,72 @@ class ManPageListWidget(QWidget):
         self.search_edit.textChanged.connect(self._filter_list)
         self.layout.addWidget(self.search_edit)
 
-        self.tree_widget = QTreeWidget()
-        self.tree_widget.setHeaderHidden(True)
-        self.layout.addWidget(self.tree_widget)
-        self.tree_widget.itemClicked.connect(self._on_item_clicked)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self._apply_filter)
+
+        self.loading_label = QLabel("Loading man pages...")
+        self.loading_label.setStyleSheet("QLabel { color: gray; }")
+        self.layout.addWidget(self.loading_label)
+
+        # Rows come straight from the index; nothing is created per page
+        self.tree_model = ManPageTreeModel(self)
+        self.tree_view = QTreeView()
+        self.tree_view.setHeaderHidden(True)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setModel(self.tree_model)
+        self.layout.addWidget(self.tree_view)
+        self.tree_view.clicked.connect(self._on_item_clicked)
+        self.tree_view.selectionModel().currentChanged.connect(self._on_current_item_changed)
 
-        self.all_man_pages = {}  # section to list of names
         self.load_man_pages()
 
     def load_man_pages(self):
-        try:
-            result = subprocess.run(['apropos', '.'], capture_output=True, text=True, check=True)
-            lines = result.stdout.splitlines()
-            self.all_man_pages = {}
-            for line in lines:
-                if '(' in line and ')' in line:
-                    parts = line.split('(')
-                    name_section = parts[0].strip()
-                    section_part = parts[1].split(')')[0].strip()
-                    name = name_section.split(',')[0].strip()
-                    if name:
-                        if section_part not in self.all_man_pages:
-                            self.all_man_pages[section_part] = []
-                        if name not in self.all_man_pages[section_part]:
-                            self.all_man_pages[section_part].append(name)
-            # Sort names in each section
-            for section in self.all_man_pages:
-                self.all_man_pages[section].sort()
-            self._update_list()
-        except subprocess.CalledProcessError as e:
-            self.all_man_pages = {}
-            error_item = QTreeWidgetItem([f"Error loading man pages: {e.stderr}"])
-            self.tree_widget.addTopLevelItem(error_item)
-        except FileNotFoundError:
-            self.all_man_pages = {}
-            error_item = QTreeWidgetItem(["Error: 'apropos' command not found."])
-            self.tree_widget.addTopLevelItem(error_item)
-
-    def _update_list(self):
-        self.tree_widget.clear()
-        for section in sorted(self.all_man_pages.keys()):
-            section_name = self.SECTION_NAMES.get(section, f"Section {section}")
-            section_item = QTreeWidgetItem([section_name])
-            self.tree_widget.addTopLevelItem(section_item)
-            for name in self.all_man_pages[section]:
-                name_item = QTreeWidgetItem([name])
-                section_item.addChild(name_item)
-        # Start collapsed
+        if self.index.error:
+            self.loading_label.hide()
+            self.tree_model.set_message(self.index.error)
+            return
+        if self.index.loaded:
+            self.loading_label.hide()
+        else:
+            self.loading_label.setText(f"Loading man pages... ({len(self.index)} found so far)")
+            self.loading_label.show()
+        # The filter the user has already typed stays applied
+        self._keep_expanded(lambda: self.tree_model.set_pages(self.index.by_section()))
+
+    def on_index_updated(self):
+        """Refresh the tree after the shared index received more pages."""
+        self.load_man_pages()
 
     def _filter_list(self, text):
-        self.tree_widget.clear()
-        if not text:
-            self._update_list()
+        if self.tree_model.is_cached(text):
+            self._apply_filter()
         else:
-            filtered = {}
-            for section, names in self.all_man_pages.items():
-                filtered_names = [n for n in names if text.lower() in n.lower()]
-                if filtered_names:
-                    filtered[section] = filtered_names
-            for section in sorted(filtered.keys()):
-                section_name = self.SECTION_NAMES.get(section, f"Section {section}")
-                section_item = QTreeWidgetItem([section_name])
-                self.tree_widget.addTopLevelItem(section_item)
-                for name in filtered[section]:
-                    name_item = QTreeWidgetItem([name])
-                    section_item.addChild(name_item)
-            # Start collapsed
-
-    def _on_item_clicked(self, item, column):
-        if item.parent():  # it's a name item, not section
-            self.man_page_selected.emit(item.text(0))
+            self._filter_timer.start()
+
+    def _apply_filter(self):
+        self._filter_timer.stop()
+        text = self.search_edit.text()
+        self._keep_expanded(lambda: self.tree_model.set_filter(text))
+
+    def _keep_expanded(self, reset):
+        """Run a model reset, re-expanding the sections that were open before it."""
+        expanded = [section for section in self.tree_model.sections()
+                    if self.tree_view.isExpanded(self.tree_model.section_row(section))]
+        reset()
+        # Sections start collapsed
+        for section in expanded:
+            index = self.tree_model.section_row(section)
+            if index.isValid():
+                self.tree_view.expand(index)
+
+    def _on_item_clicked(self, index):
+        page = self.tree_model.page(index)
+        if page is not None:  # it's a name row, not a section
+            self.man_page_selected.emit(*page)
+
+    def _on_current_item_changed(self, current, previous):
+        pages = self.tree_model.pages(current, PREFETCH_COUNT)
+        if pages:
+            self.prefetch_requested.emit(pages)
@@ -0,0 +1,432 @@
+import codecs
+import locale
+import os
+import re
+import signal
+import subprocess
+import tempfile
+import threading
+
+import instrumentation
+from render_cache import render_key
+from roff_renderer import UnsupportedRoff, render_roff_file
+
+# Seconds a single man invocation may run before it is killed
+RENDER_TIMEOUT = 30
+
+# Niceness for background (prefetch) renders, so they yield the CPU to real ones
+LOW_PRIORITY_NICENESS = 19
+
+# Streaming: bytes read from man at a time, and the size of displayed chunks.
+# The first chunk is kept small so roughly a screenful appears right away.
+READ_SIZE = 16384
+FIRST_CHUNK_SIZE = 16 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# 'groff' runs man -Thtml for every page; 'python' renders the page source
+# in-process with roff_renderer and only runs man for pages it can't handle
+RENDERERS = ('groff', 'python')
+
+
+class RenderCancelled(Exception):
+    """Raised when a render is cancelled before it finished."""
+
+
+def _kill_process_group(process):
+    """Kill man and the groff pipeline it started (they share its process group)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+class RenderCancellation:
+    """Lets another thread abort a render by killing its man process."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._process is not None and self._process.poll() is None:
+                _kill_process_group(self._process)
+
+    def _attach(self, process):
+        with self._lock:
+            self._process = process
+            if self.cancelled:
+                _kill_process_group(process)
+
+
+def _stream_man(args, timeout=None, cancellation=None, low_priority=False, cwd=None):
+    """Run man and yield its output as text while it is being produced.
+
+    Otherwise behaves like subprocess.run(check=True): raises
+    CalledProcessError on failure and TimeoutExpired once ``timeout`` seconds
+    have passed, and RenderCancelled if ``cancellation`` is cancelled.
+    Closing the generator early kills man.
+    """
+    if cancellation is not None and cancellation.cancelled:
+        raise RenderCancelled()
+    trace = instrumentation.span("subprocess man", args=' '.join(args[1:]))
+    if low_priority:
+        # nice execs man in place, so the process group below still covers it
+        args = ["nice", "-n", str(LOW_PRIORITY_NICENESS)] + args
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))('replace')
+    # stderr goes to a file so a chatty groff can never block on a full pipe
+    with trace, tempfile.TemporaryFile() as stderr_file:
+        # A new session makes man the leader of a process group we can kill as a whole
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   start_new_session=True, cwd=cwd)
+        if cancellation is not None:
+            cancellation._attach(process)
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), _kill_process_group(process)))
+            timer.daemon = True
+            timer.start()
+        try:
+            while True:
+                data = process.stdout.read1(READ_SIZE)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            text = decoder.decode(b'', final=True)
+            if text:
+                yield text
+            process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None:
+                _kill_process_group(process)
+                process.wait()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout)
+        if cancellation is not None and cancellation.cancelled:
+            raise RenderCancelled()
+        if process.returncode:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(locale.getpreferredencoding(False), 'replace')
+            raise subprocess.CalledProcessError(process.returncode, args, None, stderr)
+
+
+def _run_man(args, timeout=None, cancellation=None, low_priority=False, cwd=None):
+    """Run man like subprocess.run(check=True) and return its whole output."""
+    return ''.join(_stream_man(args, timeout, cancellation, low_priority, cwd))
+
+
+class HtmlChunker:
+    """Splits HTML output into chunks that can be displayed one by one.
+
+    Chunks end right before a top level block element (never inside a
+    table or <pre> block), so each one can be inserted into a QTextDocument
+    on its own.  The first chunk is small so something can be shown quickly.
+
+    Output is scanned once, tracking which elements are open.  A page that
+    is mostly one long list or indented block has no top level boundary for
+    a long way; once a chunk reaches MAX_CHUNK_FACTOR times its size it is
+    cut between two list items (or two blocks of an indented <div>) instead,
+    closing the open elements and opening them again in the next chunk.
+    """
+    TOKEN = re.compile(r'<(/?)(table|pre|dl|div|ul|ol)\b[^>]*>'
+                       r'|\n(?=<(p|h[1-6]|pre|table|hr|div|dl|ul|ol|dt|li)[\s>])', re.IGNORECASE)
+    TOP_LEVEL = frozenset(('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'table', 'hr', 'div',
+                           'dl', 'ul', 'ol'))
+    RIGID = frozenset(('table', 'pre'))
+    # Where a chunk may be cut inside each element when it has to be (None: between any blocks)
+    SPLIT_BEFORE = {'div': None, 'dl': 'dt', 'ul': 'li'}
+    MAX_CHUNK_FACTOR = 2
+
+    def __init__(self, first_size=FIRST_CHUNK_SIZE, size=CHUNK_SIZE):
+        self._buffer = ''
+        self._next_size = first_size
+        self._size = size
+        self._scanned = 0  # position in the buffer up to which tokens have been read
+        self._open = []  # (name, opening tag) of the open div, dl, ul and ol elements
+        self._rigid = 0  # open table and pre elements
+
+    def feed(self, text):
+        """Add output and return the chunks that are now complete."""
+        self._buffer += text
+        chunks = []
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        return chunks
+
+    def flush(self):
+        """Return whatever is left once the output is complete."""
+        chunks = [self._buffer] if self._buffer else []
+        self._buffer = ''
+        self._scanned = 0
+        return chunks
+
+    def _next_chunk(self):
+        buffer = self._buffer
+        # Tokens starting before the last '<' are complete; the rest wait for more output
+        limit = buffer.rfind('<') - 1
+        for match in self.TOKEN.finditer(buffer, self._scanned):
+            if match.start() >= limit:
+                break
+            self._scanned = match.end()
+            name = match.group(2)
+            if name is not None:
+                self._track(match.group(1), name.lower(), match.group(0))
+                continue
+            cut = match.end()
+            if cut < self._next_size or self._rigid:
+                continue
+            boundary = match.group(3).lower()
+            if not self._open:
+                if boundary in self.TOP_LEVEL:
+                    return self._cut(cut)
+            elif cut >= self._next_size * self.MAX_CHUNK_FACTOR and self._can_split(boundary):
+                return self._cut(cut)
+        self._scanned = max(self._scanned, limit)
+        return None
+
+    def _track(self, closing, name, tag):
+        if name in self.RIGID:
+            self._rigid = max(0, self._rigid - 1) if closing else self._rigid + 1
+        elif not closing:
+            self._open.append((name, tag))
+        else:
+            for i in range(len(self._open) - 1, -1, -1):
+                if self._open[i][0] == name:
+                    del self._open[i:]
+                    break
+
+    def _can_split(self, boundary):
+        if any(name != 'div' for name, _ in self._open[:-1]):
+            return False
+        innermost = self._open[-1][0]
+        return innermost in self.SPLIT_BEFORE and self.SPLIT_BEFORE[innermost] in (None, boundary)
+
+    def _cut(self, cut):
+        chunk = self._buffer[:cut] + ''.join(f"</{name}>" for name, _ in reversed(self._open))
+        reopened = ''.join(tag for _, tag in self._open)
+        self._buffer = reopened + self._buffer[cut:]
+        self._scanned = len(reopened)
+        self._next_size = self._size
+        return chunk
+
+
+class _Unchunked:
+    """Stands in for HtmlChunker when the output isn't displayed in pieces."""
+
+    def feed(self, text):
+        return [text]
+
+    def flush(self):
+        return []
+
+
+def split_html_chunks(html_content, first_size=FIRST_CHUNK_SIZE, size=CHUNK_SIZE):
+    """Split a complete document the same way streamed output is split."""
+    chunker = HtmlChunker(first_size, size)
+    return chunker.feed(html_content) + chunker.flush()
+
+
+def page_title(page_name, section=''):
+    """Return ``name(section)``, or just the name when the section isn't known."""
+    return f"{page_name}({section})" if section else page_name
+
+
+def _man_page_args(page_name, section='', source_path=None):
+    """Return the arguments and working directory that make man show a page.
+
+    A known source file is rendered with ``man -l``, which skips man's
+    search through every hierarchy; it runs from the hierarchy's root so
+    the file's .so links resolve as usual.
+    """
+    if source_path:
+        return ["-l", source_path], os.path.dirname(os.path.dirname(source_path)) or None
+    return ([section] if section else []) + [page_name], None
+
+
+def error_html(page_name):
+    return f"<h1>Error: Man page for '{page_name}' not found or could not be rendered.</h1>"
+
+
+def timeout_html(page_name, timeout):
+    return f"<h1>Error: Rendering the man page for '{page_name}' took longer than {timeout} seconds.</h1>"
+
+
+def resolve_man_page(page_name, section=''):
+    """Return the source file man would display for ``page_name``, or None."""
+    try:
+        with instrumentation.span("subprocess man -w", page=page_name):
+            result = subprocess.run(["man", "-w"] + _man_page_args(page_name, section)[0],
+                                    capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    lines = result.stdout.splitlines()
+    return lines[0].strip() if lines else None
+
+
+def stream_man_page_html(page_name, timeout=RENDER_TIMEOUT, cancellation=None, low_priority=False,
+                         section='', source_path=None):
+    """Yield a man page as HTML while man produces it.
+
+    ``section`` picks the page among those named ``page_name``; a known
+    ``source_path`` is rendered directly.  If man fails before producing
+    anything, the page is rendered as plain text wrapped in <pre> tags
+    instead, or an error page is yielded.  Errors after output has started
+    are raised (CalledProcessError or TimeoutExpired), as is
+    RenderCancelled.
+    """
+    page_args, cwd = _man_page_args(page_name, section, source_path)
+    page_name = page_title(page_name, section)
+    produced = False
+    try:
+        for text in _stream_man(["man", "-Thtml"] + page_args, timeout, cancellation, low_priority, cwd):
+            produced = True
+            yield text
+        if produced:
+            return
+    except subprocess.CalledProcessError as e:
+        if produced:
+            raise
+        print(f"Error getting HTML man page for {page_name} with -Thtml: {e}")
+        print(f"Stderr: {e.stderr}")
+        try:
+            stdout = _run_man(["man"] + page_args, timeout, cancellation, low_priority, cwd)
+            yield f"<pre>{stdout}</pre>"
+        except subprocess.CalledProcessError as e_plain:
+            print(f"Error getting plain text man page for {page_name}: {e_plain}")
+            print(f"Stderr: {e_plain.stderr}")
+            yield error_html(page_name)
+        except subprocess.TimeoutExpired:
+            print(f"Timed out rendering plain text man page for {page_name}")
+            yield timeout_html(page_name, timeout)
+        return
+    except subprocess.TimeoutExpired:
+        if produced:
+            raise
+        print(f"Timed out rendering HTML man page for {page_name}")
+        yield timeout_html(page_name, timeout)
+        return
+    except FileNotFoundError:
+        print("Error: 'man' command not found.")
+        yield error_html(page_name)
+        return
+
+    yield error_html(page_name)
+
+
+def render_man_page_html(page_name, timeout=RENDER_TIMEOUT, cancellation=None, low_priority=False,
+                         section='', source_path=None):
+    """Render a man page as HTML, or plain text wrapped in <pre> tags.
+
+    Raises RenderCancelled if ``cancellation`` is cancelled while man runs.
+    """
+    try:
+        return ''.join(stream_man_page_html(page_name, timeout, cancellation, low_priority,
+                                            section, source_path))
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting HTML man page for {page_name} with -Thtml: {e}")
+        return error_html(page_name)
+    except subprocess.TimeoutExpired:
+        print(f"Timed out rendering HTML man page for {page_name}")
+        return timeout_html(page_name, timeout)
+
+
+def render_page_source(source_path):
+    """Render a page source in-process, or return None if man is needed."""
+    try:
+        return render_roff_file(source_path)
+    except UnsupportedRoff as e:
+        print(f"Rendering {source_path} with man: {e}")
+        return None
+
+
+def iter_man_page_html(page_name, render_cache=None, timeout=RENDER_TIMEOUT, cancellation=None,
+                       low_priority=False, renderer='groff', section='', source_path=None,
+                       chunked=True):
+    """Yield a page's HTML in displayable chunks (see HtmlChunker).
+
+    Without ``chunked`` the HTML is yielded as it arrives instead, without
+    the tags HtmlChunker adds where it has to split a list.
+
+    The page is ``page_name`` in ``section`` (or man's first match without
+    one).  Its ``source_path``, when known, saves asking man for it and is
+    handed to man directly.
+
+    A current copy in ``render_cache`` is split into chunks directly;
+    otherwise man's output is chunked while it streams in and cached once
+    complete.  Pages are cached under their resolved source file, so the
+    same page reached under different names is rendered once, and an
+    upgraded page (new mtime or size) is rendered again.  Error pages and
+    incomplete renders are never cached.
+
+    With ``renderer='python'`` the source is rendered by roff_renderer
+    instead, falling back to man for pages outside its subset.
+    """
+    split = split_html_chunks if chunked else lambda html_content: [html_content]
+    key = None
+    if not source_path and (render_cache is not None or renderer == 'python'):
+        source_path = resolve_man_page(page_name, section)
+    if render_cache is not None and source_path:
+        key = render_key(source_path)
+        if key and renderer != 'groff':
+            # The renderers produce different HTML, so they don't share entries
+            key += f"\0{renderer}"
+        if key:
+            html_content = render_cache.get(key)
+            if html_content is not None:
+                yield from split(html_content)
+                return
+
+    if renderer == 'python' and source_path:
+        if cancellation is not None and cancellation.cancelled:
+            raise RenderCancelled()
+        with instrumentation.span("render python", path=source_path):
+            html_content = render_page_source(source_path)
+        if html_content is not None:
+            instrumentation.count("render.bytes", len(html_content))
+            if key:
+                render_cache.put(key, html_content)
+            yield from split(html_content)
+            return
+
+    chunker = HtmlChunker() if chunked else _Unchunked()
+    parts = []
+    try:
+        for text in stream_man_page_html(page_name, timeout, cancellation, low_priority,
+                                         section, source_path):
+            parts.append(text)
+            yield from chunker.feed(text)
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting HTML man page for {page_name} with -Thtml: {e}")
+        print(f"Stderr: {e.stderr}")
+        yield from chunker.flush()
+        return
+    except subprocess.TimeoutExpired:
+        print(f"Timed out rendering HTML man page for {page_name}")
+        yield from chunker.flush()
+        yield f"<p><b>Rendering stopped after {timeout} seconds; the page is incomplete.</b></p>"
+        return
+    yield from chunker.flush()
+
+    html_content = ''.join(parts)
+    instrumentation.count("render.bytes", len(html_content))
+    if key and not html_content.startswith("<h1>Error"):
+        render_cache.put(key, html_content)
+
+
+def get_man_page_html(page_name, render_cache=None, timeout=RENDER_TIMEOUT, cancellation=None,
+                      low_priority=False, renderer='groff', section='', source_path=None):
+    """Return a page's complete HTML, from ``render_cache`` when possible."""
+    return ''.join(iter_man_page_html(page_name, render_cache, timeout, cancellation, low_priority,
+                                      renderer, section, source_path, chunked=False))
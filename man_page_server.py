@@ -0,0 +1,226 @@
+import asyncio
+import html
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import instrumentation
+from html_export import (
+    html_document, name_from_file, page_document, page_url, section_index_html, site_index_html,
+)
+from man_page_renderer import RENDER_TIMEOUT, get_man_page_html, page_title, resolve_man_page
+from search_index import DescriptionIndex, NameSearchIndex
+
+# The server only listens on localhost
+SERVE_HOST = '127.0.0.1'
+
+# Seconds a client gets to send its request line and headers
+REQUEST_TIMEOUT = 10
+MAX_REQUEST_LINE = 8192
+MAX_HEADERS = 100
+
+# Results listed per group on the search page
+NAME_RESULTS = 50
+DESCRIPTION_RESULTS = 30
+DESCRIPTION_MIN_QUERY = 2
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+_SEARCH_FORM = ('<form action="{action}" method="get"><input name="q" value="{query}" autofocus> '
+                '<input type="submit" value="Search"></form>')
+
+
+def _render_page(name, section, path, render_cache, renderer, timeout):
+    """Render a page on a worker thread; returns (source file or None, HTML)."""
+    if not path:
+        path = resolve_man_page(name, section)
+    return path, get_man_page_html(name, render_cache, timeout, renderer=renderer,
+                                   section=section, source_path=path)
+
+
+class ManPageServer:
+    """Serves the section list, search and rendered pages over HTTP.
+
+    URLs follow the layout of an ``--export-html`` site (``/``,
+    ``/<section>/index.html``, ``/<section>/<name>.html``) plus
+    ``/search?q=``, so the same relative links work in both.
+
+    Everything runs on one asyncio event loop except rendering, which goes
+    to a pool of ``max_renders`` threads (each mostly waiting for man)
+    through ``render_cache``, shared by every client.  Requests for a page
+    that is already being rendered wait for that render instead of starting
+    another one, and a client that disconnects doesn't cancel a render
+    others are waiting for.  The index never changes while serving, so
+    section listings are built once.
+    """
+
+    def __init__(self, index, render_cache, renderer='groff', timeout=RENDER_TIMEOUT,
+                 max_renders=4, host=SERVE_HOST, port=0):
+        self.index = index
+        self.render_cache = render_cache
+        self.renderer = renderer
+        self.timeout = timeout
+        self.host = host
+        self.port = port
+        self._pool = ThreadPoolExecutor(max_workers=max_renders, thread_name_prefix='render')
+        self._rendering = {}  # (name, section) -> future of the render in progress
+        self._listings = {}  # section, or None for the front page -> HTML
+        self._search = None  # future of (NameSearchIndex, DescriptionIndex)
+        self.renders = 0
+        self.coalesced = 0
+
+    async def serve(self):
+        """Serve until cancelled."""
+        loop = asyncio.get_running_loop()
+        # Built while the first clients browse, so the first search doesn't wait for it
+        self._search = loop.run_in_executor(None, self._build_search)
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 lets the system pick a free one
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Serving {len(self.index)} man pages on http://{self.host}:{self.port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _build_search(self):
+        return NameSearchIndex(self.index.unique_names()), DescriptionIndex(self.index)
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except (ValueError, asyncio.LimitOverrunError):
+                status, body = 400, self._error_page(400, "Malformed request.")
+                method = 'GET'
+            else:
+                with instrumentation.span("serve request", target=target):
+                    status, body = await self._respond(method, target)
+            data = body.encode()
+            writer.write((f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+                          "Content-Type: text/html; charset=utf-8\r\n"
+                          f"Content-Length: {len(data)}\r\n"
+                          "Connection: close\r\n\r\n").encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(data)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Return the method and target of a request, skipping its headers."""
+        line = await reader.readline()
+        if not line or len(line) > MAX_REQUEST_LINE:
+            raise ValueError("bad request line")
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ValueError("bad request line")
+        for _ in range(MAX_HEADERS):
+            if (await reader.readline()) in (b'\r\n', b'\n', b''):
+                return parts[0], parts[1]
+        raise ValueError("too many headers")
+
+    def _error_page(self, status, message):
+        return html_document(_STATUS_TEXT[status], '<a href="/">All sections</a>',
+                             f"<h1>{_STATUS_TEXT[status]}</h1>\n<p>{html.escape(message)}</p>")
+
+    async def _respond(self, method, target):
+        """Return (status, HTML) for a request."""
+        if method not in ('GET', 'HEAD'):
+            return 405, self._error_page(405, f"{method} is not supported.")
+        url = urlsplit(target)
+        segments = [unquote(segment) for segment in url.path.split('/')[1:]]
+        if segments in ([''], ['index.html']):
+            return 200, self._listing(None)
+        if segments == ['search']:
+            query = parse_qs(url.query).get('q', [''])[0]
+            return 200, await self._search_page(query)
+        if len(segments) == 2:
+            section = name_from_file(segments[0])
+            if section in self.index.by_section():
+                if segments[1] in ('', 'index.html'):
+                    return 200, self._listing(section)
+                if segments[1].endswith('.html'):
+                    name = name_from_file(segments[1][:-len('.html')])
+                    if self.index.find(name, section) is not None:
+                        return await self._page(name, section)
+        return 404, self._error_page(404, f"No such page: {url.path}")
+
+    # --- Pages ---
+
+    def _listing(self, section):
+        listing = self._listings.get(section)
+        if listing is None:
+            if section is None:
+                listing = site_index_html(self.index, _SEARCH_FORM.format(action='search', query=''))
+            else:
+                listing = section_index_html(self.index, section)
+            self._listings[section] = listing
+        return listing
+
+    async def _page(self, name, section):
+        key = (name, section)
+        future = self._rendering.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(name, section))
+            self._rendering[key] = future
+            future.add_done_callback(lambda _: self._rendering.pop(key, None))
+        else:
+            self.coalesced += 1
+            instrumentation.count("server.coalesced")
+        # Shielded, so a client going away doesn't cancel the render for the others
+        html_content = await asyncio.shield(future)
+        status = 500 if html_content.startswith("<h1>Error") else 200
+        return status, page_document(name, section, html_content)
+
+    async def _render(self, name, section):
+        self.renders += 1
+        loop = asyncio.get_running_loop()
+        path, html_content = await loop.run_in_executor(
+            self._pool, _render_page, name, section, self.index.page_path(name, section),
+            self.render_cache, self.renderer, self.timeout)
+        if path:
+            # Saves the next request for the page a `man -w`
+            self.index.set_path(name, section, path)
+        return html_content
+
+    async def _search_page(self, query):
+        name_index, description_index = await self._search
+        index = self.index
+        groups = []
+        if query:
+            names = name_index.names
+            listed = set()
+            for title, positions in zip(("Exact Matches", "Starts With", "Contains"),
+                                        name_index.search_positions(query)):
+                pages = [(name, section) for name in map(names.__getitem__, positions[:NAME_RESULTS])
+                         for section in index.sections(name)]
+                # The names left out are counted once, whatever their sections
+                groups.append((title, pages, len(pages) + max(0, len(positions) - NAME_RESULTS)))
+                listed.update(name for name, _ in pages)
+            if len(query) >= DESCRIPTION_MIN_QUERY:
+                matches = description_index.search(query, DESCRIPTION_RESULTS, exclude=listed)
+                groups.append(("Description Matches", [(name, section) for name, section, _ in matches],
+                               len(matches)))
+
+        body = [_SEARCH_FORM.format(action='search', query=html.escape(query, quote=True)),
+                f"<h1>Search: {html.escape(query)}</h1>" if query else "<h1>Search</h1>"]
+        for title, pages, total in groups:
+            if not pages:
+                continue
+            more = f" (first {len(pages)} of {total})" if total > len(pages) else ""
+            body.append(f"<h2>{title}{more}</h2>\n<ul>")
+            for name, section in pages:
+                description = index.description(name, section)
+                body.append(f'<li><a href="{page_url(name, section)}">{html.escape(page_title(name, section))}</a>'
+                            + (f' - {html.escape(description)}' if description else '') + '</li>')
+            body.append("</ul>")
+        if query and not any(pages for _, pages, _ in groups):
+            body.append("<p>No pages found.</p>")
+        return html_document(f"Search: {query}" if query else "Search", '<a href="index.html">All sections</a>',
+                             "\n".join(body))
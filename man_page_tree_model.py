@@ -0,0 +1,214 @@
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+import instrumentation
+from man_page_index import section_title
+
+# Child rows added to a section each time the view asks for more
+FETCH_BATCH_SIZE = 500
+
+# Filter results remembered, so backspacing over a query is instant
+FILTER_MEMO_SIZE = 32
+
+# internalId of top level (section) rows; page rows store their section row + 1
+_SECTION_ID = 0
+
+
+class ManPageTreeModel(QAbstractItemModel):
+    """Sections and their page names, straight from the shared index.
+
+    No item objects are created: rows map to positions in the index's
+    per-section name lists.  Filtering swaps that row mapping and resets the
+    model.  Page rows are only exposed once a section is expanded,
+    FETCH_BATCH_SIZE at a time through canFetchMore/fetchMore, so a view
+    never lays out more rows than it has been scrolled through.
+
+    Filtering compares against lowercased names computed once per index
+    update.  A query that extends a recent one only searches that query's
+    results, and recent results are memoized.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._all_pages = {}  # section -> sorted list of names
+        self._lower_names = {}  # section -> lowercased names, filled in on first filter
+        self._filter_memo = OrderedDict()  # lowercased query -> [(section, positions)]
+        self._sections = []  # sections shown, in display order
+        self._names = []  # full name list of each section in _sections
+        self._rows = []  # positions in _names shown for each section
+        self._fetched = []  # how many of those rows the view has been given
+        self._filter_text = ''
+        self._message = None  # Shown as the only row, e.g. an index error
+
+    # --- Contents ---
+
+    def set_pages(self, by_section):
+        """Show ``by_section`` ({section: sorted names}) with the current filter."""
+        if by_section is self._all_pages and self._message is None:
+            return  # Unchanged, so the view keeps its rows and scroll position
+        if by_section is not self._all_pages:
+            self._all_pages = by_section
+            self._lower_names = {}
+            self._filter_memo.clear()
+        self._message = None
+        self._rebuild()
+
+    def set_filter(self, text):
+        """Only show names containing ``text`` (case insensitive)."""
+        self._filter_text = text
+        self._rebuild()
+
+    def is_cached(self, text):
+        """Return True if filtering on ``text`` needs no searching."""
+        return not text or text.lower() in self._filter_memo
+
+    def set_message(self, message):
+        """Replace the contents with a single informational row."""
+        self.beginResetModel()
+        self._all_pages = {}
+        self._lower_names = {}
+        self._filter_memo.clear()
+        self._sections = []
+        self._names = []
+        self._rows = []
+        self._fetched = []
+        self._message = message
+        self.endResetModel()
+
+    def _rebuild(self):
+        with instrumentation.span("list filter", query=self._filter_text):
+            matches = self._matches(self._filter_text.lower())
+            self.beginResetModel()
+            self._sections = [section for section, _ in matches]
+            self._names = [self._all_pages[section] for section, _ in matches]
+            self._rows = [positions for _, positions in matches]
+            self._fetched = [0] * len(matches)
+            self.endResetModel()
+
+    def _matches(self, text):
+        """Return [(section, positions of names containing ``text``)]."""
+        if not text:
+            return [(section, range(len(self._all_pages[section]))) for section in sorted(self._all_pages)]
+        memo = self._filter_memo
+        if text in memo:
+            memo.move_to_end(text)
+            return memo[text]
+
+        # Names containing text also contain every prefix of it, so narrow
+        # down the results of the longest prefix searched recently
+        for length in range(len(text) - 1, 0, -1):
+            if text[:length] in memo:
+                candidates = memo[text[:length]]
+                break
+        else:
+            candidates = self._matches('')
+
+        matches = []
+        for section, positions in candidates:
+            lower_names = self._lower_names.get(section)
+            if lower_names is None:
+                lower_names = [name.lower() for name in self._all_pages[section]]
+                self._lower_names[section] = lower_names
+            found = [position for position in positions if text in lower_names[position]]
+            if found:
+                matches.append((section, found))
+
+        memo[text] = matches
+        if len(memo) > FILTER_MEMO_SIZE:
+            memo.popitem(last=False)
+        return matches
+
+    def sections(self):
+        return list(self._sections)
+
+    def section_row(self, section):
+        """Return the model index of ``section``'s top level row, or an invalid one."""
+        try:
+            return self.index(self._sections.index(section), 0)
+        except ValueError:
+            return QModelIndex()
+
+    def page_name(self, index):
+        """Return the page name at ``index``, or None for section rows."""
+        if not index.isValid() or index.internalId() == _SECTION_ID:
+            return None
+        section_row = index.internalId() - 1
+        return self._names[section_row][self._rows[section_row][index.row()]]
+
+    def page(self, index):
+        """Return the (name, section) of the page at ``index``, or None for section rows."""
+        name = self.page_name(index)
+        if name is None:
+            return None
+        return name, self._sections[index.internalId() - 1]
+
+    def pages(self, index, count):
+        """Return the page at ``index`` and up to ``count - 1`` pages below it."""
+        if self.page_name(index) is None:
+            return []
+        section_row = index.internalId() - 1
+        names = self._names[section_row]
+        section = self._sections[section_row]
+        return [(names[position], section)
+                for position in self._rows[section_row][index.row():index.row() + count]]
+
+    # --- QAbstractItemModel ---
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row >= self.rowCount():
+                return QModelIndex()
+            return self.createIndex(row, 0, _SECTION_ID)
+        if parent.internalId() != _SECTION_ID or row >= self._fetched[parent.row()]:
+            return QModelIndex()
+        return self.createIndex(row, 0, parent.row() + 1)
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid() or index.internalId() == _SECTION_ID:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, _SECTION_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return 1 if self._message is not None else len(self._sections)
+        if parent.internalId() == _SECTION_ID and self._message is None:
+            return self._fetched[parent.row()]
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return self.rowCount() > 0
+        # Sections show an expander before any of their rows are fetched
+        return (parent.internalId() == _SECTION_ID and self._message is None
+                and bool(self._rows[parent.row()]))
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != _SECTION_ID or self._message is not None:
+            return False
+        row = parent.row()
+        return self._fetched[row] < len(self._rows[row])
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        row = parent.row()
+        first = self._fetched[row]
+        last = min(first + FETCH_BATCH_SIZE, len(self._rows[row])) - 1
+        self.beginInsertRows(parent, first, last)
+        self._fetched[row] = last + 1
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if self._message is not None:
+            return self._message
+        if index.internalId() == _SECTION_ID:
+            return section_title(self._sections[index.row()])
+        return self.page_name(index)
@@ -1,4 +1,7 @@
-import subprocess
+import re
+import time
+from collections import deque
+
 from PyQt6.QtWidgets import (
     QWidget,
     QVBoxLayout,
@@ -6,16 +9,41 @@ from PyQt6.QtWidgets import (
     QTextBrowser,
     QPushButton,
     QHBoxLayout,
+    QProgressBar,
 )
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
+from PyQt6.QtGui import QTextCursor
+
+import instrumentation
+from man_page_renderer import page_title
+
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
 
 
 class ManPageViewerWidget(QWidget):
     # Signal that parent can connect to for "back to main"
     back_to_main = pyqtSignal()
 
-    def __init__(self, parent=None):
+    def __init__(self, render_service, parent=None):
         super().__init__(parent)
+        self.render_service = render_service
+        self.render_service.page_chunk_ready.connect(self._on_page_chunk_ready)
+        self.render_service.page_finished.connect(self._on_page_finished)
+        self._current_request_id = None
+
+        # Chunks after the first are appended one per event loop turn, so
+        # scrolling and searching stay responsive while a big page loads
+        self._pending_chunks = deque()
+        self._first_chunk_shown = False
+        self._render_finished = False
+        self._append_timer = QTimer(self)
+        self._append_timer.setSingleShot(True)
+        self._append_timer.setInterval(0)
+        self._append_timer.timeout.connect(self._append_next_chunk)
+
+        # Time to first screen and to full document for the last page loaded, in ms
+        self._load_started = None
+        self.last_load_timings = {}
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
 
@@ -27,6 +55,22 @@ class ManPageViewerWidget(QWidget):
         nav_layout.addStretch()
         self.layout.addLayout(nav_layout)
 
+        # --- Loading indicator, shown while a page renders ---
+        self.loading_widget = QWidget()
+        loading_layout = QVBoxLayout(self.loading_widget)
+        loading_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.loading_label = QLabel()
+        self.loading_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.loading_label.setStyleSheet("QLabel { color: gray; font-size: 16px; }")
+        loading_layout.addWidget(self.loading_label)
+        self.loading_spinner = QProgressBar()
+        self.loading_spinner.setRange(0, 0)  # Busy indicator
+        self.loading_spinner.setTextVisible(False)
+        self.loading_spinner.setFixedWidth(200)
+        loading_layout.addWidget(self.loading_spinner, 0, Qt.AlignmentFlag.AlignCenter)
+        self.layout.addWidget(self.loading_widget)
+        self.loading_widget.hide()
+
         # --- Viewer ---
         self.viewer = QTextBrowser()
         self.viewer.setReadOnly(True)
@@ -43,43 +87,75 @@ class ManPageViewerWidget(QWidget):
         """Emit signal to tell parent to go back to main view."""
         self.back_to_main.emit()
 
-    def load_man_page(self, page_name):
-        """Load and display the requested man page."""
+    def load_man_page(self, page_name, section=''):
+        """Start rendering the requested man page; it is shown as it arrives.
+
+        An empty ``section`` shows the first page man finds by that name.
+        """
         self.error_label.hide()
-        self.viewer.show()
+        self.viewer.hide()
+        self.loading_label.setText(f"Loading {page_title(page_name, section)}...")
+        self.loading_widget.show()
+        self._pending_chunks.clear()
+        self._append_timer.stop()
+        self._first_chunk_shown = False
+        self._render_finished = False
+        self._load_started = time.perf_counter()
+        self.last_load_timings = {'page': page_title(page_name, section)}
+        # Supersedes (and cancels) any page still rendering
+        self._current_request_id = self.render_service.render(page_name, section)
 
-        html_content = self._get_man_page_html(page_name)
-        if html_content.startswith("<h1>Error"):
+    def _on_page_chunk_ready(self, request_id, page_name, html_chunk):
+        if request_id != self._current_request_id:
+            return  # A newer page was requested meanwhile
+        if not self._first_chunk_shown:
+            self._show_first_chunk(html_chunk)
+        else:
+            self._pending_chunks.append(html_chunk)
+            if not self._append_timer.isActive():
+                self._append_timer.start()
+
+    def _on_page_finished(self, request_id, page_name):
+        if request_id != self._current_request_id:
+            return
+        self._render_finished = True
+        if not self._pending_chunks:
+            self._record_timing('full_document_ms')
+
+    def _show_first_chunk(self, html_chunk):
+        self._first_chunk_shown = True
+        self.loading_widget.hide()
+        if html_chunk.startswith("<h1>Error"):
             self.viewer.hide()
             self.error_label.setText(
-                html_content.replace("<h1>", "").replace("</h1>", "")
+                html_chunk.replace("<h1>", "").replace("</h1>", "")
             )
             self.error_label.show()
-        else:
-            self.viewer.setHtml(html_content)
-
-    def _get_man_page_html(self, page_name):
-        """Retrieve a man page as HTML or plain text wrapped in <pre> tags."""
-        try:
-            result = subprocess.run(
-                ["man", "-Thtml", page_name],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            if result.stdout:
-                return result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Error getting HTML man page for {page_name} with -Thtml: {e}")
-            print(f"Stderr: {e.stderr}")
-            try:
-                result = subprocess.run(
-                    ["man", page_name], capture_output=True, text=True, check=True
-                )
-                return f"<pre>{result.stdout}</pre>"
-            except subprocess.CalledProcessError as e_plain:
-                print(f"Error getting plain text man page for {page_name}: {e_plain}")
-                print(f"Stderr: {e_plain.stderr}")
-                return f"<h1>Error: Man page for '{page_name}' not found or could not be rendered.</h1>"
-
-        return f"<h1>Error: Man page for '{page_name}' not found or could not be rendered.</h1>"
\ No newline at end of file
+            return
+        # Later chunks are inserted as fragments, which do not see the
+        # document's <style> block unless it is the default style sheet
+        style = _STYLE_BLOCK.search(html_chunk)
+        self.viewer.document().setDefaultStyleSheet(style.group(1) if style else "")
+        with instrumentation.span("viewer setHtml", bytes=len(html_chunk)):
+            self.viewer.setHtml(html_chunk)
+        self.viewer.show()
+        self._record_timing('first_screen_ms')
+
+    def _append_next_chunk(self):
+        if not self._pending_chunks:
+            return
+        cursor = QTextCursor(self.viewer.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        html_chunk = self._pending_chunks.popleft()
+        with instrumentation.span("viewer insertHtml", bytes=len(html_chunk)):
+            cursor.insertHtml(html_chunk)
+        if self._pending_chunks:
+            self._append_timer.start()
+        elif self._render_finished:
+            self._record_timing('full_document_ms')
+
+    def _record_timing(self, name):
+        now = time.perf_counter()
+        self.last_load_timings[name] = (now - self._load_started) * 1000
+        instrumentation.add_span(f"page load {name}", self._load_started, now,
+                                 page=self.last_load_timings['page'])
@@ -0,0 +1,187 @@
+import bz2
+import gzip
+import lzma
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from index_cache import man_paths
+
+# Compression suffixes man-db understands and how to open them
+DECOMPRESSORS = {
+    '.gz': gzip.open,
+    '.z': gzip.open,
+    '.Z': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+}
+SKIPPED_SUFFIXES = ('.zst',)  # No decompressor in the standard library
+
+# How many bytes of a page to read when looking for its NAME section
+WHATIS_READ_LIMIT = 16384
+MAX_SO_DEPTH = 5
+
+_NAME_HEADING = re.compile(r'^\.S[Hh]\s+"?(NAME|Name)"?\s*$')
+_FONT_MACRO = re.compile(r'^\.(?:B|I|SM|SB|[BIR][BIR])\s+(.*)$')
+_WHATIS_DASH = re.compile(r'\s+-+\s+')
+_ESCAPES = re.compile(r'\\(?:[f*](?:\[[^]]*\]|\(..|.)|s[+-]?\d|\(..|\[[^]]*\]|&|\||\^|e|-|.)')
+
+
+def _scan_workers():
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def split_page_file_name(file_name):
+    """Return (name, section, compression suffix) for a page file, or None.
+
+    ``ls.1.gz`` becomes ``('ls', '1', '.gz')`` and ``openssl.1ssl`` becomes
+    ``('openssl', '1ssl', '')``.
+    """
+    base, ext = os.path.splitext(file_name)
+    if ext in SKIPPED_SUFFIXES:
+        return None
+    compression = ''
+    if ext in DECOMPRESSORS:
+        compression = ext
+        file_name = base
+    name, dot, section = file_name.rpartition('.')
+    if not dot or not name or not section or not section[0].isalnum():
+        return None
+    return name, section, compression
+
+
+def _scan_section_dir(directory):
+    entries = []
+    try:
+        with os.scandir(directory) as it:
+            for dir_entry in it:
+                parts = split_page_file_name(dir_entry.name)
+                if parts:
+                    entries.append((parts[0], parts[1], dir_entry.path))
+    except OSError as e:
+        print(f"Error scanning {directory}: {e}")
+    return entries
+
+
+def section_dirs(paths=None):
+    """Return every man*/ section directory below the given hierarchies."""
+    if paths is None:
+        paths = man_paths()
+    dirs = []
+    for root in paths:
+        try:
+            with os.scandir(root) as it:
+                # Keep hierarchies in search path order so earlier ones win
+                dirs.extend(sorted(dir_entry.path for dir_entry in it
+                                   if dir_entry.name.startswith('man') and dir_entry.is_dir()))
+        except OSError:
+            continue
+    return dirs
+
+
+def scan_man_pages(paths=None, max_workers=None):
+    """Walk every section directory in parallel.
+
+    Returns a list of (name, section, source path).  Pages earlier in the
+    search path shadow pages with the same name and section later in it,
+    like man itself.
+    """
+    dirs = section_dirs(paths)
+    seen = set()
+    pages = []
+    with ThreadPoolExecutor(max_workers=max_workers or _scan_workers()) as pool:
+        for entries in pool.map(_scan_section_dir, dirs):
+            for name, section, path in entries:
+                if (name, section) not in seen:
+                    seen.add((name, section))
+                    pages.append((name, section, path))
+    return pages
+
+
+def open_page_source(path):
+    """Open a (possibly compressed) page source as text."""
+    opener = DECOMPRESSORS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def strip_escapes(text):
+    """Remove roff escapes from a line of page source, keeping dashes."""
+    text = text.replace('\\-', '-').replace('\\(em', '-').replace('\\(en', '-')
+    return _ESCAPES.sub('', text)
+
+
+def read_whatis(path, depth=0):
+    """Return the one line description from a page's NAME section, or ''.
+
+    Handles man(7) ``name \\- description`` lines, mdoc(7) ``.Nd`` and
+    ``.so`` links to other pages.
+    """
+    try:
+        with open_page_source(path) as f:
+            text = f.read(WHATIS_READ_LIMIT)
+    except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+        print(f"Error reading {path}: {e}")
+        return ''
+
+    lines = text.splitlines()
+    for line in lines[:3]:
+        if line.startswith('.so ') and depth < MAX_SO_DEPTH:
+            # .so paths are relative to the root of the hierarchy
+            root = os.path.dirname(os.path.dirname(path))
+            target = os.path.join(root, line[4:].strip())
+            for suffix in [''] + list(DECOMPRESSORS):
+                if os.path.exists(target + suffix):
+                    return read_whatis(target + suffix, depth + 1)
+            return ''
+
+    in_name = False
+    collected = []
+    for line in lines:
+        if line.startswith('.Nd '):
+            return strip_escapes(line[4:]).strip()
+        if _NAME_HEADING.match(line):
+            in_name = True
+            continue
+        if not in_name:
+            continue
+        if line.startswith('.S'):
+            break
+        font_macro = _FONT_MACRO.match(line)
+        if font_macro:
+            collected.append(font_macro.group(1).replace('"', ''))
+        elif not line.startswith('.') and not line.startswith("'"):
+            collected.append(line)
+    name_line = strip_escapes(' '.join(collected))
+    parts = _WHATIS_DASH.split(name_line, maxsplit=1)
+    return parts[1].strip() if len(parts) == 2 else ''
+
+
+def iter_scan_batches(batch_size, paths=None, max_workers=None):
+    """Yield index entries found by scanning MANPATH instead of running apropos.
+
+    Names, sections and source files come from the directory listings alone
+    and are yielded first with empty descriptions, so the list is usable
+    right away.  The whatis lines are then read from the page sources in
+    parallel and yielded again as (name, section, description, path)
+    updates for the same entries.
+    """
+    pages = scan_man_pages(paths, max_workers)
+    for start in range(0, len(pages), batch_size):
+        yield [(name, section, '', path) for name, section, path in pages[start:start + batch_size]]
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or _scan_workers())
+    try:
+        batch = []
+        descriptions = pool.map(read_whatis, [path for _, _, path in pages])
+        for (name, section, path), description in zip(pages, descriptions):
+            if description:
+                batch.append((name, section, description, path))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    finally:
+        # Don't wait for outstanding reads if the caller stopped early
+        pool.shutdown(wait=False, cancel_futures=True)
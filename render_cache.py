@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import instrumentation
+from index_cache import cache_dir
+
+# Default byte budgets for the two tiers
+MEMORY_BUDGET = 64 * 1024 * 1024
+DISK_BUDGET = 256 * 1024 * 1024
+
+PAGE_CACHE_DIR = 'pages'
+PAGE_FILE_SUFFIX = '.html.z'
+
+
+def render_key(source_path):
+    """Return the cache key for a page source, or None if it cannot be stat'ed.
+
+    The key includes the file's mtime and size, so a package upgrade that
+    replaces the page makes old renders unreachable instead of stale.
+    """
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return None
+    return f"{os.path.realpath(source_path)}\0{st.st_mtime_ns}\0{st.st_size}"
+
+
+class RenderCache:
+    """Two tier LRU cache of rendered man page HTML.
+
+    The memory tier keeps recently shown pages as strings; the disk tier keeps
+    zlib-compressed copies under the user cache directory so they survive
+    restarts.  Each tier evicts least recently used pages once its byte budget
+    is exceeded.  All methods are safe to call from several threads.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET, directory=None):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.directory = directory or os.path.join(cache_dir(), PAGE_CACHE_DIR)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> html, least recently used first
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Measured on first disk write
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached HTML for ``key``, or None."""
+        with self._lock:
+            html = self._memory.get(key)
+            if html is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                instrumentation.count("render_cache.memory_hits")
+                return html
+
+        html = self._read_disk(key)
+        with self._lock:
+            if html is None:
+                self.misses += 1
+                instrumentation.count("render_cache.misses")
+                return None
+            self.hits += 1
+            instrumentation.count("render_cache.disk_hits")
+            self._store_memory(key, html)
+        return html
+
+    def put(self, key, html):
+        """Store rendered HTML in both tiers."""
+        with self._lock:
+            self._store_memory(key, html)
+        self._write_disk(key, html)
+
+    # --- Memory tier ---
+
+    def _store_memory(self, key, html):
+        # Characters stand in for bytes; man -Thtml output is almost all ASCII
+        size = len(html)
+        if size > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = html
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # --- Disk tier ---
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.directory, digest + PAGE_FILE_SUFFIX)
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The mtime doubles as the LRU timestamp
+            os.utime(path)
+            stored_key, _, html = zlib.decompress(data).decode('utf-8', 'surrogateescape').partition('\n')
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        # Guard against (unlikely) digest collisions
+        return html if stored_key == key else None
+
+    def _write_disk(self, key, html):
+        if self.disk_budget <= 0:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = zlib.compress(f"{key}\n{html}".encode('utf-8', 'surrogateescape'))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing render cache entry: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._measure_disk()
+            else:
+                # A rewritten entry only adds the difference
+                self._disk_bytes += len(data) - replaced
+            if self._disk_bytes > self.disk_budget:
+                self._disk_bytes = self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for dir_entry in it:
+                    if dir_entry.name.endswith(PAGE_FILE_SUFFIX):
+                        st = dir_entry.stat()
+                        entries.append((st.st_mtime_ns, st.st_size, dir_entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _measure_disk(self):
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier fits its budget."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% so we don't rescan the directory on every write
+        target = self.disk_budget * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
@@ -0,0 +1,170 @@
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from man_page_renderer import (
+    RENDER_TIMEOUT, RenderCancellation, RenderCancelled, error_html, get_man_page_html,
+    iter_man_page_html, page_title, resolve_man_page,
+)
+
+# Renders allowed to run at the same time
+MAX_CONCURRENT_RENDERS = 2
+
+# Background renders: at most this many queued pages, one at a time
+PREFETCH_LIMIT = 3
+
+
+class _RenderJob(QRunnable):
+    def __init__(self, service, request_id, page, source_path, cancellation, prefetch=False,
+                 preview=False):
+        super().__init__()
+        self.service = service
+        self.request_id = request_id
+        self.page_name, self.section = page
+        self.source_path = source_path
+        self.cancellation = cancellation
+        self.prefetch = prefetch
+        self.preview = preview
+
+    def run(self):
+        try:
+            if not self.source_path and self.service.index is not None:
+                # Resolved once; the index remembers it for next time
+                self.source_path = resolve_man_page(self.page_name, self.section)
+                if self.source_path:
+                    self.service.page_resolved.emit(self.page_name, self.section, self.source_path)
+            if self.prefetch or self.preview:
+                # A prefetch only needs to reach the render cache
+                html = get_man_page_html(
+                    self.page_name, self.service.render_cache, self.service.timeout,
+                    self.cancellation, low_priority=True, renderer=self.service.renderer,
+                    section=self.section, source_path=self.source_path,
+                )
+                if self.preview:
+                    self.service.preview_ready.emit(self.request_id, html)
+                return
+            chunks = iter_man_page_html(
+                self.page_name, self.service.render_cache, self.service.timeout, self.cancellation,
+                renderer=self.service.renderer, section=self.section, source_path=self.source_path,
+            )
+            title = page_title(self.page_name, self.section)
+            for chunk in chunks:
+                if self.cancellation.cancelled:
+                    chunks.close()
+                    return
+                # Emitted from the worker thread; queued to slots on the GUI thread
+                self.service.page_chunk_ready.emit(self.request_id, title, chunk)
+            self.service.page_finished.emit(self.request_id, title)
+        except RenderCancelled:
+            return
+        except Exception:
+            # An exception escaping a QRunnable aborts the process, and the
+            # viewer would wait for the page forever
+            title = page_title(self.page_name, self.section)
+            print(f"Error rendering {title}:")
+            traceback.print_exc()
+            if self.cancellation.cancelled or self.prefetch:
+                return
+            if self.preview:
+                self.service.preview_ready.emit(self.request_id, error_html(title))
+                return
+            self.service.page_chunk_ready.emit(self.request_id, title, error_html(title))
+            self.service.page_finished.emit(self.request_id, title)
+        finally:
+            self.service._forget(self.request_id)
+
+
+class RenderService(QObject):
+    """Renders man pages on a bounded worker pool instead of the GUI thread.
+
+    ``render()`` supersedes the previous request: anything still rendering
+    for an earlier call is cancelled (its man process is killed), so quickly
+    clicking through pages only finishes the last one.  Pages arrive as a
+    series of ``page_chunk_ready`` signals while man is still producing them,
+    followed by ``page_finished``.
+
+    ``prefetch()`` renders likely next pages into the render cache on a
+    separate single-thread pool at low CPU priority.  A real ``render()``
+    cancels all prefetching so it never waits behind a speculative page.
+    ``preview()`` renders a whole page on that pool too and hands it back
+    through ``preview_ready``; previews are left running when pages are
+    opened, since they are prepared for a screen the user returns to.
+
+    Pages are (name, section) pairs; an empty section means man's first
+    match.  With an ``index``, their source files are looked up in its
+    resolution table and handed to man directly, and files man had to find
+    are recorded there (on the GUI thread, through ``page_resolved``).
+    """
+    page_chunk_ready = pyqtSignal(int, str, str)  # request id, page title, html chunk
+    page_finished = pyqtSignal(int, str)  # request id, page title
+    page_resolved = pyqtSignal(str, str, str)  # page name, section, source path
+    preview_ready = pyqtSignal(int, str)  # request id, complete html
+
+    def __init__(self, render_cache=None, max_concurrent=MAX_CONCURRENT_RENDERS,
+                 timeout=RENDER_TIMEOUT, renderer='groff', index=None, parent=None):
+        super().__init__(parent)
+        self.render_cache = render_cache
+        self.index = index
+        self.page_resolved.connect(self._on_page_resolved)
+        self.timeout = timeout
+        self.renderer = renderer  # One of man_page_renderer.RENDERERS
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_concurrent)
+        self._prefetch_pool = QThreadPool(self)
+        self._prefetch_pool.setMaxThreadCount(1)
+        self._next_request_id = 1
+        self._in_flight = {}  # request id -> RenderCancellation
+        self._prefetching = {}  # request id -> RenderCancellation
+        self._previewing = {}  # request id -> RenderCancellation
+
+    def render(self, page_name, section=''):
+        """Start rendering ``page_name`` in ``section`` and return its request id."""
+        self.cancel_all()
+        return self._start(self._pool, self._in_flight, (page_name, section), prefetch=False)
+
+    def prefetch(self, pages):
+        """Render up to PREFETCH_LIMIT (name, section) pages into the cache in the background.
+
+        Replaces whatever an earlier call left queued or running.
+        """
+        self._cancel(self._prefetching)
+        for page in pages[:PREFETCH_LIMIT]:
+            self._start(self._prefetch_pool, self._prefetching, page, prefetch=True)
+
+    def preview(self, page_name, section=''):
+        """Render a page in the background and return its request id; see ``preview_ready``."""
+        return self._start(self._prefetch_pool, self._previewing, (page_name, section),
+                           prefetch=False, preview=True)
+
+    def cancel_all(self):
+        self._cancel(self._in_flight)
+        self._cancel(self._prefetching)
+
+    def shutdown(self):
+        """Cancel outstanding renders and wait for the workers to exit."""
+        self.cancel_all()
+        self._cancel(self._previewing)
+        self._pool.waitForDone()
+        self._prefetch_pool.waitForDone()
+
+    def _start(self, pool, jobs, page, prefetch, preview=False):
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        cancellation = RenderCancellation()
+        jobs[request_id] = cancellation
+        # Looked up here: the index is only used from the GUI thread
+        source_path = self.index.page_path(*page) if self.index is not None else None
+        pool.start(_RenderJob(self, request_id, page, source_path, cancellation, prefetch, preview))
+        return request_id
+
+    def _on_page_resolved(self, page_name, section, source_path):
+        self.index.set_path(page_name, section, source_path)
+
+    def _cancel(self, jobs):
+        for cancellation in list(jobs.values()):
+            cancellation.cancel()
+
+    def _forget(self, request_id):
+        self._in_flight.pop(request_id, None)
+        self._prefetching.pop(request_id, None)
+        self._previewing.pop(request_id, None)
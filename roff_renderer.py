@@ -0,0 +1,891 @@
+"""Pure-Python renderer for the common subset of man(7) and mdoc(7).
+
+Rendering a page with ``man -Thtml`` starts man, preconv, tbl, groff and
+grohtml.  For the many pages that only use the basic macros this module
+turns the page source into HTML directly, including simple tbl tables.
+Anything outside the supported subset (equations, macro definitions,
+conditionals, unknown macros or escapes) raises UnsupportedRoff so the
+caller can fall back to man.
+"""
+import html
+import lzma
+import os
+import re
+
+from manpath_scanner import DECOMPRESSORS, open_page_source
+
+MAX_SO_DEPTH = 5
+
+
+class UnsupportedRoff(Exception):
+    """The page uses a construct this renderer does not handle."""
+
+
+# --- Escapes ---
+
+SPECIAL_CHARS = {
+    'em': '—', 'en': '–', 'hy': '-', 'mi': '-', 'pl': '+', 'mu': '×', 'di': '÷',
+    'bu': '•', 'co': '©', 'rg': '®', 'tm': '™', 'de': '°', 'sc': '§',
+    'aq': "'", 'dq': '"', 'lq': '“', 'rq': '”', 'oq': '‘', 'cq': '’',
+    'Fo': '«', 'Fc': '»', 'fo': '‹', 'fc': '›', 'ga': '`', 'aa': '´',
+    'ti': '~', 'ha': '^', 'ua': '↑', 'da': '↓', '->': '→', '<-': '←',
+    '<=': '≤', '>=': '≥', '!=': '≠', '==': '≡', '~~': '≈', '+-': '±',
+    'ba': '|', 'br': '│', 'rs': '\\', 'sl': '/', 'ul': '_', 'ru': '_', 'lh': '☜',
+    'rh': '☞', 'ci': '○', 'sq': '□', 'dg': '†', 'dd': '‡', 'OK': '✓',
+    'ss': 'ß', 'ae': 'æ', 'AE': 'Æ', 'o/': 'ø', 'O/': 'Ø', 'Po': '£',
+    'Eu': '€', 'eu': '€', 'Ye': '¥', 'ct': '¢', 'ps': '¶', 'r!': '¡',
+    'r?': '¿', 'lB': '[', 'rB': ']', 'lC': '{', 'rC': '}', 'la': '⟨', 'ra': '⟩',
+    'at': '@', 'sh': '#', 'Do': '$', 'eq': '=', 'fm': '′', 'sd': '″',
+    'ff': 'ff', 'fi': 'fi', 'fl': 'fl', 'Fi': 'ffi', 'Fl': 'ffl', 'if': '∞',
+    'bv': '|', 'or': '|', 'no': '¬', '**': '∗',
+    ':a': 'ä', ':o': 'ö', ':u': 'ü', ':A': 'Ä', ':O': 'Ö', ':U': 'Ü', ':e': 'ë', ':i': 'ï',
+    "'a": 'á', "'e": 'é', "'i": 'í', "'o": 'ó', "'u": 'ú', "'E": 'É',
+    '`a': 'à', '`e': 'è', '`o': 'ò', '^a': 'â', '^e': 'ê', '^o': 'ô', ',c': 'ç', '~n': 'ñ',
+}
+# Predefined strings (\*x) from man(7), mdoc(7) and common page preambles
+PREDEFINED_STRINGS = {
+    'R': '®', 'Tm': '™', 'lq': '“', 'rq': '”', 'S': '', 'HF': '',
+    'Am': '&', 'Ba': '|', 'Ge': '≥', 'Le': '≤', 'Lq': '“', 'Rq': '”',
+    'Pi': 'π', 'Ne': '≠', 'Na': 'NaN', 'If': '∞', 'Px': 'POSIX', 'Ai': 'ANSI',
+    'Lt': '<', 'Gt': '>',
+}
+FONTS = {
+    'R': '', 'P': None, '1': '', 'B': 'b', '3': 'b', 'I': 'i', '2': 'i', 'BI': 'bi', '4': 'bi',
+    'C': '', 'CW': '', 'CR': '', 'CB': 'b', 'CI': 'i', 'TT': '', 'TB': 'b', 'TI': 'i',
+}
+# Escapes that produce nothing visible in HTML output
+SILENT_ESCAPES = set('&|^),/%:{}')
+UNSUPPORTED_ESCAPES = set('nvwlLNozkxbDXYR$gHSAB')
+
+
+def _read_name(text, i):
+    """Read an escape's name at ``i``: one char, (xx or [name]; return (name, end)."""
+    if i >= len(text):
+        raise UnsupportedRoff("escape at end of line")
+    if text[i] == '(':
+        return text[i + 1:i + 3], i + 3
+    if text[i] == '[':
+        end = text.find(']', i)
+        if end < 0:
+            raise UnsupportedRoff("unterminated escape name")
+        return text[i + 1:end], end + 1
+    return text[i], i + 1
+
+
+def _special_char(name):
+    if name in SPECIAL_CHARS:
+        return SPECIAL_CHARS[name]
+    if name.startswith('u') and len(name) >= 5:
+        try:
+            return ''.join(chr(int(part[1:] if part.startswith('u') else part, 16))
+                           for part in name.split('_'))
+        except ValueError:
+            pass
+    if len(name) == 1:
+        return name
+    raise UnsupportedRoff(f"special character \\[{name}]")
+
+
+class _Inline:
+    """Converts roff text with escapes to HTML, tracking the current font."""
+
+    def __init__(self):
+        self.font = ''
+        self.previous_font = ''
+        self.strings = dict(PREDEFINED_STRINGS)
+
+    def open_tags(self, font):
+        return ''.join(f'<{tag}>' for tag in font)
+
+    def close_tags(self, font):
+        return ''.join(f'</{tag}>' for tag in reversed(font))
+
+    def switch_font(self, font):
+        if font is None:
+            font = self.previous_font
+        out = self.close_tags(self.font) + self.open_tags(font) if font != self.font else ''
+        self.previous_font, self.font = self.font, font
+        return out
+
+    def convert(self, text):
+        out = []
+        plain_start = 0
+        i = 0
+        length = len(text)
+        while i < length:
+            if text[i] != '\\':
+                i += 1
+                continue
+            out.append(html.escape(text[plain_start:i], quote=False))
+            i += 1
+            if i >= length:
+                break  # Line continuation; handled by the caller
+            c = text[i]
+            i += 1
+            if c == 'f':
+                name, i = _read_name(text, i)
+                if name not in FONTS:
+                    raise UnsupportedRoff(f"font {name}")
+                out.append(self.switch_font(FONTS[name]))
+            elif c in '([':
+                name, i = _read_name(text, i - 1)
+                out.append(html.escape(_special_char(name), quote=False))
+            elif c == '*':
+                name, i = _read_name(text, i)
+                if name not in self.strings:
+                    raise UnsupportedRoff(f"string \\*[{name}]")
+                out.append(html.escape(self.strings[name], quote=False))
+            elif c == 's':
+                # Point size changes: \s0, \s-1, \s+2, \s(12, \s[12]
+                if i < length and text[i] in '+-':
+                    i += 1
+                if i < length and text[i] in '([':
+                    _, i = _read_name(text, i)
+                elif i < length and text[i].isdigit():
+                    i += 1
+            elif c == 'm' or c == 'M':
+                _, i = _read_name(text, i)  # Colours are ignored
+            elif c == 'h':
+                # Horizontal motion, \h'1n': approximated by a space
+                end = text.find(text[i], i + 1) if i < length else -1
+                if end < 0:
+                    raise UnsupportedRoff("unterminated \\h")
+                i = end + 1
+                out.append(' ')
+            elif c == '"' or c == '#':
+                plain_start = i = length  # Comment
+                break
+            elif c in 'e\\E':
+                out.append('\\')
+            elif c == '-':
+                out.append('-')
+            elif c in '~ 0':
+                out.append('&nbsp;')
+            elif c == 'c':
+                pass  # Output continues on the next line; spacing is close enough
+            elif c == "'":
+                out.append('´')
+            elif c == '`':
+                out.append('`')
+            elif c == '.':
+                out.append('.')
+            elif c in SILENT_ESCAPES:
+                pass
+            elif c in UNSUPPORTED_ESCAPES:
+                raise UnsupportedRoff(f"escape \\{c}")
+            else:
+                out.append(html.escape(c, quote=False))
+            plain_start = i
+        out.append(html.escape(text[plain_start:], quote=False))
+        return ''.join(out)
+
+
+def split_args(text):
+    """Split a macro's arguments, honouring roff double quotes."""
+    args = []
+    i = 0
+    length = len(text)
+    while i < length:
+        while i < length and text[i] in ' \t':
+            i += 1
+        if i >= length:
+            break
+        if text[i] == '"':
+            i += 1
+            arg = []
+            while i < length:
+                if text[i] == '"':
+                    if i + 1 < length and text[i + 1] == '"':
+                        arg.append('"')
+                        i += 2
+                        continue
+                    i += 1
+                    break
+                if text[i] == '\\' and i + 1 < length:
+                    arg.append(text[i:i + 2])
+                    i += 2
+                    continue
+                arg.append(text[i])
+                i += 1
+            args.append(''.join(arg))
+        else:
+            start = i
+            while i < length and text[i] not in ' \t':
+                if text[i] == '\\' and i + 1 < length:
+                    i += 1
+                i += 1
+            args.append(text[start:i])
+    return args
+
+
+# --- Document builder shared by both macro packages ---
+
+class _Document:
+    def __init__(self):
+        self.inline = _Inline()
+        self.parts = []
+        self.title = ''
+        self.open_block = None  # 'p' or 'pre'
+        self.list_stack = []  # open <dl>/<ul>/<ol> tags, innermost last
+        self.indent_bases = []  # len(list_stack) when each open indent started
+        self.fill = True
+
+    def emit(self, markup):
+        self.parts.append(markup)
+
+    def close_font(self):
+        if self.inline.font:
+            self.emit(self.inline.close_tags(self.inline.font))
+
+    def reopen_font(self):
+        if self.inline.font:
+            self.emit(self.inline.open_tags(self.inline.font))
+
+    def close_block(self):
+        if self.open_block:
+            self.close_font()
+            self.emit(f'</{self.open_block}>\n')
+            self.open_block = None
+
+    def ensure_block(self):
+        wanted = 'p' if self.fill else 'pre'
+        if self.open_block != wanted:
+            self.close_block()
+            self.emit(f'<{wanted}>')
+            self.open_block = wanted
+            self.reopen_font()
+
+    def text(self, markup):
+        self.ensure_block()
+        self.emit(markup + ('\n' if not self.fill else ' '))
+
+    def close_lists(self, depth=None):
+        """Close lists opened since the innermost indent (or ``depth``)."""
+        if depth is None:
+            depth = self.indent_bases[-1] if self.indent_bases else 0
+        self.close_block()
+        while len(self.list_stack) > depth:
+            tag = self.list_stack.pop()
+            self.emit('</dd></dl>\n' if tag == 'dl' else f'</li></{tag}>\n')
+
+    def indent(self):
+        self.close_block()
+        self.emit('<div style="margin-left: 2em">\n')
+        self.indent_bases.append(len(self.list_stack))
+
+    def outdent(self):
+        self.close_lists()
+        if self.indent_bases:
+            self.indent_bases.pop()
+            self.emit('</div>\n')
+
+    def close_indents(self):
+        while self.indent_bases:
+            self.outdent()
+        self.close_lists(0)
+
+    def heading(self, level, markup):
+        self.close_indents()
+        self.fill = True
+        self.emit(f'<h{level}>{markup}</h{level}>\n')
+
+    def line_break(self):
+        if self.open_block:
+            self.emit('<br>\n')
+
+    def html(self):
+        self.close_indents()
+        title = html.escape(self.title)
+        return (
+            '<html>\n<head>\n<meta name="generator" content="pickles-man-viewer roff_renderer">\n'
+            f'<title>{title}</title>\n</head>\n<body>\n<h1 align="center">{title}</h1>\n'
+            + ''.join(self.parts) + '</body>\n</html>\n'
+        )
+
+
+# --- man(7) ---
+
+ALTERNATING = {
+    'BR': ('b', ''), 'RB': ('', 'b'), 'BI': ('b', 'i'), 'IB': ('i', 'b'),
+    'IR': ('i', ''), 'RI': ('', 'i'),
+}
+SINGLE_FONT = {'B': 'b', 'I': 'i', 'SB': 'b', 'SM': ''}
+# Requests and macros that only affect layout details we do not reproduce
+IGNORED_REQUESTS = {
+    'ad', 'na', 'hy', 'nh', 'ne', 'PD', 'in', 'll', 'ta', 'UC', 'IX', 'DT', 'ti', 'hw', 'cs',
+    'ss', 'ps', 'vs', 'fam', 'bp', 'pc', 'lf', 'ns', 'rs', 'AT', 'Sp', 'Vb', 'Ve', 'Bk', 'Ek',
+    'mso', 'pl', 'po', 'lt', 'hlm', 'hym', 'hys', 'cp', 'c2', 'cc', 'ec', 'eo', 'HB', 'HI',
+}
+
+
+class _ManRenderer:
+    def __init__(self):
+        self.doc = _Document()
+        self.pending_font = None  # .B/.I with no arguments apply to the next line
+        self.pending_tag = False  # The line after .TP is the tag
+        self.link_url = None
+
+    def convert(self, text):
+        return self.doc.inline.convert(text)
+
+    def styled(self, tag, markup):
+        return f'<{tag}>{markup}</{tag}>' if tag else markup
+
+    def text_line(self, line):
+        doc = self.doc
+        if not line.strip():
+            if doc.fill:
+                doc.close_block()
+            else:
+                doc.text('')
+            return
+        markup = self.convert(line)
+        if self.pending_font is not None:
+            markup = self.styled(self.pending_font, markup)
+            self.pending_font = None
+        self.emit_text(markup)
+
+    def emit_text(self, markup):
+        if self.pending_tag:
+            self.pending_tag = False
+            self.start_item(markup)
+        else:
+            self.doc.text(markup)
+
+    def start_item(self, tag_markup):
+        doc = self.doc
+        doc.close_block()
+        if doc.list_stack and doc.list_stack[-1] == 'dl':
+            if doc.parts[-1] == '<dd>':
+                doc.parts.pop()  # Another tag for the same item (.TQ, or .TP right after .TP)
+            else:
+                doc.emit('</dd>\n')
+        else:
+            doc.list_stack.append('dl')
+            doc.emit('<dl>\n')
+        if tag_markup:
+            doc.emit(f'<dt>{tag_markup}</dt>')
+        doc.emit('<dd>')
+
+    def request(self, name, args_text):
+        doc = self.doc
+        args = split_args(args_text)
+        if name == 'TH':
+            doc.title = ' '.join(args[:1]) + (f'({args[1]})' if len(args) > 1 else '')
+        elif name == 'SH' or name == 'SS':
+            level = 2 if name == 'SH' else 3
+            doc.heading(level, self.convert(' '.join(args)))
+        elif name in ('PP', 'LP', 'P', 'HP'):
+            doc.close_lists()
+        elif name in ('TP', 'TQ'):
+            self.pending_tag = True
+        elif name == 'IP':
+            self.start_item(self.convert(args[0]) if args else '')
+        elif name == 'RS':
+            doc.indent()
+        elif name == 'RE':
+            doc.outdent()
+        elif name in SINGLE_FONT:
+            if args:
+                self.emit_text(self.styled(SINGLE_FONT[name], self.convert(' '.join(args))))
+            else:
+                self.pending_font = SINGLE_FONT[name]
+        elif name in ALTERNATING:
+            fonts = ALTERNATING[name]
+            markup = ''.join(self.styled(fonts[i % 2], self.convert(arg)) for i, arg in enumerate(args))
+            self.emit_text(markup)
+        elif name in ('nf', 'EX'):
+            doc.close_block()
+            doc.fill = False
+        elif name in ('fi', 'EE'):
+            doc.close_block()
+            doc.fill = True
+        elif name == 'br':
+            doc.line_break()
+        elif name == 'sp':
+            if doc.fill:
+                doc.close_block()
+            else:
+                doc.text('')
+        elif name == 'ft':
+            font = args[0] if args else 'P'
+            if font not in FONTS:
+                raise UnsupportedRoff(f"font {font}")
+            doc.emit(doc.inline.switch_font(FONTS[font]))
+        elif name in ('UR', 'MT'):
+            self.link_url = (args[0] if args else '') if name == 'UR' else f"mailto:{args[0] if args else ''}"
+            doc.text(f'<a href="{html.escape(self.link_url)}">')
+        elif name in ('UE', 'ME'):
+            doc.emit('</a>' + self.convert(' '.join(args)) + ' ')
+            self.link_url = None
+        elif name == 'OP':
+            markup = '[' + self.styled('b', self.convert(args[0] if args else ''))
+            if len(args) > 1:
+                markup += ' ' + self.styled('i', self.convert(' '.join(args[1:])))
+            self.emit_text(markup + ']')
+        elif name == 'SY':
+            doc.close_lists()
+            doc.text(self.styled('b', self.convert(' '.join(args))))
+        elif name == 'YS':
+            doc.close_block()
+        elif name in IGNORED_REQUESTS:
+            pass
+        else:
+            raise UnsupportedRoff(f"request .{name}")
+
+
+# --- mdoc(7) ---
+
+# Inline macros that format their arguments with a fixed style
+MDOC_STYLES = {
+    'Ar': 'i', 'Cm': 'b', 'Sy': 'b', 'Ic': 'b', 'Em': 'i', 'Pa': 'i', 'Va': 'i', 'Fa': 'i',
+    'Ft': 'i', 'Ev': '', 'Er': '', 'Dv': '', 'Li': '', 'Ad': 'i', 'An': '', 'Sx': 'i',
+    'Tn': '', 'Ms': '', 'No': '', 'Vt': 'i', 'Mt': 'i', 'Lk': '', 'Fd': 'b', 'Ql': '',
+}
+MDOC_ENCLOSURES = {
+    'Op': ('[', ']'), 'Aq': ('⟨', '⟩'), 'Dq': ('“', '”'),
+    'Sq': ('‘', '’'), 'Pq': ('(', ')'), 'Bq': ('[', ']'), 'Brq': ('{', '}'),
+    'Qq': ('"', '"'),
+}
+MDOC_OPEN_CLOSE = {'Oo': '[', 'Oc': ']', 'Po': '(', 'Pc': ')', 'Do': '“', 'Dc': '”',
+                   'So': '‘', 'Sc': '’', 'Qo': '"', 'Qc': '"', 'Bo': '[', 'Bc': ']',
+                   'Ao': '⟨', 'Ac': '⟩', 'Bro': '{', 'Brc': '}'}
+MDOC_TEXT = {
+    'Ux': 'UNIX', 'Bx': 'BSD', 'Nx': 'NetBSD', 'Fx': 'FreeBSD', 'Ox': 'OpenBSD',
+    'Dx': 'DragonFly', 'Bsx': 'BSD/OS', 'At': 'AT&T UNIX',
+}
+MDOC_CALLABLE = (set(MDOC_STYLES) | set(MDOC_ENCLOSURES) | set(MDOC_OPEN_CLOSE) | set(MDOC_TEXT)
+                 | {'Fl', 'Xr', 'Nm', 'Ns', 'Pf', 'Fn', 'Ta', 'Ek', 'Bk', 'Eo', 'Ec'})
+MDOC_IGNORED = {'Bk', 'Ek', 'Os', 'Dd', 'Ud', 'Lb', 'Bf', 'Ef', 'Sm'}
+CLOSING_PUNCTUATION = set('.,:;)]?!')
+OPENING_PUNCTUATION = set('([')
+
+
+class _MdocRenderer:
+    def __init__(self):
+        self.doc = _Document()
+        self.name = ''
+        self.section = ''
+        self.bd_fill = []  # Fill mode to restore at each .Ed
+        self.item_open = False
+        self.in_synopsis = False
+
+    def convert(self, text):
+        return self.doc.inline.convert(text)
+
+    def styled(self, tag, markup):
+        return f'<{tag}>{markup}</{tag}>' if tag else markup
+
+    def phrase(self, tokens):
+        """Render the arguments of a parsed mdoc line to HTML."""
+        pieces = []  # (markup, space before)
+        no_space = False
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token not in MDOC_CALLABLE:
+                stripped = token.replace('\\&', '')
+                space = not no_space and not (len(stripped) == 1 and stripped in CLOSING_PUNCTUATION)
+                if pieces and pieces[-1][0] in OPENING_PUNCTUATION:
+                    space = False
+                pieces.append((self.convert(token), space))
+                no_space = False
+                i += 1
+                continue
+            i += 1
+            args = []
+            if token in MDOC_ENCLOSURES:
+                # Enclosures wrap the rest of the line except trailing punctuation
+                rest = tokens[i:]
+                trailing = []
+                while rest and rest[-1] in CLOSING_PUNCTUATION:
+                    trailing.insert(0, rest.pop())
+                opening, closing = MDOC_ENCLOSURES[token]
+                pieces.append((html.escape(opening) + self.phrase(rest) + html.escape(closing), not no_space))
+                no_space = False
+                tokens = trailing
+                i = 0
+                continue
+            while i < len(tokens) and tokens[i] not in MDOC_CALLABLE and tokens[i] not in CLOSING_PUNCTUATION:
+                args.append(tokens[i])
+                i += 1
+            if token == 'Ns':
+                no_space = True
+                continue
+            if token == 'Ta':
+                pieces.append(('&nbsp;&nbsp;', True))
+                continue
+            if token == 'Pf':
+                if args:
+                    pieces.append((self.convert(args[0]), not no_space))
+                    no_space = True
+                continue
+            markup = self.inline_macro(token, args)
+            if token in MDOC_OPEN_CLOSE and token.endswith('o'):
+                pieces.append((markup, not no_space))
+                no_space = True
+                continue
+            if token in MDOC_OPEN_CLOSE:
+                pieces.append((markup, False))
+            else:
+                pieces.append((markup, not no_space))
+            no_space = False
+        out = []
+        for index, (markup, space) in enumerate(pieces):
+            if index and space:
+                out.append(' ')
+            out.append(markup)
+        return ''.join(out)
+
+    def inline_macro(self, name, args):
+        if name == 'Fl':
+            flags = [self.convert('-' + arg) for arg in args] or ['-']
+            return self.styled('b', ' '.join(flags))
+        if name == 'Nm':
+            if args and not self.name:
+                self.name = args[0]
+            return self.styled('b', self.convert(' '.join(args) if args else self.name))
+        if name == 'Xr':
+            if not args:
+                raise UnsupportedRoff(".Xr without arguments")
+            section = f'({self.convert(args[1])})' if len(args) > 1 else ''
+            return self.styled('b', self.convert(args[0])) + section
+        if name == 'Fn':
+            if not args:
+                raise UnsupportedRoff(".Fn without arguments")
+            params = ', '.join(self.styled('i', self.convert(arg)) for arg in args[1:])
+            return f'{self.styled("b", self.convert(args[0]))}({params})'
+        if name == 'Ar' and not args:
+            return self.styled('i', 'file ...')
+        if name == 'Ql':
+            return '‘' + self.convert(' '.join(args)) + '’'
+        if name == 'Lk':
+            url = args[0] if args else ''
+            label = ' '.join(args[1:]) or url
+            return f'<a href="{html.escape(url)}">{self.convert(label)}</a>'
+        if name in MDOC_STYLES:
+            return self.styled(MDOC_STYLES[name], self.convert(' '.join(args)))
+        if name in MDOC_OPEN_CLOSE:
+            return html.escape(MDOC_OPEN_CLOSE[name]) + ' '.join(self.convert(arg) for arg in args)
+        if name in MDOC_TEXT:
+            return html.escape(MDOC_TEXT[name]) + (' ' + self.convert(' '.join(args)) if args else '')
+        if name in ('Bk', 'Ek'):
+            return ''
+        raise UnsupportedRoff(f"mdoc macro .{name}")
+
+    def text_line(self, line):
+        doc = self.doc
+        if not line.strip():
+            if doc.fill:
+                doc.close_block()
+            else:
+                doc.text('')
+            return
+        doc.text(self.convert(line))
+
+    def request(self, name, args_text):
+        doc = self.doc
+        tokens = split_args(args_text)
+        if name == 'Dt':
+            self.section = tokens[1] if len(tokens) > 1 else ''
+            doc.title = (tokens[0] if tokens else '') + (f'({self.section})' if self.section else '')
+        elif name in ('Sh', 'Ss'):
+            doc.heading(2 if name == 'Sh' else 3, self.convert(' '.join(tokens)))
+            self.in_synopsis = ' '.join(tokens).upper() == 'SYNOPSIS'
+        elif name in ('Pp', 'Lp'):
+            if doc.list_stack:
+                doc.close_block()
+            else:
+                doc.close_lists()
+        elif name == 'Nd':
+            doc.text('— ' + self.phrase(tokens))
+        elif name == 'Bl':
+            doc.close_block()
+            list_type = next((t for t in tokens if t in ('-tag', '-bullet', '-dash', '-hyphen', '-enum',
+                                                          '-item', '-hang', '-ohang', '-inset', '-diag')), None)
+            if list_type is None:
+                raise UnsupportedRoff(f".Bl {' '.join(tokens)}")
+            tag = {'-bullet': 'ul', '-dash': 'ul', '-hyphen': 'ul', '-enum': 'ol'}.get(list_type, 'dl')
+            doc.emit(f'<{tag}>\n')
+            doc.list_stack.append(tag)
+            self.item_open = False
+        elif name == 'It':
+            if not doc.list_stack:
+                raise UnsupportedRoff(".It outside a list")
+            doc.close_block()
+            tag = doc.list_stack[-1]
+            if self.item_open:
+                doc.emit('</dd>\n' if tag == 'dl' else '</li>\n')
+            self.item_open = True
+            if tag == 'dl':
+                term = self.phrase(tokens) if tokens else ''
+                doc.emit(f'<dt>{term}</dt><dd>' if term else '<dd>')
+            else:
+                doc.emit('<li>')
+        elif name == 'El':
+            if not doc.list_stack:
+                raise UnsupportedRoff(".El without .Bl")
+            doc.close_block()
+            tag = doc.list_stack.pop()
+            doc.emit('</dd></dl>\n' if tag == 'dl' else f'</li></{tag}>\n')
+            self.item_open = bool(doc.list_stack)
+        elif name == 'Bd':
+            doc.close_block()
+            self.bd_fill.append(doc.fill)
+            doc.fill = not ('-literal' in tokens or '-unfilled' in tokens)
+        elif name == 'Ed':
+            doc.close_block()
+            doc.fill = self.bd_fill.pop() if self.bd_fill else True
+        elif name in ('D1', 'Dl'):
+            doc.close_block()
+            markup = self.phrase(tokens)
+            element = 'pre' if name == 'Dl' else 'p'
+            doc.emit(f'<div style="margin-left: 2em"><{element}>{markup}</{element}></div>\n')
+        elif name == 'In':
+            doc.text(self.styled('b', f'#include &lt;{self.convert(" ".join(tokens))}&gt;'))
+            doc.line_break()
+        elif name == 'Ex':
+            doc.text(f"The {self.styled('b', self.convert(self.name))} utility exits 0 on success, "
+                     "and &gt;0 if an error occurs.")
+        elif name == 'Rv':
+            doc.text("The function returns the value 0 if successful; otherwise the value -1 is "
+                     "returned and the global variable <i>errno</i> is set to indicate the error.")
+        elif name == 'br':
+            doc.line_break()
+        elif name == 'sp':
+            doc.close_block()
+        elif name in MDOC_IGNORED:
+            pass
+        elif name in MDOC_CALLABLE:
+            if name in ('Nm', 'Ft', 'Fd', 'Vt') and self.in_synopsis:
+                doc.line_break()  # Each synopsis entry starts on its own line
+            doc.text(self.phrase([name] + tokens))
+        else:
+            raise UnsupportedRoff(f"mdoc macro .{name}")
+
+
+# --- tbl(1) tables ---
+
+_TBL_FONT = re.compile(r'f(\([A-Z0-9]{2}|\[[^]]*\]|[A-Z0-9])', re.IGNORECASE)
+_TBL_WIDTH = re.compile(r'[wW]\([^)]*\)')
+TBL_ALIGN = {'l': 'left', 'r': 'right', 'c': 'center', 'n': 'right', 'a': 'left'}
+
+
+def _table_format_row(text):
+    """Parse one tbl format row into a list of (key letter, font tag)."""
+    text = _TBL_WIDTH.sub('', text)
+    text = _TBL_FONT.sub(lambda m: {'B': 'b', 'I': 'i', 'BI': 'bi'}.get(
+        m.group(1).strip('([]').upper(), ''), text)
+    columns = []
+    for c in text:
+        lower = c.lower()
+        if lower in 'lrcnas^_-=':
+            columns.append([lower, ''])
+        elif lower in 'bi' and columns:
+            columns[-1][1] += lower
+        # Spacing, | rules, widths and other modifiers are not reproduced
+    return [tuple(column) for column in columns]
+
+
+def _table_cell(text, font):
+    inline = _Inline()
+    markup = inline.convert(text) + inline.close_tags(inline.font)
+    if text in ('_', '=', '\\^', '\\_'):
+        markup = ''
+    return f'<{font}>{markup}</{font}>' if font in ('b', 'i') else markup
+
+
+def _table_block(lines):
+    """Render a T{ ... T} text block with the man(7) renderer."""
+    renderer = _ManRenderer()
+    for line in lines:
+        _dispatch(renderer, line)
+    renderer.doc.close_indents()
+    return ''.join(renderer.doc.parts)
+
+
+def render_table(lines):
+    """Render the lines between .TS and .TE as an HTML table."""
+    tab = '\t'
+    options = ''
+    index = 0
+    if lines and lines[0].rstrip().endswith(';'):
+        options = lines[0].lower()
+        match = re.search(r'tab\s*\((.)\)', lines[0])
+        if match:
+            tab = match.group(1)
+        index = 1
+
+    def read_formats(index):
+        formats = []
+        while index < len(lines):
+            line = lines[index].rstrip()
+            index += 1
+            last = line.endswith('.')
+            for row in (line[:-1] if last else line).split(','):
+                formats.append(_table_format_row(row))
+            if last:
+                return formats, index
+        raise UnsupportedRoff("tbl format without a terminating '.'")
+
+    formats, index = read_formats(index)
+    row_number = 0
+    rows = []
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if line.startswith('.T&'):
+            formats, index = read_formats(index)
+            row_number = 0
+            continue
+        if line.startswith('.') or line.startswith("'"):
+            if _COMMENT.match(line) or line[1:].strip() in ('sp', 'br', 'ad', 'na', 'ft', 'ft R', 'ft P'):
+                continue
+            raise UnsupportedRoff(f"request in table data {line[:20]!r}")
+        if line.strip() in ('_', '=', ''):
+            continue  # Horizontal rules
+
+        # Collect the cells, reading T{ ... T} blocks that span lines
+        cells = []
+        rest = line
+        while True:
+            field, sep, rest = rest.partition(tab)
+            if field.endswith('T{'):
+                block = [field[:-2]] if field[:-2].strip() else []
+                while index < len(lines) and not lines[index].startswith('T}'):
+                    block.append(lines[index])
+                    index += 1
+                if index >= len(lines):
+                    raise UnsupportedRoff("unterminated T{ block")
+                field, sep, rest = lines[index][2:].partition(tab)
+                index += 1
+                cells.append((True, block))
+            else:
+                cells.append((False, field))
+            if not sep:
+                break
+
+        spec = formats[min(row_number, len(formats) - 1)]
+        row_number += 1
+        markup = []
+        cell_index = 0
+        for key, font in spec or [('l', '')]:
+            if key == 's' and markup:
+                markup[-1][1] += 1
+                continue
+            if key in '_-=':
+                cell_index += 1
+                markup.append([key, 1, '', ''])
+                continue
+            is_block, content = cells[cell_index] if cell_index < len(cells) else (False, '')
+            cell_index += 1
+            cell = _table_block(content) if is_block else _table_cell(content, font)
+            if is_block and font in ('b', 'i'):
+                cell = f'<{font}>{cell}</{font}>'
+            markup.append([key, 1, cell, TBL_ALIGN.get(key, 'left')])
+        rows.append(markup)
+
+    border = ' border="1" cellspacing="0"' if ('box' in options or 'frame' in options) else ''
+    out = [f'<table{border} cellpadding="3">\n']
+    for row in rows:
+        out.append('<tr>')
+        for key, span, cell, align in row:
+            attrs = f' colspan="{span}"' if span > 1 else ''
+            if align and align != 'left':
+                attrs += f' align="{align}"'
+            out.append(f'<td valign="top"{attrs}>{cell}</td>')
+        out.append('</tr>\n')
+    out.append('</table>\n')
+    return ''.join(out)
+
+
+# --- Entry points ---
+
+def _logical_lines(text):
+    """Split source into lines, joining those ending in an escaped newline."""
+    lines = []
+    pending = ''
+    for line in text.split('\n'):
+        if line.endswith('\\') and not line.endswith('\\\\'):
+            pending += line[:-1]
+            continue
+        lines.append(pending + line)
+        pending = ''
+    if pending:
+        lines.append(pending)
+    return lines
+
+
+_REQUEST = re.compile(r"^[.']\s*([^\s\\]+)\s*(.*)$")
+# Comments and empty requests, including indented ones like ".  \\" note"
+_COMMENT = re.compile(r"^[.']\s*(?:\\[\"#].*)?$")
+# Requests that need a real roff implementation
+UNSUPPORTED_REQUESTS = {'de', 'ds', 'nr', 'if', 'ie', 'el', 'TS', 'TE', 'EQ', 'PS', 'so', 'tr', 'ig',
+                        'am', 'rn', 'rm', 'di', 'da', 'wh', 'ch', 'it', 'als', 'while', 'do'}
+
+
+def render_roff_html(source):
+    """Render man(7) or mdoc(7) source text to HTML.
+
+    Raises UnsupportedRoff if the page needs features outside the subset.
+    """
+    lines = _logical_lines(source.replace('\r\n', '\n'))
+    is_mdoc = any(line.startswith('.Dd') or line.startswith('.Dt') for line in lines[:60])
+    renderer = _MdocRenderer() if is_mdoc else _ManRenderer()
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if line.startswith('.TS'):
+            end = index
+            while end < len(lines) and not lines[end].startswith('.TE'):
+                end += 1
+            if end >= len(lines):
+                raise UnsupportedRoff(".TS without .TE")
+            renderer.doc.close_block()
+            renderer.doc.emit(render_table(lines[index:end]))
+            index = end + 1
+            continue
+        _dispatch(renderer, line)
+    return renderer.doc.html()
+
+
+def _dispatch(renderer, line):
+    """Hand one logical source line to ``renderer``."""
+    if _COMMENT.match(line):
+        return
+    if line[:1] in ('.', "'"):
+        match = _REQUEST.match(line)
+        if not match:
+            raise UnsupportedRoff(f"unparsable request {line[:20]!r}")
+        name = match.group(1)
+        if name in UNSUPPORTED_REQUESTS:
+            raise UnsupportedRoff(f"request .{name}")
+        renderer.request(name, match.group(2))
+    else:
+        renderer.text_line(line)
+
+
+def _resolve_so(path, line):
+    # .so paths are relative to the root of the hierarchy
+    root = os.path.dirname(os.path.dirname(path))
+    target = os.path.join(root, line[4:].strip())
+    for suffix in [''] + list(DECOMPRESSORS):
+        if os.path.exists(target + suffix):
+            return target + suffix
+    raise UnsupportedRoff(f"unresolved {line}")
+
+
+def render_roff_file(path):
+    """Read a (possibly compressed) page source and render it to HTML."""
+    for _ in range(MAX_SO_DEPTH):
+        try:
+            with open_page_source(path) as f:
+                source = f.read()
+        except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+            raise UnsupportedRoff(f"cannot read {path}: {e}")
+        first_line = source.lstrip('\n').split('\n', 1)[0]
+        if not first_line.startswith('.so '):
+            return render_roff_html(source)
+        path = _resolve_so(path, first_line)
+    raise UnsupportedRoff("too many .so links")
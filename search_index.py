@@ -0,0 +1,189 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import re
+
+# Longest indexed substring; longer queries are checked against the
+# candidates of their rarest one
+MAX_GRAM = 3
+
+# Description words shorter than this only match whole words, so a short
+# query doesn't pull in the posting lists of hundreds of words
+MIN_PREFIX = 3
+
+# Sorts after every character that can appear in a name
+_PREFIX_END = '\U0010ffff'
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+class NameList:
+    """Case insensitive exact, prefix and substring lookup over page names, without an index.
+
+    Names are kept sorted by their lowercased form, so exact and prefix
+    matches are a bisected range; substring matches are a pass over every
+    name.  Cheap to build, and used until a NameSearchIndex is ready.
+    """
+
+    def __init__(self, names):
+        # Usually given already sorted and unique, which makes this sort linear
+        self.names = sorted(dict.fromkeys(names), key=lambda name: (name.lower(), name))
+        self.keys = [name.lower() for name in self.names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_range(self, prefix):
+        """Return the (start, end) positions of names starting with ``prefix``."""
+        start = bisect_left(self.keys, prefix)
+        return start, bisect_left(self.keys, prefix + _PREFIX_END, start)
+
+    def search(self, query):
+        """Return (exact, starts with, contains) lists of names matching ``query``.
+
+        The lists don't overlap: a name is only in the first one it matches.
+        """
+        names = self.names
+        return tuple(list(map(names.__getitem__, positions)) for positions in self.search_positions(query))
+
+    def search_positions(self, query):
+        """Like ``search`` but return positions in ``names`` instead of names.
+
+        Exact and starts with matches are ranges.  The returned sequences
+        must not be modified.
+        """
+        query = query.lower()
+        if not query:
+            return range(0), range(0), range(0)
+        start, end = self.prefix_range(query)
+        exact_end = bisect_right(self.keys, query, start, end)
+        return range(start, exact_end), range(exact_end, end), self._contains(query, start, end)
+
+    def _contains(self, query, start, end):
+        """Positions outside ``start:end`` of the names containing ``query``."""
+        keys = self.keys
+        contains = [i for i in range(start) if query in keys[i]]
+        contains += [i for i in range(end, len(keys)) if query in keys[i]]
+        return contains
+
+
+class NameSearchIndex(NameList):
+    """NameList with substring matches looked up in posting lists.
+
+    Every substring of up to MAX_GRAM characters of a name has a posting
+    list, so a query that short is answered by its own list, and a longer
+    one only checks the names in the shortest list of its trigrams.
+    Postings hold positions in the sorted names, so every result list comes
+    out already sorted.
+    """
+
+    def __init__(self, names):
+        super().__init__(names)
+        postings = {}
+        for position, key in enumerate(self.keys):
+            for gram in {key[start:start + length] for length in range(1, MAX_GRAM + 1)
+                         for start in range(len(key) - length + 1)}:
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = [position]
+                else:
+                    posting.append(position)
+        # Arrays take a quarter of the memory of lists of ints
+        self._postings = {gram: array('I', posting) for gram, posting in postings.items()}
+
+    def _contains(self, query, start, end):
+        length = min(len(query), MAX_GRAM)
+        smallest = None
+        for i in range(len(query) - length + 1):
+            posting = self._postings.get(query[i:i + length])
+            if posting is None:
+                return range(0)
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        # Postings are sorted, so the prefix matches are one slice of them
+        low = bisect_left(smallest, start)
+        high = bisect_left(smallest, end, low)
+        if len(query) == length:
+            return smallest[:low] + smallest[high:]
+        keys = self.keys
+        return [i for i in smallest[:low] + smallest[high:] if query in keys[i]]
+
+
+class DescriptionIndex:
+    """Keyword lookup over the whatis descriptions of a ManPageIndex.
+
+    Every lowercased word of a description gets a posting list of the
+    entries using it, and the words are kept sorted so a query word is
+    looked up as a prefix: "compr" finds compress, compressed and
+    compression.  An entry matches when its description has every word of
+    the query.  Whole word matches rank above prefix ones, then shorter
+    descriptions come first.  Only the posting lists are stored here; names
+    and descriptions are read from the index, whose entry ids never change.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._count = len(index)
+        postings = {}
+        for entry_id in range(self._count):
+            for word in set(_WORD.findall(index.description_at(entry_id).lower())):
+                posting = postings.get(word)
+                if posting is None:
+                    postings[word] = [entry_id]
+                else:
+                    posting.append(entry_id)
+        self.words = sorted(postings)
+        self._postings = [array('I', postings[word]) for word in self.words]
+
+    def __len__(self):
+        return self._count
+
+    def _lookup(self, word):
+        """Return {entry id: 2 for a whole word match, 1 for a prefix match}."""
+        words = self.words
+        start = bisect_left(words, word)
+        if len(word) >= MIN_PREFIX:
+            end = bisect_left(words, word + _PREFIX_END, start)
+        else:
+            end = start + (start < len(words) and words[start] == word)
+        hits = {}
+        for i in range(start, end):
+            if words[i] == word:
+                hits.update(dict.fromkeys(self._postings[i], 2))
+            else:
+                for entry_id in self._postings[i]:
+                    hits.setdefault(entry_id, 1)
+        return hits
+
+    def search(self, query, limit=None, exclude=()):
+        """Return (name, section, description) of the entries matching ``query``, best first.
+
+        Entries whose name is in ``exclude`` are skipped.
+        """
+        scores = None
+        for word in dict.fromkeys(_WORD.findall(query.lower())):
+            hits = self._lookup(word)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {entry_id: score + hits[entry_id]
+                          for entry_id, score in scores.items() if entry_id in hits}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        index = self.index
+        names = index.names
+        if exclude:
+            scores = {entry_id: score for entry_id, score in scores.items()
+                      if names[entry_id] not in exclude}
+
+        def rank(entry_id):
+            return (-scores[entry_id], index.descriptions.lengths[entry_id],
+                    names[entry_id].lower(), index.section(entry_id))
+
+        if limit is None:
+            best = sorted(scores, key=rank)
+        else:
+            best = heapq.nsmallest(limit, scores, key=rank)
+        return [(names[i], index.section(i), index.description_at(i)) for i in best]
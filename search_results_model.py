@@ -0,0 +1,268 @@
+from bisect import bisect_right
+from itertools import compress
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+
+# Rows added each time the view asks for more
+FETCH_BATCH_SIZE = 500
+
+# Page name of a result row; None for group headers
+PAGE_NAME_ROLE = Qt.ItemDataRole.UserRole
+# Section of a result row's page; empty for man's first match
+SECTION_ROLE = Qt.ItemDataRole.UserRole + 3
+# Grey text drawn after a result's name, e.g. its description
+DETAIL_ROLE = Qt.ItemDataRole.UserRole + 1
+# True for group header rows
+HEADER_ROLE = Qt.ItemDataRole.UserRole + 2
+
+
+class _NameSections:
+    """The rows of a name group, where a name found in several sections has a row per section.
+
+    Only the positions of those names are kept, with the row each one starts
+    at; the rows between them map straight back to positions.
+    """
+
+    def __init__(self, names, positions, index):
+        self.names = names
+        self.positions = positions
+        self.index = index
+        self.shared = index.shared_names()
+        # Indexes into positions of the names listed more than once
+        self.items = list(compress(range(len(positions)),
+                                   map(self.shared.__contains__, map(names.__getitem__, positions))))
+        self.starts = []
+        extra = 0
+        for item in self.items:
+            self.starts.append(item + extra)
+            extra += self.shared[names[positions[item]]] - 1
+        self.extra = extra
+
+    def page(self, offset):
+        """Return (page name, section, text) of the result ``offset`` rows into the group."""
+        shared = bisect_right(self.starts, offset) - 1
+        if shared >= 0:
+            item, start = self.items[shared], self.starts[shared]
+            name = self.names[self.positions[item]]
+            if offset - start < self.shared[name]:
+                section = self.index.sections(name)[offset - start]
+                return name, section, f"{name}({section})"
+            # Past the rows of that name, and of every one before it
+            offset -= start - item + self.shared[name] - 1
+        name = self.names[self.positions[offset]]
+        entry_id = self.index.find(name)
+        return name, '' if entry_id is None else self.index.section(entry_id), name
+
+
+class SearchResultsModel(QAbstractListModel):
+    """Search results as a flat list of groups, each a header row and its results.
+
+    Groups keep their results as handed in: a name group holds a sequence of
+    positions (a range, array or list) into a names list, an entry group a
+    short list of (page name, section, text, detail, tooltip) tuples.  Given
+    the index, a name group lists a name found in several sections once per
+    section, as e.g. printf(3); without it, its pages have no section and
+    open man's first match.  Nothing is
+    created per row; ``data`` looks a row up when the view paints it.  Rows
+    are exposed FETCH_BATCH_SIZE at a time through canFetchMore/fetchMore,
+    so the view only lays out what it has been scrolled through and a query
+    matching every page costs about as much as one matching ten.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._groups = []  # (title, results, names, sections); names is None for entry groups
+        self._starts = []  # row of each group's header
+        self._row_count = 0
+        self._fetched = 0  # rows the view has been given
+
+    # --- Contents ---
+
+    def clear(self):
+        self.beginResetModel()
+        self._groups = []
+        self._starts = []
+        self._row_count = 0
+        self._fetched = 0
+        self.endResetModel()
+
+    def add_names(self, title, names, positions=None, index=None):
+        """Append a group listing ``names[i]`` for each i in ``positions`` (default: all).
+
+        With ``index``, the pages get their sections from it.
+        """
+        if positions is None:
+            positions = range(len(names))
+        sections = _NameSections(names, positions, index) if index is not None and len(positions) else None
+        self._add_group(title, positions, names, sections)
+
+    def add_entries(self, title, entries):
+        """Append a group of (page name, section, text, detail, tooltip) entries."""
+        self._add_group(title, entries, None, None)
+
+    def _add_group(self, title, results, names, sections):
+        if not len(results):
+            return
+        shown_all = self._fetched == self._row_count
+        self._groups.append((title, results, names, sections))
+        self._starts.append(self._row_count)
+        self._row_count += len(results) + (sections.extra if sections is not None else 0) + 1
+        # A group after rows still waiting to be fetched is fetched with them
+        if shown_all:
+            self.fetchMore(QModelIndex())
+
+    def _locate(self, row):
+        """Return (group, offset) of ``row``; offset 0 is the group's header."""
+        group = bisect_right(self._starts, row) - 1
+        return self._groups[group], row - self._starts[group]
+
+    def page(self, row):
+        """Return the (page name, section) at ``row``, or None for a header."""
+        (_, results, names, sections), offset = self._locate(row)
+        if offset == 0:
+            return None
+        return self._result(results, names, sections, offset - 1)[:2]
+
+    def _result(self, results, names, sections, offset):
+        """Return (page name, section, text) of a group's result ``offset``."""
+        if names is None:
+            return results[offset][:3]
+        if sections is None:
+            name = names[results[offset]]
+            return name, '', name
+        return sections.page(offset)
+
+    def pages(self, row, count):
+        """Return up to ``count`` (page name, section) pairs from ``row`` on, skipping headers."""
+        found = []
+        while row < self._row_count and len(found) < count:
+            page = self.page(row)
+            if page is not None:
+                found.append(page)
+            row += 1
+        return found
+
+    # --- QAbstractListModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._fetched
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._fetched < self._row_count
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        first = self._fetched
+        last = min(first + FETCH_BATCH_SIZE, self._row_count) - 1
+        self.beginInsertRows(QModelIndex(), first, last)
+        self._fetched = last + 1
+        self.endInsertRows()
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if self._locate(index.row())[1] == 0:
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        (title, results, names, sections), offset = self._locate(index.row())
+        if offset == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return title
+            return True if role == HEADER_ROLE else None
+        if names is not None:
+            if role not in (Qt.ItemDataRole.DisplayRole, PAGE_NAME_ROLE, SECTION_ROLE):
+                return None
+            page_name, section, text = self._result(results, names, sections, offset - 1)
+            if role == Qt.ItemDataRole.DisplayRole:
+                return text
+            return page_name if role == PAGE_NAME_ROLE else section
+        page_name, section, text, detail, tooltip = results[offset - 1]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text
+        if role == PAGE_NAME_ROLE:
+            return page_name
+        if role == SECTION_ROLE:
+            return section
+        if role == DETAIL_ROLE:
+            return detail
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return tooltip
+        return None
+
+
+class NameListModel(QAbstractListModel):
+    """A read-only list model over a list of names, without copying them.
+
+    Used for the search completer in place of a QStringListModel, which
+    would hold a second copy of every page name.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+
+    def set_names(self, names):
+        self.beginResetModel()
+        self._names = names
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self._names[index.row()]
+        return None
+
+
+class SearchResultsDelegate(QStyledItemDelegate):
+    """Draws group headers in bold blue, and a result's detail in grey after its text.
+
+    Every row stays one line high, so the view can use uniform item sizes
+    and never measures rows it doesn't show.
+    """
+
+    def paint(self, painter, option, index):
+        header = index.data(HEADER_ROLE)
+        detail = index.data(DETAIL_ROLE)
+        if not header and not detail:
+            super().paint(painter, option, index)
+            return
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        widget = option.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        if header:
+            option.font.setBold(True)
+            option.palette.setColor(QPalette.ColorRole.Text, QColor(Qt.GlobalColor.darkBlue))
+            style.drawControl(QStyle.ControlElement.CE_ItemViewItem, option, painter, widget)
+            return
+
+        # Background and selection only; the two pieces of text are drawn below
+        rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemText, option, widget)
+        # The same inset the style gives item text
+        margin = style.pixelMetric(QStyle.PixelMetric.PM_FocusFrameHMargin, None, widget) + 1
+        rect.adjust(margin, 0, -margin, 0)
+        text = option.text
+        option.text = ''
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, option, painter, widget)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        alignment = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+        metrics = option.fontMetrics
+        painter.save()
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(
+            QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text))
+        painter.drawText(rect, alignment, text)
+        rect.setLeft(rect.left() + metrics.horizontalAdvance(text + '  '))
+        if not selected:
+            painter.setPen(option.palette.color(QPalette.ColorRole.PlaceholderText))
+        painter.drawText(rect, alignment, metrics.elidedText(detail, Qt.TextElideMode.ElideRight, rect.width()))
+        painter.restore()
@@ -1,15 +1,71 @@
-import subprocess
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QListWidget,
-    QListWidgetItem, QLabel, QPushButton, QCompleter
+    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QListView,
+    QLabel, QPushButton, QCompleter
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QStringListModel
+from itertools import chain
+import html
+import re
+
+from PyQt6.QtCore import Qt, pyqtSignal, QThread, QTimer
+
+import instrumentation
+from fulltext_index import snippet_html
+from fuzzy_match import FuzzyMatcher
+from search_index import DescriptionIndex, NameList, NameSearchIndex
+from search_results_model import PAGE_NAME_ROLE, SECTION_ROLE, NameListModel, SearchResultsDelegate, SearchResultsModel
+
+# Typing pause before the top results are prefetched, and how many of them
+PREFETCH_DELAY_MS = 300
+PREFETCH_COUNT = 3
+
+# Typing pause before the page text is searched, and how many pages are listed
+FULLTEXT_DELAY_MS = 300
+FULLTEXT_RESULTS = 15
+FULLTEXT_MIN_QUERY = 3
+
+# Pages whose whatis description has the query's words
+DESCRIPTION_RESULTS = 30
+DESCRIPTION_MIN_QUERY = 2
+
+# Names matching the query as a subsequence, listed after the substring matches
+FUZZY_RESULTS = 20
+FUZZY_MIN_QUERY = 2
+
+_TAGS = re.compile(r'<[^>]*>')
+
+
+class _SearchIndexBuilder(QThread):
+    """Builds the search indexes off the GUI thread.
+
+    The name index and fuzzy matcher are built for ``names``; the
+    description index only if ``index`` is given, which it is once the
+    index has finished loading and its descriptions no longer change.
+    """
+
+    def __init__(self, names, index=None, parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.index = index
+        self.search_index = None
+        self.fuzzy_matcher = None
+        self.description_index = None
+
+    def run(self):
+        with instrumentation.span("search index build", names=len(self.names)):
+            self.search_index = NameSearchIndex(self.names)
+            self.fuzzy_matcher = FuzzyMatcher(self.search_index.names)
+            if self.index is not None:
+                self.description_index = DescriptionIndex(self.index)
+
 
 class SearchWidget(QWidget):
-    man_page_selected = pyqtSignal(str)
+    man_page_selected = pyqtSignal(str, str)  # page name, section ('' for man's first match)
+    prefetch_requested = pyqtSignal(list)  # (name, section) pages likely to be opened next
 
-    def __init__(self, parent=None):
+    def __init__(self, index, fulltext_index=None, parent=None):
         super().__init__(parent)
+        self.index = index
+        self.fulltext_index = fulltext_index
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(20, 20, 20, 20)
         self.layout.setSpacing(10)
@@ -36,108 +92,202 @@ class SearchWidget(QWidget):
 
         self.layout.addLayout(search_input_layout)
 
-        # Suggestions/Results List
-        self.results_list_widget = QListWidget()
-        self.results_list_widget.itemClicked.connect(self._on_item_clicked)
-        self.layout.addWidget(self.results_list_widget)
+        self.loading_label = QLabel("Loading man pages...")
+        self.loading_label.setStyleSheet("QLabel { color: gray; }")
+        self.layout.addWidget(self.loading_label)
+
+        self.fulltext_status_label = QLabel()
+        self.fulltext_status_label.setStyleSheet("QLabel { color: gray; }")
+        self.fulltext_status_label.hide()
+        self.layout.addWidget(self.fulltext_status_label)
+
+        # Suggestions/Results List; rows are only looked up as they are painted
+        self.results_model = SearchResultsModel(self)
+        self.results_view = QListView()
+        self.results_view.setUniformItemSizes(True)
+        self.results_view.setItemDelegate(SearchResultsDelegate(self.results_view))
+        self.results_view.setModel(self.results_model)
+        self.results_view.clicked.connect(self._on_item_clicked)
+        self.results_view.selectionModel().currentChanged.connect(self._on_current_item_changed)
+        self.layout.addWidget(self.results_view)
+
+        # Prefetch the top hits once typing pauses, not on every keystroke
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self._prefetch_top_results)
+
+        # Page text is searched once typing pauses; its group is appended last
+        self._fulltext_timer = QTimer(self)
+        self._fulltext_timer.setSingleShot(True)
+        self._fulltext_timer.setInterval(FULLTEXT_DELAY_MS)
+        self._fulltext_timer.timeout.connect(self._add_fulltext_results)
 
         # QCompleter for real-time suggestions in the QLineEdit
-        self.completer_model = QStringListModel()
+        # The index's names are sorted case insensitively, so the completer can bisect them
+        self.completer_model = NameListModel(self)
         self.completer = QCompleter(self.completer_model, self)
         self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.completer.setModelSorting(QCompleter.ModelSorting.CaseInsensitivelySortedModel)
         self.search_line_edit.setCompleter(self.completer)
 
-        # Store a list of (man_page_name, full_apropos_line) tuples
-        self._all_man_pages_data = []
+        # Built by a background thread from the index's distinct names on the
+        # first query after they change; until then names are matched through
+        # a NameList.
+        self._search_index = None
+        self._name_list = None
+        self._index_builder = None
+        self._fuzzy_matcher = None
+        self._description_index = None
+        self._indexed_names = None
         self._load_all_man_pages_for_search()
 
+    def on_index_updated(self):
+        """Refresh the searchable names and re-run the current query."""
+        self._load_all_man_pages_for_search()
+        self._update_suggestions(self.search_line_edit.text())
+
+    def on_fulltext_index_updated(self):
+        """Re-run the page text search for the current query."""
+        self.fulltext_status_label.hide()
+        if self.search_line_edit.text():
+            self._update_suggestions(self.search_line_edit.text())
+
+    def on_fulltext_progress(self, done, total):
+        self.fulltext_status_label.setText(f"Indexing page text... ({done} of {total} pages)")
+        self.fulltext_status_label.setVisible(done < total)
+
     def _load_all_man_pages_for_search(self):
-        try:
-            result = subprocess.run(['apropos', '.'], capture_output=True, text=True, check=True)
-            lines = result.stdout.splitlines()
-            names_for_completer = []
-            for line in lines:
-                if '(' in line and ')' in line:
-                    name_section = line.split('(')[0].strip()
-                    name = name_section.split(',')[0].strip()
-                    if name:
-                        # Store unique names and their full apropos line
-                        if name not in [item[0] for item in self._all_man_pages_data]:
-                            self._all_man_pages_data.append((name, line))
-                            names_for_completer.append(name)
-
-            self._all_man_pages_data.sort(key=lambda x: x[0].lower()) # Sort by name
-            names_for_completer.sort()
-            self.completer_model.setStringList(names_for_completer)
-
-        except subprocess.CalledProcessError as e:
-            print(f"Error loading all man pages for search: {e.stderr}")
-        except FileNotFoundError:
-            print("Error: 'apropos' command not found for search.")
+        self.loading_label.setVisible(not self.index.loaded)
+        if self.index.error:
+            print(f"Error loading all man pages for search: {self.index.error}")
+            return
+        names = self.index.unique_names()
+        if names is not self._indexed_names:
+            self._indexed_names = names
+            self._search_index = None
+            self._name_list = None
+            self._fuzzy_matcher = None
+            self._description_index = None
+            self.completer_model.set_names(names)
+
+    def _get_search_index(self):
+        """Return the name index, or a NameList giving the same results while it is built."""
+        self._build_indexes()
+        if self._search_index is not None:
+            return self._search_index
+        if self._name_list is None:
+            self._name_list = NameList(self._indexed_names or [])
+        return self._name_list
+
+    def _build_indexes(self):
+        """Start building whichever search indexes are missing, unless a build is running."""
+        if self._index_builder is not None or self._indexed_names is None:
+            return
+        describe = self._description_index is None and self.index.loaded
+        if self._search_index is not None and not describe:
+            return
+        self._index_builder = _SearchIndexBuilder(self._indexed_names, self.index if describe else None, self)
+        self._index_builder.finished.connect(self._on_indexes_built)
+        self._index_builder.start()
+
+    def _on_indexes_built(self):
+        builder = self._index_builder
+        self._index_builder = None
+        builder.deleteLater()
+        # Names that changed meanwhile get new indexes on the next query
+        if builder.names is not self._indexed_names or builder.search_index is None:
+            return
+        self._search_index = builder.search_index
+        self._fuzzy_matcher = builder.fuzzy_matcher
+        self._name_list = None
+        if builder.description_index is not None:
+            self._description_index = builder.description_index
+        # Adds the description and fuzzy matches the query was shown without
+        query = self.search_line_edit.text()
+        if len(query) >= min(DESCRIPTION_MIN_QUERY, FUZZY_MIN_QUERY):
+            self._update_suggestions(query)
+
+    def shutdown(self):
+        """Wait for an index build still running."""
+        if self._index_builder is not None:
+            self._index_builder.wait()
 
     def _update_suggestions(self, query):
-        self.results_list_widget.clear()
+        with instrumentation.span("search suggestions", query=query):
+            self._fill_suggestions(query)
+
+    def _fill_suggestions(self, query):
+        self.results_model.clear()
+        self._prefetch_timer.stop()
+        self._fulltext_timer.stop()
         if not query:
             # Optionally display a default list or nothing when query is empty
             return
+        self._prefetch_timer.start()
+        if self.fulltext_index is not None and len(query) >= FULLTEXT_MIN_QUERY:
+            self._fulltext_timer.start()
+
+        # Each name lands in exactly one group, already sorted
+        search_index = self._get_search_index()
+        names = search_index.names
+        exact_matches, starts_with_matches, contains_matches = search_index.search_positions(query)
+
+        # Add to the results with delineation
+        self.results_model.add_names("Exact Matches", names, exact_matches, self.index)
+        self.results_model.add_names("Starts With", names, starts_with_matches, self.index)
+        self.results_model.add_names("Contains (Partial/Keyword)", names, contains_matches, self.index)
+
+        if len(query) < min(DESCRIPTION_MIN_QUERY, FUZZY_MIN_QUERY):
+            return
+        # Later groups only list pages that aren't shown yet
+        listed = set(map(names.__getitem__, chain(exact_matches, starts_with_matches, contains_matches)))
 
-        query_lower = query.lower()
-
-        exact_matches = []
-        starts_with_matches = []
-        contains_matches = [] # This will include partial and keyword matches
-
-        # First pass: categorize all matches
-        for name, full_apropos_line in self._all_man_pages_data:
-            name_lower = name.lower()
-            if name_lower == query_lower:
-                exact_matches.append(name)
-            elif name_lower.startswith(query_lower):
-                starts_with_matches.append(name)
-            elif query_lower in name_lower: # Check if query is anywhere in the name
-                contains_matches.append(name)
-
-        # Sort each category
-        exact_matches.sort()
-        starts_with_matches.sort()
-        contains_matches.sort()
-
-        # Add to list widget with delineation
-        if exact_matches:
-            self._add_section_header("Exact Matches")
-            for name in exact_matches:
-                self.results_list_widget.addItem(name)
-
-        if starts_with_matches:
-            # Filter out any exact matches that might have also been in starts_with
-            starts_with_matches = [name for name in starts_with_matches if name not in exact_matches]
-            if starts_with_matches: # Check again after filtering
-                self._add_section_header("Starts With")
-                for name in starts_with_matches:
-                    self.results_list_widget.addItem(name)
-
-        if contains_matches:
-            # Filter out any matches already covered by exact or starts_with
-            contains_matches = [name for name in contains_matches if name not in exact_matches and name not in starts_with_matches]
-            if contains_matches: # Check again after filtering
-                self._add_section_header("Contains (Partial/Keyword)")
-                for name in contains_matches:
-                    self.results_list_widget.addItem(name)
+        # The description index and fuzzy matcher are left out until built
+        if len(query) >= DESCRIPTION_MIN_QUERY and self._description_index is not None:
+            description_matches = self._description_index.search(
+                query, DESCRIPTION_RESULTS, exclude=listed)
+            self.results_model.add_entries("Description Matches", [
+                (name, section, f"{name}({section})", description, None)
+                for name, section, description in description_matches
+            ])
+            listed.update(name for name, _, _ in description_matches)
+
+        if len(query) >= FUZZY_MIN_QUERY and self._fuzzy_matcher is not None:
+            fuzzy_matches = self._fuzzy_matcher.top(query, FUZZY_RESULTS, exclude=listed)
+            self.results_model.add_names("Fuzzy Matches", [name for _, name in fuzzy_matches], index=self.index)
+
+    def _add_fulltext_results(self):
+        with instrumentation.span("search full text"):
+            self._fill_fulltext_results()
+
+    def _fill_fulltext_results(self):
+        query = self.search_line_edit.text()
+        entries = []
+        for _, name, section, path in self.fulltext_index.search(query, FULLTEXT_RESULTS):
+            snippet = snippet_html(path, query)
+            entries.append((name, section, f"{name}({section})", html.unescape(_TAGS.sub('', snippet)),
+                            f"<b>{html.escape(name)}({html.escape(section)})</b><br>{snippet}"))
+        self.results_model.add_entries("Full Text Matches", entries)
 
     def _perform_search(self):
         # For now, this just triggers the same filtering as typing
         self._update_suggestions(self.search_line_edit.text())
 
-    def _on_item_clicked(self, item):
-        # Ensure we don't emit a signal for section headers
-        if item.flags() & Qt.ItemFlag.ItemIsSelectable:
-            self.man_page_selected.emit(item.text())
+    def _on_item_clicked(self, index):
+        # Section headers have no page name
+        name = index.data(PAGE_NAME_ROLE)
+        if name:
+            self.man_page_selected.emit(name, index.data(SECTION_ROLE))
 
-    def _add_section_header(self, text):
-        header_item = QListWidgetItem(text)
-        header_item.setFlags(header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable) # Make header non-selectable
-        header_item.setForeground(Qt.GlobalColor.darkBlue) # Optional: style header
-        font = header_item.font()
-        font.setBold(True)
-        header_item.setFont(font)
-        self.results_list_widget.addItem(header_item)
+    def _prefetch_top_results(self):
+        pages = self.results_model.pages(0, PREFETCH_COUNT)
+        if pages:
+            self.prefetch_requested.emit(pages)
+
+    def _on_current_item_changed(self, current, previous):
+        # Moving through the results: prefetch this page and the ones after it
+        if current.isValid():
+            pages = self.results_model.pages(current.row(), PREFETCH_COUNT)
+            if pages:
+                self.prefetch_requested.emit(pages)
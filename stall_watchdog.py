@@ -0,0 +1,123 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+
+import instrumentation
+
+# Default stall threshold for --watchdog, in milliseconds
+STALL_THRESHOLD_MS = 100
+
+# Frames of the blocking stack printed with a stall, innermost last
+REPORT_FRAMES = 12
+
+# A stall still going on after this long is reported before it ends, so a hang shows up
+HANG_REPORT_MS = 5000
+
+
+class StallWatchdog(QObject):
+    """Report when the GUI thread stops processing events, and where it is stuck.
+
+    A timer on the GUI thread updates a heartbeat timestamp several times per
+    threshold.  A background thread checks the heartbeat; once it is later
+    than ``threshold_ms`` the event loop isn't running, and the thread
+    samples the main thread's Python stack until the heartbeat comes back.
+    The stall is then printed with its duration and the stack seen most
+    often while it lasted, innermost frame last.  If tracing is enabled it
+    is also recorded as a "stall" span.
+
+    Sampling only reads ``sys._current_frames()``, so the GUI thread pays
+    for nothing but the heartbeat.
+    """
+
+    def __init__(self, threshold_ms=STALL_THRESHOLD_MS, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.stalls = 0
+        self._main_ident = threading.main_thread().ident
+        self._beat = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, threshold_ms // 4))
+        self._timer.timeout.connect(self._heartbeat)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._beat = time.perf_counter()
+        self._timer.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="stall watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat(self):
+        self._beat = time.perf_counter()
+
+    # --- Watchdog thread ---
+
+    def _late(self, now):
+        # The heartbeat is due every interval, so only lateness beyond that counts
+        return now - self._beat - self._timer.interval() / 1000
+
+    def _watch(self):
+        poll = self.threshold / 4
+        while not self._stop.wait(poll):
+            if self._late(time.perf_counter()) >= self.threshold:
+                self._follow_stall()
+
+    def _follow_stall(self):
+        """Sample the main thread until its heartbeat resumes, then report."""
+        beat = self._beat
+        started = beat + self._timer.interval() / 1000
+        samples = collections.Counter()
+        sample_interval = max(0.002, self.threshold / 20)
+        hang_reported = False
+        while self._beat == beat and not self._stop.is_set():
+            stack = self._sample()
+            if stack:
+                samples[stack] += 1
+            elapsed = time.perf_counter() - started
+            if not hang_reported and elapsed * 1000 >= HANG_REPORT_MS:
+                hang_reported = True
+                self._report(elapsed, samples, ongoing=True)
+            time.sleep(sample_interval)
+        ended = time.perf_counter()
+        self.stalls += 1
+        instrumentation.add_span("stall", started, ended, samples=sum(samples.values()))
+        instrumentation.count("watchdog.stalls")
+        self._report(ended - started, samples)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self._main_ident)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _report(self, duration, samples, ongoing=False):
+        state = "blocked for" if ongoing else "stalled for"
+        ending = ", still blocked" if ongoing else ""
+        if not samples:
+            print(f"Watchdog: GUI thread {state} {duration * 1000:.0f}ms{ending} (no stack sampled)")
+            return
+        stack, hits = samples.most_common(1)[0]
+        filename, line, function = stack[-1]
+        total = sum(samples.values())
+        print(f"Watchdog: GUI thread {state} {duration * 1000:.0f}ms{ending} in {function} "
+              f"({os.path.basename(filename)}:{line}), seen in {hits} of {total} samples")
+        for filename, line, function in stack[-REPORT_FRAMES:]:
+            print(f"    {filename}:{line} in {function}")
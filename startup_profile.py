@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+
+from PyQt6.QtCore import QEvent, QObject
+
+
+class StartupProfile(QObject):
+    """Per-phase timings of application startup, for ``--profile-startup``.
+
+    Phases are recorded relative to ``origin`` (a ``time.perf_counter()``
+    value, normally taken before the first import) either as a ``phase()``
+    block or with ``begin()``/``end()`` for ones that finish later, such as
+    the background index load.  The first paint is caught by an event filter
+    on the main window.  If ``enabled``, the table is printed once every
+    phase begun has ended and the window has painted.
+    """
+
+    def __init__(self, origin=None, enabled=False, parent=None):
+        super().__init__(parent)
+        self.origin = time.perf_counter() if origin is None else origin
+        self.enabled = enabled
+        self._phases = []  # [name, start, end or None] in start order
+        self._painted = False
+        self._reported = False
+
+    def _now(self):
+        return time.perf_counter() - self.origin
+
+    def record(self, name, start, end):
+        """Record a phase measured elsewhere, in perf_counter() seconds."""
+        self._phases.append([name, start - self.origin, end - self.origin])
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def begin(self, name):
+        self._phases.append([name, self._now(), None])
+
+    def end(self, name):
+        for phase in reversed(self._phases):
+            if phase[0] == name and phase[2] is None:
+                phase[2] = self._now()
+                break
+        self._maybe_report()
+
+    def watch_first_paint(self, window):
+        """Record the time from now until ``window`` first paints."""
+        self.begin("first paint")
+        window.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and not self._painted:
+            self._painted = True
+            watched.removeEventFilter(self)
+            self.end("first paint")
+        return False
+
+    def format(self):
+        """Return the phases as a table of start and duration in milliseconds."""
+        lines = [f"{'phase':<24} {'start':>9} {'duration':>9}"]
+        for name, start, end in self._phases:
+            duration = f"{(end - start) * 1000:7.1f}ms" if end is not None else "  running"
+            lines.append(f"{name:<24} {start * 1000:7.1f}ms {duration}")
+        return "\n".join(lines)
+
+    def _maybe_report(self):
+        if not self.enabled or self._reported or not self._painted:
+            return
+        if any(end is None for _, _, end in self._phases):
+            return
+        self._reported = True
+        print("Startup profile:")
+        print(self.format())
@@ -1,16 +1,19 @@
-import subprocess
 import random
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpacerItem, QSizePolicy, QTextBrowser
 from PyQt6.QtCore import Qt, pyqtSignal
 import html
 
+from man_page_renderer import page_title
+
 class WelcomeWidget(QWidget):
     show_man_list_requested = pyqtSignal()
     show_search_requested = pyqtSignal()
-    show_random_man_page_requested = pyqtSignal(str) # Signal to request viewing a random man page
+    show_random_man_page_requested = pyqtSignal(str, str) # Signal to request viewing a random man page (name, section)
 
-    def __init__(self, parent=None):
+    def __init__(self, index, render_service, parent=None):
         super().__init__(parent)
+        self.index = index
+        self.render_service = render_service
 
         # Main vertical layout for the entire widget
         main_layout = QVBoxLayout(self)
@@ -65,7 +68,7 @@ class WelcomeWidget(QWidget):
         self.random_man_page_name_button = QPushButton("Loading...")
         self.random_man_page_name_button.setFlat(True)
         self.random_man_page_name_button.setStyleSheet("border: none; text-align: left; font-size: 16px; font-weight: bold; color: blue; text-decoration: underline;")
-        self.random_man_page_name_button.clicked.connect(lambda: self.show_random_man_page_requested.emit(self.current_random_man_page))
+        self.random_man_page_name_button.clicked.connect(self._on_random_man_page_clicked)
         right_panel_layout.addWidget(self.random_man_page_name_button)
 
         self.random_man_page_browser = QTextBrowser()
@@ -80,89 +83,89 @@ class WelcomeWidget(QWidget):
 
         self.setLayout(main_layout)
 
-        self._all_man_page_names = []
+        self._page_count = 0
+        self.current_random_man_page = None  # (name, section)
+        self._next_random_man_page = None  # picked in advance, see _prepare_next_random_man_page
+        self._previews = {}  # (name, section) -> html of the current and next page
+        self._preview_requests = {}  # render service request id -> (name, section)
+        self.render_service.preview_ready.connect(self._on_preview_ready)
         self._load_all_man_page_names()
         self._select_random_man_page_and_view() # Select and view on startup
 
     def _load_all_man_page_names(self):
-        try:
-            result = subprocess.run(['apropos', '.'], capture_output=True, text=True, check=True)
-            lines = result.stdout.splitlines()
-            unique_names = set()
-            for line in lines:
-                if '(' in line and ')' in line:
-                    name_section = line.split('(')[0].strip()
-                    name = name_section.split(',')[0].strip()
-                    if name:
-                        unique_names.add(name)
-            self._all_man_page_names = sorted(list(unique_names))
-        except subprocess.CalledProcessError as e:
-            print(f"Error loading all man page names for random selection: {e.stderr}")
+        if self.index.error:
+            print(f"Error loading all man page names for random selection: {self.index.error}")
             self.random_man_page_name_button.setText("Error loading pages.")
-            # self.view_random_button.setEnabled(False) # Removed button
-        except FileNotFoundError:
-            print("Error: 'apropos' command not found for random selection.")
-            self.random_man_page_name_button.setText("Error: apropos not found.")
-            # self.view_random_button.setEnabled(False) # Removed button
+            return
+        self._page_count = len(self.index)
+
+    def on_index_updated(self):
+        """Pick up newly loaded man pages; choose a random page as soon as there are any."""
+        self._load_all_man_page_names()
+        if self.current_random_man_page is None:
+            self._select_random_man_page_and_view()
+
+    def _on_random_man_page_clicked(self):
+        if self.current_random_man_page:
+            self.show_random_man_page_requested.emit(*self.current_random_man_page)
 
     def _select_random_man_page_and_view(self):
-        if self._all_man_page_names:
-            self.current_random_man_page = random.choice(self._all_man_page_names)
-            self.random_man_page_name_button.setText(self.current_random_man_page)
-            # Load and display the man page description or full content
-            desc = self._get_man_page_description(self.current_random_man_page)
-            if desc:
-                self.random_man_page_browser.setHtml(f"<p>{desc}</p>")
-            else:
-                html_content = self._get_man_page_html(self.current_random_man_page)
-                self.random_man_page_browser.setHtml(html_content)
-            # No longer emit signal to auto-open viewer
+        if self.index.error:
+            # Keep "Error loading pages." rather than reporting an empty system
+            self.random_man_page_browser.setHtml(f"<p>{html.escape(self.index.error)}</p>")
+            return
+        if not self._page_count and not self.index.loaded:
+            self.random_man_page_name_button.setText("Loading...")
+            self.random_man_page_browser.setHtml("<p>Loading man pages...</p>")
+        elif self._page_count:
+            # The page picked last time already has its preview prepared
+            page = self._next_random_man_page or self._pick_random_man_page()
+            if page != self.current_random_man_page:
+                self._previews.pop(self.current_random_man_page, None)
+            self.current_random_man_page = page
+            self.random_man_page_name_button.setText(page_title(*page))
+            self._show_preview(page)
+            self._prepare_next_random_man_page()
         else:
             self.random_man_page_name_button.setText("No man pages found.")
             self.random_man_page_browser.setHtml("<p>No man pages available.</p>")
             # self.view_random_button.setEnabled(False) # Removed button
 
-    def _get_man_page_description(self, page_name):
-        """Retrieve the description of a man page using apropos."""
-        try:
-            result = subprocess.run(['apropos', page_name], capture_output=True, text=True, check=True)
-            lines = result.stdout.strip().split('\n')
-            for line in lines:
-                if ' - ' in line:
-                    desc = line.split(' - ', 1)[1]
-                    return html.escape(desc)
-            return None
-        except subprocess.CalledProcessError:
-            return None
-
-    def _get_man_page_html(self, page_name):
-        """Retrieve a man page as HTML or plain text wrapped in <pre> tags."""
-        try:
-            result = subprocess.run(
-                ["man", "-Thtml", page_name],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            if result.stdout:
-                return result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Error getting HTML man page for {page_name} with -Thtml: {e}")
-            print(f"Stderr: {e.stderr}")
-            try:
-                result = subprocess.run(
-                    ["man", page_name], capture_output=True, text=True, check=True
-                )
-                return f"<pre>{result.stdout}</pre>"
-            except subprocess.CalledProcessError as e_plain:
-                print(f"Error getting plain text man page for {page_name}: {e_plain}")
-                print(f"Stderr: {e_plain.stderr}")
-                return f"<h1>Error: Man page for '{page_name}' not found or could not be rendered.</h1>"
-
-        return f"<h1>Error: Man page for '{page_name}' not found or could not be rendered.</h1>"
+    def _pick_random_man_page(self):
+        # Picked by entry, so every section of a name can come up
+        entry_id = random.randrange(self._page_count)
+        return self.index.names[entry_id], self.index.section(entry_id)
+
+    def _prepare_next_random_man_page(self):
+        """Pick the page shown on the next refresh and start rendering its preview if needed."""
+        page = self._pick_random_man_page()
+        self._next_random_man_page = page
+        if not self.index.description(*page):
+            self._request_preview(page)
+
+    def _show_preview(self, page):
+        """Show the page's description from the index, or its rendered content."""
+        desc = self.index.description(*page)
+        if desc:
+            self.random_man_page_browser.setHtml(f"<p>{html.escape(desc)}</p>")
+        elif page in self._previews:
+            self.random_man_page_browser.setHtml(self._previews[page])
+        else:
+            self.random_man_page_browser.setHtml("<p>Loading preview...</p>")
+            self._request_preview(page)
+
+    def _request_preview(self, page):
+        if page not in self._previews and page not in self._preview_requests.values():
+            self._preview_requests[self.render_service.preview(*page)] = page
+
+    def _on_preview_ready(self, request_id, html_content):
+        page = self._preview_requests.pop(request_id, None)
+        if page not in (self.current_random_man_page, self._next_random_man_page):
+            return  # Not ours, or the page has been replaced since
+        self._previews[page] = html_content
+        if page == self.current_random_man_page and not self.index.description(*page):
+            self.random_man_page_browser.setHtml(html_content)
 
     def refresh_random(self):
         """Refresh the random man page selection."""
         self._select_random_man_page_and_view()
-
-    # Removed _on_view_random_clicked as it's no longer needed